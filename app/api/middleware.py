@@ -0,0 +1,71 @@
+"""
+Request timing and SQL instrumentation middleware
+"""
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core.metrics import RequestStats, request_stats, observe_request
+from app.core.query_budget import check_query_budget
+
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+def get_route_path(scope: Scope) -> str:
+    """
+    Get path template of the route handling the request, so metrics labels don't depend on ids in urls
+    :param scope:
+    :return:
+    """
+    for route in scope['app'].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Records latency and SQL statistics of every HTTP request, optionally reporting them
+    to the client in Server-Timing header and checking endpoint query budgets
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        check_budget = settings.query_budgets
+        stats = RequestStats(track_statements=check_budget)
+        token = request_stats.set(stats)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    elapsed = (time.perf_counter() - started_at) * 1000
+                    headers.append('Server-Timing',
+                                   f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} queries", '
+                                   f'app;dur={elapsed:.2f}')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            route = get_route_path(scope)
+            observe_request(scope['method'], route, status_code, time.perf_counter() - started_at, stats)
+            if check_budget:
+                check_query_budget(scope.get('endpoint'), route, stats)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import characters, games, users
+from app.api.v1.endpoints import characters, dice, games, users
 
 api_router = APIRouter()
 
@@ -9,3 +9,4 @@ api_router = APIRouter()
 api_router.include_router(users.router, prefix='/users', tags=['users'])
 api_router.include_router(characters.router, prefix='/characters', tags=['character'])
 api_router.include_router(games.router, prefix='/games', tags=['games'])
+api_router.include_router(dice.router, prefix='/dice', tags=['dice'])
@@ -0,0 +1,131 @@
+"""
+Batch fetch by ids
+
+Loader coalesces loads of single rows requested while handling a request into a single batch call
+(DataLoader pattern): keys requested by concurrently awaiting code are collected until an event loop
+iteration adds no more keys, then fetched by one IN query. Loaded rows are cached for the request
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Union
+
+from fastapi import Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.api.v1.dependencies import get_db
+from app.api.v1.endpoints import batch_errors as error_details
+
+
+# max number of ids of a batch request, same as max page size
+MAX_IDS = 1000
+
+BatchLoad = Callable[[Any, list], Awaitable[dict]]
+
+
+class Loader:
+    """
+    Per-request loader of rows by keys
+    """
+
+    def __init__(self, db, batch_load: BatchLoad, lock: asyncio.Lock):
+        """
+        :param db: Session or AsyncSession of the request
+        :param batch_load: async function taking db and list of keys, returning key -> row
+        :param lock: lock of the request session, which can't be used by two batches at once
+        """
+        self.db = db
+        self.batch_load = batch_load
+        self._lock = lock
+        self._futures: dict[Hashable, asyncio.Future] = {}
+        self._queue: list = []
+        # the event loop keeps weak references to tasks only, running dispatches are referenced here
+        self._dispatches: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        Load row by key
+        :param key:
+        :return: row or None if not found
+        """
+        future = self._futures.get(key)
+        if future is None:
+            future = self._futures[key] = asyncio.get_running_loop().create_future()
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                task = asyncio.create_task(self._dispatch())
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+        return await future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list:
+        """
+        Load rows by keys with a single batch
+        :param keys:
+        :return: rows in order of the keys, None for missing rows
+        """
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    async def _dispatch(self):
+        # let other tasks of the request enqueue their keys, until an event loop iteration adds none
+        queued = 0
+        while queued != len(self._queue):
+            queued = len(self._queue)
+            await asyncio.sleep(0)
+        keys, self._queue = self._queue, []
+        try:
+            async with self._lock:
+                rows = await self.batch_load(self.db, keys)
+        except Exception as e:
+            for key in keys:
+                # failed loads are not cached
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._futures[key]
+            if future.done():
+                # the awaiting task was cancelled, the key is loaded again by the next load
+                del self._futures[key]
+            else:
+                future.set_result(rows.get(key))
+
+
+class Loaders:
+    """
+    Loaders of a request by batch load function
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = asyncio.Lock()
+        self._loaders: dict[BatchLoad, Loader] = {}
+
+    def __getitem__(self, batch_load: BatchLoad) -> Loader:
+        loader = self._loaders.get(batch_load)
+        if loader is None:
+            loader = self._loaders[batch_load] = Loader(self.db, batch_load, self._lock)
+        return loader
+
+
+def get_loaders(db: Session = Depends(get_db)) -> Loaders:
+    """
+    Request loaders dependency, shared by all dependencies and the endpoint of a request
+    """
+    return Loaders(db)
+
+
+def get_ids(ids: str = Query(None, description='Comma separated ids to fetch instead of a page')) \
+        -> Union[list[int], None]:
+    """
+    Ids of batch fetch dependency
+    """
+    if ids is None:
+        return None
+    try:
+        # duplicates are dropped, order is kept
+        ids = list(dict.fromkeys(int(id_) for id_ in ids.split(',') if id_.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=error_details.INVALID_IDS)
+    if len(ids) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=error_details.TOO_MANY_IDS)
+    return ids
@@ -0,0 +1,127 @@
+"""
+Conditional GET support
+
+Responses carry weak ETags (and Last-Modified where the rows have updated_at), requests with
+a matching If-None-Match or If-Modified-Since header are answered with 304 Not Modified and no body.
+Single rows are validated against a cheap updated_at query before the row is loaded and serialized
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Union
+
+from fastapi import Request
+from starlette.responses import Response
+
+
+def make_etag(content: bytes) -> str:
+    """
+    Get weak ETag of the response content
+    :param content:
+    :return:
+    """
+    return f'W/"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    """
+    Format naive UTC datetime as HTTP date
+    :param value:
+    :return:
+    """
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check if the client already has the representation with the ETag (weak comparison)
+    :param request:
+    :param etag:
+    :return:
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque_tag = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque_tag for tag in if_none_match.split(','))
+
+
+class Validators:
+    """
+    ETag and Last-Modified of a representation
+    """
+
+    def __init__(self, etag: str, last_modified: Union[datetime, None] = None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def of_version(cls, key, updated_at: datetime) -> 'Validators':
+        """
+        Validators of a single row
+        :param key: primary key value
+        :param updated_at:
+        :return:
+        """
+        return cls(make_etag(f'{key}:{updated_at.isoformat()}'.encode()), updated_at)
+
+    @classmethod
+    def of_rows(cls, rows: list, key: str) -> 'Validators':
+        """
+        Validators of a list of rows, Last-Modified is the most recent updated_at
+        :param rows: ORM objects with updated_at
+        :param key: name of the key attribute of rows
+        :return:
+        """
+        versions = ','.join(f'{getattr(row, key)}:{row.updated_at.isoformat()}' for row in rows)
+        return cls(make_etag(versions.encode()), max((row.updated_at for row in rows), default=None))
+
+    def matches(self, request: Request) -> bool:
+        """
+        Check if the client has the current representation. If-Modified-Since is used only
+        without If-None-Match
+        :param request:
+        :return:
+        """
+        if 'if-none-match' in request.headers:
+            return etag_matches(request, self.etag)
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates have second precision
+        last_modified = self.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return last_modified <= since
+
+    def apply(self, response: Response):
+        response.headers['ETag'] = self.etag
+        if self.last_modified is not None:
+            response.headers['Last-Modified'] = http_date(self.last_modified)
+
+    def not_modified(self) -> Response:
+        response = Response(status_code=304)
+        self.apply(response)
+        return response
+
+
+def conditional_response(request: Request, content: bytes, media_type: str = 'application/json') -> Response:
+    """
+    Respond with the content or 304 if the client has it already
+    :param request:
+    :param content: rendered body
+    :param media_type:
+    :return:
+    """
+    validators = Validators(make_etag(content))
+    if validators.matches(request):
+        return validators.not_modified()
+    response = Response(content, media_type=media_type)
+    validators.apply(response)
+    return response
@@ -1,11 +1,17 @@
 
-from fastapi import Depends, HTTPException
+from contextlib import asynccontextmanager
+from typing import Union
+
+from fastapi import Depends, HTTPException, Query
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
 
 
-from app.database import Session
-from app.models.user import User
-from app.crud.user import get_user_by_name
+from app.config import settings
+from app.database import Session, AsyncSession
+from app.crud.aio.user import get_principal
+from app.core.auth import Principal, principal_cache
 from app.schemas.user import UserSchema
 
 
@@ -16,24 +22,75 @@ from app.schemas.user import UserSchema
 http_authorization = HTTPBearer()
 
 
+@asynccontextmanager
+async def open_db():
+    """
+    Open AsyncSession or Session depending on settings
+    """
+    if settings.db_async:
+        async with AsyncSession() as db:
+            yield db
+    else:
+        db = Session()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
 # database session dependency
-def get_db():
-    db = Session()
-    try:
+async def get_db():
+    async with open_db() as db:
         yield db
-    finally:
-        db.close()
 
 
-def get_current_user(
+async def authenticate(db, credentials: str) -> Union[Principal, None]:
+    """
+    Get principal of the credentials, cached principals are used without querying the database
+    :param db: Session or AsyncSession
+    :param credentials: bearer credentials
+    :return: None if there is no such user
+    """
+    user = principal_cache.get(credentials)
+    if user is None:
+        user = await get_principal(db, credentials)
+        if user is not None:
+            principal_cache.set(credentials, user)
+    return user
+
+
+async def get_current_user(
         db: Session = Depends(get_db),
         authorization: HTTPAuthorizationCredentials = Depends(http_authorization)
-) -> User:
+) -> Principal:
     """
     Get current user from request
     """
-    user = get_user_by_name(db, authorization.credentials)
-    if not user:
+    user = await authenticate(db, authorization.credentials)
+    if user is None:
+        raise HTTPException(status_code=403)
+    return user
+
+
+def get_connection_credentials(connection: HTTPConnection, token: str = Query(None)) -> Union[str, None]:
+    """
+    Get bearer credentials of WebSocket handshake or EventSource request from Authorization header
+    or token query parameter, as browsers can't set headers of these requests
+    """
+    scheme, _, credentials = connection.headers.get('authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and credentials:
+        return credentials
+    return token
+
+
+async def get_stream_user(credentials: str = Depends(get_connection_credentials)) -> Principal:
+    """
+    Get current user of a long-lived response. Unlike get_current_user it doesn't keep
+    a database session open until the response ends
+    """
+    async with open_db() as db:
+        user = await authenticate(db, credentials) if credentials else None
+    if user is None:
         raise HTTPException(status_code=403)
     return user
 
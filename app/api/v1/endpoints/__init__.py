@@ -1,5 +1,8 @@
 from .error_details import (
     user_errors,
     character_errors,
-    game_errors
+    game_errors,
+    adventure_errors,
+    pagination_errors,
+    batch_errors
 )
@@ -2,43 +2,75 @@
 Adventures routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
 from app.schemas.adventure import AdventureUpdateSchema, AdventureCreateSchema, AdventureSchema
+from app.api.v1.routing import SerializedRoute
+from app.core.query_budget import query_budget
 from app.api.v1.dependencies import get_db
-from app.crud import adventure as crud
+from app.api.v1.pagination import Page, get_page
+from app.api.v1.streaming import ndjson_response, wants_ndjson
+from app.api.v1.conditional import Validators
+from app.crud.aio import adventure as crud
+from app.crud.adventure import select_adventures
+from app.crud import AdventureVersionConflict
+from app.api.v1.endpoints import adventure_errors as error_details
 
 
-router = APIRouter()
+router = APIRouter(route_class=SerializedRoute)
 
 
 @router.get('/', response_model=list[AdventureSchema])
-def read_all(db: Session = Depends(get_db)):
+@query_budget(5)
+async def read_all(request: Request,
+                   response: Response,
+                   page: Page = Depends(get_page),
+                   db: Session = Depends(get_db)):
     """
     Get list of adventures from database
     """
-    return crud.get_adventures(db)
+    if wants_ndjson(request):
+        return ndjson_response(db, select_adventures(), AdventureSchema)
+    adventures = await crud.get_adventures(db, after=page.after, limit=page.limit)
+    page.set_next_cursor(response, adventures, 'adventure_id')
+    validators = Validators.of_rows(adventures, 'adventure_id')
+    if validators.matches(request):
+        return validators.not_modified()
+    validators.apply(response)
+    return adventures
 
 
 @router.get('/{adventure_id}', response_model=AdventureSchema)
-def read_one(adventure_id: int, db: Session = Depends(get_db)):
+@query_budget(6)
+async def read_one(adventure_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Get adventure by id
     """
-    adventure = crud.get_adventure_by_id(db, adventure_id)
+    version = await crud.get_latest_adventure_version(db, adventure_id)
+    if version is None:
+        raise HTTPException(status_code=404)
+    validators = Validators.of_version(*version)
+    if validators.matches(request):
+        return validators.not_modified()
+    adventure = await crud.get_latest_adventure(db, adventure_id)
     if adventure is None:
         raise HTTPException(status_code=404)
     else:
+        Validators.of_version(adventure.aid, adventure.updated_at).apply(response)
         return adventure
 
 
 @router.put('/{adventure_id}', response_model=AdventureSchema)
-def update(adventure_id: int, adventure: AdventureUpdateSchema, db: Session = Depends(get_db)):
+@query_budget(8)
+async def update(adventure_id: int, adventure: AdventureUpdateSchema, db: Session = Depends(get_db)):
     """
     Update adventure
     """
-    adventure = crud.update_adventure(db, adventure_id, adventure)
+    try:
+        adventure = await crud.update_adventure(db, adventure_id, adventure)
+    except AdventureVersionConflict:
+        raise HTTPException(status_code=409, detail=error_details.ADVENTURE_VERSION_CONFLICT)
     if adventure is None:
         raise HTTPException(status_code=404)
     else:
@@ -46,16 +78,18 @@ def update(adventure_id: int, adventure: AdventureUpdateSchema, db: Session = De
 
 
 @router.post('/', response_model=AdventureSchema)
-def create(adventure: AdventureCreateSchema, db: Session = Depends(get_db)):
+@query_budget(6)
+async def create(adventure: AdventureCreateSchema, db: Session = Depends(get_db)):
     """
     Create new adventure
     """
-    return crud.create_adventure(db, adventure)
+    return await crud.create_adventure(db, adventure)
 
 
 @router.delete('/{adventure_id}')
-def delete(adventure_id: int, db: Session = Depends(get_db)):
+@query_budget(6)
+async def delete(adventure_id: int, db: Session = Depends(get_db)):
     """
     Delete adventure
     """
-    crud.disable_adventure(db, adventure_id)
+    await crud.disable_adventure(db, adventure_id)
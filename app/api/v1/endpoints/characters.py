@@ -2,62 +2,136 @@
 Characters routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from app.schemas.character import CharacterSchema, CharacterCreateSchema, CharacterUpdateSchema
+from app.schemas.character import (
+    CharacterSchema, CharacterCreateSchema, CharacterUpdateSchema, CharacterAbilitiesScheme,
+    CharacterAbilitiesUpdateScheme
+)
+from app.api.v1.routing import SerializedRoute
+from app.core.query_budget import query_budget
 from app.api.v1.dependencies import get_db, get_current_user
-from app.crud import character as crud
-from app.models.user import User
+from app.api.v1.pagination import Page, get_page
+from app.api.v1.batch import Loaders, get_loaders, get_ids
+from app.api.v1.streaming import ndjson_response, wants_ndjson
+from app.api.v1.conditional import Validators
+from app.crud.aio import character as crud
+from app.crud.character import select_characters
+from app.core.auth import Principal
 from app.api.v1.endpoints import character_errors as error_details
 
 
-router = APIRouter()
+router = APIRouter(route_class=SerializedRoute)
 
 
 @router.get('/', response_model=list[CharacterSchema])
-def read_all(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Read characters"""
-    return crud.get_characters(db, user_owner_id=current_user.user_id)
+@query_budget(5)
+async def read_all(request: Request,
+                   response: Response,
+                   page: Page = Depends(get_page),
+                   ids: list[int] = Depends(get_ids),
+                   loaders: Loaders = Depends(get_loaders),
+                   db: Session = Depends(get_db),
+                   current_user: Principal = Depends(get_current_user)):
+    """Read characters, or characters with provided ids"""
+    if wants_ndjson(request):
+        return ndjson_response(db, select_characters(user_owner_id=current_user.user_id), CharacterSchema)
+    if ids is not None:
+        characters = [character for character in await loaders[crud.get_characters_by_ids].load_many(ids)
+                      if character is not None and character.user_owner_id == current_user.user_id]
+    else:
+        characters = await crud.get_characters(db, user_owner_id=current_user.user_id,
+                                               after=page.after, limit=page.limit)
+        page.set_next_cursor(response, characters, 'character_id')
+    validators = Validators.of_rows(characters, 'character_id')
+    if validators.matches(request):
+        return validators.not_modified()
+    validators.apply(response)
+    return characters
 
 
 @router.get('/{character_id}', response_model=CharacterSchema)
-def read_one(character_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@query_budget(6)
+async def read_one(character_id: int,
+                   request: Request,
+                   response: Response,
+                   db: Session = Depends(get_db),
+                   current_user: Principal = Depends(get_current_user)):
     """Get character by id"""
-    character = crud.get_user_character_by_id(character_id=character_id, user_id=current_user.user_id, db=db)
+    version = await crud.get_user_character_version(db, user_id=current_user.user_id, character_id=character_id)
+    if version is None:
+        raise HTTPException(status_code=404)
+    validators = Validators.of_version(*version)
+    if validators.matches(request):
+        return validators.not_modified()
+    character = await crud.get_user_character_by_id(character_id=character_id, user_id=current_user.user_id, db=db)
     if character is None:
         raise HTTPException(status_code=404)
     else:
+        Validators.of_version(character.character_id, character.updated_at).apply(response)
         return character
 
 
 @router.put('/{character_id}', response_model=CharacterSchema)
-def update(character_id: int,
-           character: CharacterUpdateSchema,
-           current_user: User = Depends(get_current_user),
-           db: Session = Depends(get_db)):
+@query_budget(6)
+async def update(character_id: int,
+                 character: CharacterUpdateSchema,
+                 current_user: Principal = Depends(get_current_user),
+                 db: Session = Depends(get_db)):
     """Update character"""
     # check if the user owns the character
     if not current_user.owns_character(character_id):
         raise HTTPException(status_code=404, detail=error_details.CHARACTER_NOT_FOUND)
     # update the character
-    return crud.update_character(db, character_id, character)
+    return await crud.update_character(db, character_id, character)
+
+
+@router.get('/{character_id}/abilities', response_model=CharacterAbilitiesScheme)
+@query_budget(6)
+async def read_abilities(character_id: int,
+                         db: Session = Depends(get_db),
+                         current_user: Principal = Depends(get_current_user)):
+    """Get abilities of the character with modifiers, saving throws and skill bonuses"""
+    if not current_user.owns_character(character_id):
+        raise HTTPException(status_code=404, detail=error_details.CHARACTER_NOT_FOUND)
+    character_sheet = await crud.get_character_sheet(db, character_id)
+    if character_sheet is None:
+        raise HTTPException(status_code=404)
+    return character_sheet
+
+
+@router.put('/{character_id}/abilities', response_model=CharacterAbilitiesScheme)
+@query_budget(7)
+async def update_abilities(character_id: int,
+                           abilities: CharacterAbilitiesUpdateScheme,
+                           db: Session = Depends(get_db),
+                           current_user: Principal = Depends(get_current_user)):
+    """Update abilities, level or proficiencies of the character"""
+    if not current_user.owns_character(character_id):
+        raise HTTPException(status_code=404, detail=error_details.CHARACTER_NOT_FOUND)
+    character_sheet = await crud.update_character_sheet(db, character_id, abilities)
+    if character_sheet is None:
+        raise HTTPException(status_code=404)
+    return character_sheet
 
 
 @router.post('/', response_model=CharacterSchema, status_code=201)
-def create(character: CharacterCreateSchema,
-           db: Session = Depends(get_db),
-           current_user: User = Depends(get_current_user)):
+@query_budget(7)
+async def create(character: CharacterCreateSchema,
+                 db: Session = Depends(get_db),
+                 current_user: Principal = Depends(get_current_user)):
     """Create new character"""
-    return crud.create_character(db, character, current_user.user_id)
+    return await crud.create_character(db, character, current_user.user_id)
 
 
 @router.delete('/{character_id}')
-def delete(character_id: int,
-           db: Session = Depends(get_db),
-           current_user: User = Depends(get_current_user)):
+@query_budget(6)
+async def delete(character_id: int,
+                 db: Session = Depends(get_db),
+                 current_user: Principal = Depends(get_current_user)):
     """Delete character"""
     # check if the user owns the character
     if not current_user.owns_character(character_id):
         raise HTTPException(status_code=404, detail=error_details.CHARACTER_NOT_FOUND)
-    crud.disable_character(db, character_id)
+    await crud.disable_character(db, character_id)
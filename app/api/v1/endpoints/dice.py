@@ -0,0 +1,28 @@
+"""
+Dice routes
+"""
+
+from fastapi import APIRouter, Depends
+
+from app.schemas.dice import DiceRollCreateSchema, DiceRollsSchema
+from app.api.v1.routing import SerializedRoute
+from app.core.query_budget import query_budget
+from app.api.v1.dependencies import get_current_user
+from app.core.auth import Principal
+from app.core.operations.dice import compile_dice
+
+
+router = APIRouter(route_class=SerializedRoute)
+
+
+@router.post('/rolls', response_model=DiceRollsSchema)
+@query_budget(3)
+async def roll(dice_roll: DiceRollCreateSchema, current_user: Principal = Depends(get_current_user)):
+    """Roll dice notation, dice values are returned for a single roll only"""
+    expression = compile_dice(dice_roll.notation, dice_roll.mode)
+    if dice_roll.times == 1:
+        result = expression.roll()
+        return DiceRollsSchema(notation=expression.notation, mode=expression.mode,
+                               totals=[result.total], dice=result.dice)
+    return DiceRollsSchema(notation=expression.notation, mode=expression.mode,
+                           totals=expression.roll_many(dice_roll.times).tolist())
@@ -6,6 +6,7 @@ Error messages
 class UserErrorsDetails:
     USERNAME_IS_NOT_UNIQUE = 'Username is not unique'
     USER_NOT_AUTHORIZED = 'User is not authorized to perform this action'
+    FEEDS_EXHAUSTED = 'Too many open feeds, try again later'
 
 
 class CharacterErrorsDetails:
@@ -15,8 +16,29 @@ class CharacterErrorsDetails:
 class GameErrorsDetails:
     USER_IS_NOT_GM = 'The user is not the game master of the game'
     CHARACTER_ALREADY_USED = 'Provided character already participates another game'
+    JOIN_REQUESTS_CONFLICT = 'Join requests are being updated concurrently, try again'
+    USER_IS_NOT_PARTICIPANT = 'The user does not participate the game'
+    CHARACTER_IS_NOT_OWNED = 'The character is not owned by the user'
+    CHARACTER_NOT_IN_GAME = 'The character does not participate the game'
+    ROLLS_NOT_REPLAYABLE = 'Rolls were made by another version of the dice engine and cannot be replayed'
+
+
+class AdventureErrorsDetails:
+    ADVENTURE_VERSION_CONFLICT = 'Adventure is being updated concurrently, try again'
+
+
+class PaginationErrorsDetails:
+    INVALID_CURSOR = 'Invalid pagination cursor'
+
+
+class BatchErrorsDetails:
+    INVALID_IDS = 'Ids must be comma separated integers'
+    TOO_MANY_IDS = 'Too many ids requested'
 
 
 user_errors = UserErrorsDetails()
 character_errors = CharacterErrorsDetails()
 game_errors = GameErrorsDetails()
+adventure_errors = AdventureErrorsDetails()
+pagination_errors = PaginationErrorsDetails()
+batch_errors = BatchErrorsDetails()
@@ -2,53 +2,110 @@
 Games routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, WebSocket, status
 from sqlalchemy.orm import Session
 
 from app.schemas.game import (
     GameSchema, GameCreateSchema, GameUpdateSchema, JoinRequestCreateSchema,
-    JoinRequestSchema
+    JoinRequestSchema, GameLobbySchema, JoinRequestsBulkUpdateSchema, JoinRequestOutcomeSchema,
+    GameRollCreateSchema, GameRollSchema
 )
-from app.api.v1.dependencies import get_db, get_current_user
-from app.crud import game as crud
+from app.api.v1.routing import SerializedRoute
+from app.core.query_budget import query_budget
+from app.api.v1.dependencies import (
+    get_db, get_current_user, get_connection_credentials, authenticate, open_db
+)
+from app.api.v1.pagination import Page, get_page
+from app.api.v1.batch import Loaders, get_loaders, get_ids
+from app.api.v1.streaming import ndjson_response, wants_ndjson
+from app.api.v1.conditional import Validators
+from app.crud.aio import game as crud
+from app.crud.aio import permissions
+from app.api.v1.websocket import serve_game_channel
+from app.crud.game import select_games
 from app.crud import (
-    CharacterUnavailable
+    CharacterUnavailable,
+    CharacterNotFound,
+    GameNotFound,
+    JoinRequestNotFound
 )
-from app.models.user import User
+from app.core.auth import Principal
+from app.core.operations.rng import RngVersionMismatch
 from app.api.v1.endpoints import game_errors as error_details
 
 
-router = APIRouter()
+router = APIRouter(route_class=SerializedRoute)
 
 
 @router.get('/', response_model=list[GameSchema])
-def read_all(db: Session = Depends(get_db)):
-    """Read games"""
-    return crud.get_games(db)
+@query_budget(4)
+async def read_all(request: Request,
+                   response: Response,
+                   page: Page = Depends(get_page),
+                   ids: list[int] = Depends(get_ids),
+                   loaders: Loaders = Depends(get_loaders),
+                   db: Session = Depends(get_db)):
+    """Read games, or games with provided ids"""
+    if wants_ndjson(request):
+        return ndjson_response(db, select_games(), GameSchema)
+    if ids is not None:
+        games = [game for game in await loaders[crud.get_games_by_ids].load_many(ids) if game is not None]
+    else:
+        games = await crud.get_games(db, after=page.after, limit=page.limit)
+        page.set_next_cursor(response, games, 'game_id')
+    validators = Validators.of_rows(games, 'game_id')
+    if validators.matches(request):
+        return validators.not_modified()
+    validators.apply(response)
+    return games
+
+
+@router.get('/lobby', response_model=list[GameLobbySchema])
+@query_budget(1)
+async def read_lobby(response: Response,
+                     game_state: bool = None,
+                     disabled: bool = None,
+                     page: Page = Depends(get_page),
+                     db: Session = Depends(get_db)):
+    """Read games with characters count, pending join requests count and game master nickname"""
+    games = await crud.get_lobby(db, game_state=game_state, disabled=disabled, after=page.after, limit=page.limit)
+    page.set_next_cursor(response, games, 'game_id')
+    return games
 
 
 @router.get('/{game_id}', response_model=GameSchema)
-def read_one(game_id: int,
-             db: Session = Depends(get_db)):
+@query_budget(5)
+async def read_one(game_id: int,
+                   request: Request,
+                   response: Response,
+                   db: Session = Depends(get_db)):
     """Get game by id"""
-    game = crud.get_game_by_id(game_id=game_id, db=db)
+    version = await crud.get_game_version(db, game_id)
+    if version is None:
+        raise HTTPException(status_code=404)
+    validators = Validators.of_version(*version)
+    if validators.matches(request):
+        return validators.not_modified()
+    game = await crud.get_game_by_id(game_id=game_id, db=db)
     if game is None:
         raise HTTPException(status_code=404)
     else:
+        Validators.of_version(game.game_id, game.updated_at).apply(response)
         return game
 
 
 @router.put('/{game_id}', response_model=GameSchema)
-def update(game_id: int,
-           game: GameUpdateSchema,
-           current_user: User = Depends(get_current_user),
-           db: Session = Depends(get_db)):
+@query_budget(6)
+async def update(game_id: int,
+                 game: GameUpdateSchema,
+                 current_user: Principal = Depends(get_current_user),
+                 db: Session = Depends(get_db)):
     """Update game"""
     # check if user has rights to modify the game
     if not current_user.is_gm(game_id):
         raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_GM)
     else:
-        game = crud.update_game(db, game_id, game)
+        game = await crud.update_game(db, game_id, game)
         if game is None:
             raise HTTPException(status_code=404)
         else:
@@ -56,28 +113,31 @@ def update(game_id: int,
 
 
 @router.post('/', response_model=GameSchema)
-def create(game: GameCreateSchema, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@query_budget(6)
+async def create(game: GameCreateSchema, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     """Create new game"""
-    return crud.create_game(db=db, game=game, game_master_id=current_user.user_id)
+    return await crud.create_game(db=db, game=game, game_master_id=current_user.user_id)
 
 
 @router.delete('/{game_id}')
-def delete(game_id: int,
-           current_user: User = Depends(get_current_user),
-           db: Session = Depends(get_db)):
+@query_budget(6)
+async def delete(game_id: int,
+                 current_user: Principal = Depends(get_current_user),
+                 db: Session = Depends(get_db)):
     """Delete game"""
     if not current_user.is_gm(game_id):
         raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_GM)
-    response = crud.disable_game(db, game_id)
+    response = await crud.disable_game(db, game_id)
     if response is None:
         raise HTTPException(status_code=404)
 
 
 @router.post('/{game_id}/join', response_model=JoinRequestSchema)
-def create_join_request(
+@query_budget(6)
+async def create_join_request(
         game_id: int,
         join_request: JoinRequestCreateSchema,
-        current_user: User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
         db: Session = Depends(get_db)):
     """
     Create new join request
@@ -87,47 +147,150 @@ def create_join_request(
         raise HTTPException(status_code=403, detail='No characters with provided id found')
     else:
         try:
-            return crud.create_join_request(db, game_id, join_request)
+            return await crud.create_join_request(db, game_id, join_request)
         except CharacterUnavailable:
             raise HTTPException(status_code=400, detail=error_details.CHARACTER_ALREADY_USED)
 
 
 @router.get('/{game_id}/join_requests', response_model=list[JoinRequestSchema])
-def get_join_requests(
+@query_budget(5)
+async def get_join_requests(
         game_id: int,
-        current_user: User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
     # check if the user is GM
     if not current_user.is_gm(game_id):
         raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_GM)
     else:
-        return crud.get_join_requests(db, game_id)
+        return await crud.get_join_requests(db, game_id)
 
 
 @router.get('/{game_id}/join_requests/{request_id}/accept')
-def accept_join_request(
+@query_budget(12)
+async def accept_join_request(
         game_id: int,
         request_id: int,
-        current_user: User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
     """Accept join request"""
     if not current_user.is_gm(game_id):
         raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_GM)
     else:
-        crud.join_request_accept(db, request_id)
+        try:
+            await crud.join_request_accept(db, game_id, request_id)
+        except (JoinRequestNotFound, GameNotFound, CharacterNotFound):
+            raise HTTPException(status_code=404)
+        except CharacterUnavailable:
+            raise HTTPException(status_code=400, detail=error_details.CHARACTER_ALREADY_USED)
 
 
 @router.get('/{game_id}/join_requests/{request_id}/decline')
-def decline_join_request(
+@query_budget(6)
+async def decline_join_request(
         game_id: int,
         request_id: int,
-        current_user: User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
     """Decline join request"""
     if not current_user.is_gm(game_id):
         raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_GM)
     else:
-        crud.join_request_decline(db, request_id)
+        try:
+            await crud.join_request_decline(db, game_id, request_id)
+        except JoinRequestNotFound:
+            raise HTTPException(status_code=404)
+
+
+@router.post('/{game_id}/join_requests/bulk', response_model=list[JoinRequestOutcomeSchema])
+@query_budget(10)
+async def bulk_update_join_requests(
+        game_id: int,
+        bulk_update: JoinRequestsBulkUpdateSchema,
+        current_user: Principal = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """Accept or decline join requests in a single transaction, returns outcome of every request"""
+    if not current_user.is_gm(game_id):
+        raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_GM)
+    try:
+        outcomes = await crud.join_requests_bulk_update(db, game_id, bulk_update.request_ids,
+                                                        accept=bulk_update.action == 'accept')
+    except CharacterUnavailable:
+        raise HTTPException(status_code=409, detail=error_details.JOIN_REQUESTS_CONFLICT)
+    return [JoinRequestOutcomeSchema(request_id=request_id, outcome=outcome)
+            for request_id, outcome in outcomes.items()]
+
+
+@router.post('/{game_id}/rolls', response_model=GameRollSchema, status_code=201)
+@query_budget(8)
+async def create_roll(
+        game_id: int,
+        roll: GameRollCreateSchema,
+        current_user: Principal = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """
+    Roll dice as a character of the game, or as the GM without character.
+    Outcomes are generated by deterministic random streams of the game, so they can be replayed
+    """
+    if roll.character_id is None:
+        if not current_user.is_gm(game_id):
+            raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_GM)
+    elif not (current_user.owns_character(roll.character_id) or current_user.is_gm(game_id)):
+        raise HTTPException(status_code=403, detail=error_details.CHARACTER_IS_NOT_OWNED)
+    try:
+        return await crud.create_roll(db, game_id, current_user.user_id, roll)
+    except GameNotFound:
+        raise HTTPException(status_code=404)
+    except CharacterNotFound:
+        raise HTTPException(status_code=400, detail=error_details.CHARACTER_NOT_IN_GAME)
+
+
+@router.get('/{game_id}/rolls', response_model=list[GameRollSchema])
+@query_budget(6)
+async def read_rolls(
+        game_id: int,
+        response: Response,
+        page: Page = Depends(get_page),
+        current_user: Principal = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """Replay rolls of the game in order, outcomes are regenerated from the game random streams"""
+    if not (current_user.is_gm(game_id)
+            or await permissions.is_game_participant(db, current_user.user_id, game_id)):
+        raise HTTPException(status_code=403, detail=error_details.USER_IS_NOT_PARTICIPANT)
+    try:
+        rolls = await crud.get_rolls(db, game_id, after=page.after, limit=page.limit)
+    except GameNotFound:
+        raise HTTPException(status_code=404)
+    except RngVersionMismatch:
+        raise HTTPException(status_code=409, detail=error_details.ROLLS_NOT_REPLAYABLE)
+    page.set_next_cursor(response, rolls, 'counter')
+    return rolls
+
+
+@router.websocket('/{game_id}/ws')
+async def game_channel(websocket: WebSocket,
+                       game_id: int,
+                       credentials: str = Depends(get_connection_credentials)):
+    """
+    Push changes of the game and its join requests to the game participants,
+    users who requested to join the game get only events of their own requests
+    """
+    allowed, user_id = False, None
+    # the session is closed before the connection is served, so it doesn't hold a database connection
+    async with open_db() as db:
+        current_user = await authenticate(db, credentials) if credentials else None
+        if current_user is not None:
+            if current_user.is_gm(game_id) \
+                    or await permissions.is_game_participant(db, current_user.user_id, game_id):
+                allowed = True
+            elif await permissions.has_join_request(db, current_user.user_id, game_id):
+                allowed, user_id = True, current_user.user_id
+    if not allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await serve_game_channel(websocket, game_id, user_id)
@@ -2,37 +2,70 @@
 Item routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
 from app.schemas.item import ItemSchema, ItemCreateSchema, ItemUpdateSchema
+from app.api.v1.routing import SerializedRoute
+from app.core.query_budget import query_budget
 from app.api.v1.dependencies import get_db
-from app.crud import item as crud
+from app.api.v1.pagination import Page, get_page
+from app.api.v1.batch import Loaders, get_loaders, get_ids
+from app.api.v1.streaming import ndjson_response, wants_ndjson
+from app.api.v1.conditional import Validators
+from app.crud.aio import item as crud
+from app.crud.item import select_items
 
 
-router = APIRouter()
+router = APIRouter(route_class=SerializedRoute)
 
 
 @router.get('/', response_model=list[ItemSchema])
-def read_all(db: Session = Depends(get_db)):
-    """Read items"""
-    return crud.get_items(db)
+@query_budget(5)
+async def read_all(request: Request,
+                   response: Response,
+                   page: Page = Depends(get_page),
+                   ids: list[int] = Depends(get_ids),
+                   loaders: Loaders = Depends(get_loaders),
+                   db: Session = Depends(get_db)):
+    """Read items, or items with provided ids"""
+    if wants_ndjson(request):
+        return ndjson_response(db, select_items(), ItemSchema)
+    if ids is not None:
+        items = [item for item in await loaders[crud.get_items_by_ids].load_many(ids) if item is not None]
+    else:
+        items = await crud.get_items(db, after=page.after, limit=page.limit)
+        page.set_next_cursor(response, items, 'item_id')
+    validators = Validators.of_rows(items, 'item_id')
+    if validators.matches(request):
+        return validators.not_modified()
+    validators.apply(response)
+    return items
 
 
 @router.get('/{item_id}', response_model=ItemSchema)
-def read_one(item_id: int, db: Session = Depends(get_db)):
+@query_budget(5)
+async def read_one(item_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get item by id"""
-    item = crud.get_item_by_id(item_id=item_id, db=db)
+    version = await crud.get_item_version(db, item_id)
+    if version is None:
+        raise HTTPException(status_code=404)
+    validators = Validators.of_version(*version)
+    if validators.matches(request):
+        return validators.not_modified()
+    item = await crud.get_item_by_id(item_id=item_id, db=db)
     if item is None:
         raise HTTPException(status_code=404)
     else:
+        Validators.of_version(item.item_id, item.updated_at).apply(response)
         return item
 
 
 @router.put('/{item_id}', response_model=ItemSchema)
-def update(item_id: int, item: ItemUpdateSchema, db: Session = Depends(get_db)):
+@query_budget(6)
+async def update(item_id: int, item: ItemUpdateSchema, db: Session = Depends(get_db)):
     """Update item"""
-    item = crud.update_item(db, item_id, item)
+    item = await crud.update_item(db, item_id, item)
     if item is None:
         raise HTTPException(status_code=404)
     else:
@@ -40,14 +73,16 @@ def update(item_id: int, item: ItemUpdateSchema, db: Session = Depends(get_db)):
 
 
 @router.post('/', response_model=ItemSchema)
-def create(item: ItemCreateSchema, db: Session = Depends(get_db)):
+@query_budget(6)
+async def create(item: ItemCreateSchema, db: Session = Depends(get_db)):
     """Create new item"""
-    return crud.create_item(db, item)
+    return await crud.create_item(db, item)
 
 
 @router.delete('/{item_id}')
-def delete(item_id: int, db: Session = Depends(get_db)):
+@query_budget(6)
+async def delete(item_id: int, db: Session = Depends(get_db)):
     """Delete item"""
-    response = crud.disable_item(db, item_id)
+    response = await crud.disable_item(db, item_id)
     if response is None:
         raise HTTPException(status_code=404)
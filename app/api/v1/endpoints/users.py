@@ -2,67 +2,125 @@
 Users routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Union
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
-from app.schemas.user import UserSchema, UserCreateSchema, UserUpdateSchema
-from app.api.v1.dependencies import get_db, get_current_user
-from app.crud import user as crud
+from app.schemas.user import UserSchema, UserCreateSchema, UserUpdateSchema, UserInfoSchema
+from app.schemas.game import GameSchema, JoinRequestSchema
+from app.schemas.character import CharacterSchema
+from app.api.v1.routing import SerializedRoute
+from app.core.query_budget import query_budget
+from app.api.v1.dependencies import get_db, get_current_user, get_stream_user
+from app.api.v1.pagination import Page, get_page
+from app.api.v1.batch import Loaders, get_loaders, get_ids
+from app.api.v1.streaming import ndjson_response, wants_ndjson
+from app.api.v1.conditional import Validators, conditional_response
+from app.api.v1.sse import join_request_feed_response
+from app.crud.aio import user as crud
+from app.crud.user import select_users
 from app.api.v1.endpoints import user_errors as error_details
-from app.models.user import User
+from app.core.auth import Principal
+from app.core.feeds import FeedsExhausted
+from app.core.serialization import get_serializer
 
 
-router = APIRouter()
+router = APIRouter(route_class=SerializedRoute)
 
 
 @router.get('/', response_model=list[UserSchema])
-def read_all(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Read users"""
-    return crud.get_users(db)
-
-
-@router.get('/me')
-def get_current_user_info(current_user=Depends(get_current_user)):
-    """Get current user info"""
-    # return user's data
-    pass
-    # return created games
-    pass
-    # return list of join requests
-    pass
-    # return list of characters
-    pass
-    # user = current_user
-    # # user = None
-    # if user is None:
-    #     raise HTTPException(status_code=404)
-    # else:
-    #     return user
-    return
+@query_budget(5)
+async def read_all(request: Request,
+                   response: Response,
+                   page: Page = Depends(get_page),
+                   ids: list[int] = Depends(get_ids),
+                   loaders: Loaders = Depends(get_loaders),
+                   db: Session = Depends(get_db),
+                   current_user: Principal = Depends(get_current_user)):
+    """Read users, or users with provided ids"""
+    if wants_ndjson(request):
+        return ndjson_response(db, select_users(), UserSchema)
+    if ids is not None:
+        users = [user for user in await loaders[crud.get_users_by_ids].load_many(ids) if user is not None]
+    else:
+        users = await crud.get_users(db, after=page.after, limit=page.limit)
+        page.set_next_cursor(response, users, 'user_id')
+    validators = Validators.of_rows(users, 'user_id')
+    if validators.matches(request):
+        return validators.not_modified()
+    validators.apply(response)
+    return users
+
+
+@router.get('/me', response_model=UserInfoSchema)
+@query_budget(7)
+async def get_current_user_info(request: Request,
+                                db: Session = Depends(get_db),
+                                current_user: Principal = Depends(get_current_user)):
+    """Get current user info with created games, join requests and characters"""
+    user = await crud.get_user_info(db, current_user.user_id)
+    if user is None:
+        raise HTTPException(status_code=404)
+    info = get_serializer(UserSchema).dump(user)
+    info['games'] = get_serializer(GameSchema).dump_many(user.games)
+    info['characters'] = get_serializer(CharacterSchema).dump_many(user.characters)
+    info['join_requests'] = get_serializer(JoinRequestSchema).dump_many(user.join_requests)
+    response = conditional_response(request, orjson.dumps(info))
+    # clients have to revalidate, the info changes with every join request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@router.get('/me/join_requests/events')
+@query_budget(3)
+async def join_request_events(current_user: Principal = Depends(get_stream_user),
+                              last_event_id: Union[str, None] = Header(None)):
+    """
+    Stream status changes of join requests of the user and join requests to games of the user
+    as Server-Sent Events
+    """
+    try:
+        return join_request_feed_response(current_user, last_event_id)
+    except FeedsExhausted:
+        raise HTTPException(status_code=503, detail=error_details.FEEDS_EXHAUSTED,
+                            headers={'Retry-After': '5'})
 
 
 @router.get('/{user_id}', response_model=UserSchema)
-def read_one(user_id: int,
-             db: Session = Depends(get_db),
-             current_user: User = Depends(get_current_user)):
+@query_budget(6)
+async def read_one(user_id: int,
+                   request: Request,
+                   response: Response,
+                   db: Session = Depends(get_db),
+                   current_user: Principal = Depends(get_current_user)):
     """Get user by id"""
     if not current_user.user_id == user_id:
         raise HTTPException(status_code=403, detail=error_details.USER_NOT_AUTHORIZED)
-    user = crud.get_user_by_id(user_id=user_id, db=db)
+    version = await crud.get_user_version(db, user_id)
+    if version is None:
+        raise HTTPException(status_code=404)
+    validators = Validators.of_version(*version)
+    if validators.matches(request):
+        return validators.not_modified()
+    user = await crud.get_user_by_id(user_id=user_id, db=db)
     if user is None:
         raise HTTPException(status_code=404)
     else:
+        Validators.of_version(user.user_id, user.updated_at).apply(response)
         return user
 
 
 @router.put('/{user_id}', response_model=UserSchema)
-def update(user_id: int, user: UserUpdateSchema,
-           db: Session = Depends(get_db),
-           current_user: User = Depends(get_current_user)):
+@query_budget(6)
+async def update(user_id: int, user: UserUpdateSchema,
+                 db: Session = Depends(get_db),
+                 current_user: Principal = Depends(get_current_user)):
     """Update user"""
     if not current_user.user_id == user_id:
         raise HTTPException(status_code=403, detail=error_details.USER_NOT_AUTHORIZED)
-    user = crud.update_user(db, user_id, user)
+    user = await crud.update_user(db, user_id, user)
     if user is None:
         raise HTTPException(status_code=404)
     else:
@@ -70,21 +128,23 @@ def update(user_id: int, user: UserUpdateSchema,
 
 
 @router.post('/', response_model=UserSchema, status_code=201)
-def create(user: UserCreateSchema, db: Session = Depends(get_db)):
+@query_budget(5)
+async def create(user: UserCreateSchema, db: Session = Depends(get_db)):
     """Create new user"""
     try:
-        return crud.create_user(db, user)
+        return await crud.create_user(db, user)
     except crud.UsernameNotUnique:
         raise HTTPException(status_code=400, detail=error_details.USERNAME_IS_NOT_UNIQUE)
 
 
 @router.delete('/{user_id}')
-def delete(user_id: int,
-           current_user: User = Depends(get_current_user),
-           db: Session = Depends(get_db)):
+@query_budget(7)
+async def delete(user_id: int,
+                 current_user: Principal = Depends(get_current_user),
+                 db: Session = Depends(get_db)):
     """Delete user"""
     if not current_user.user_id == user_id:
         raise HTTPException(status_code=403, detail=error_details.USER_NOT_AUTHORIZED)
-    response = crud.disable_user(db, user_id)
+    response = await crud.disable_user(db, user_id)
     if response is None:
         raise HTTPException(status_code=404)
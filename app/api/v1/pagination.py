@@ -0,0 +1,63 @@
+"""
+Keyset (cursor) pagination of list routes
+
+Cursor is an opaque url-safe token encoding the last primary key of the previous page,
+so every page is fetched with an index range scan regardless of its depth
+"""
+import base64
+from typing import Union
+
+from fastapi import HTTPException, Query, Response
+
+from app.api.v1.endpoints import pagination_errors as error_details
+
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def encode_cursor(key: int) -> str:
+    return base64.urlsafe_b64encode(str(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode cursor into primary key value
+    :param cursor:
+    :return:
+    :raises ValueError: if the cursor is malformed
+    """
+    return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+
+
+class Page:
+    """
+    Page request parameters
+    """
+
+    def __init__(self, after: Union[int, None], limit: int):
+        self.after = after
+        self.limit = limit
+
+    def set_next_cursor(self, response: Response, rows: list, key: str):
+        """
+        Set next page cursor header if the page is full
+        :param response:
+        :param rows: page rows
+        :param key: name of the key attribute of rows
+        :return:
+        """
+        if len(rows) == self.limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(rows[-1], key))
+
+
+def get_page(after: str = Query(None, description='Cursor returned in X-Next-Cursor header'),
+             limit: int = Query(100, ge=1, le=1000)) -> Page:
+    """
+    Page parameters dependency
+    """
+    if after is None:
+        return Page(after=None, limit=limit)
+    try:
+        return Page(after=decode_cursor(after), limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=error_details.INVALID_CURSOR)
@@ -0,0 +1,60 @@
+"""
+Route class with fast ORM serialization
+"""
+import asyncio
+from functools import wraps
+from typing import Any, Callable, get_args, get_origin
+
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from app.config import settings
+from app.core.serialization import get_serializer
+
+
+def serialized_endpoint(endpoint: Callable, response_model: Any, status_code: int = None) -> Callable:
+    """
+    Wrap endpoint to render its ORM result with compiled serializer of the response model
+    :param endpoint:
+    :param response_model: schema or list of schema
+    :param status_code: route status code
+    :return: wrapped endpoint or the endpoint itself if response model is not supported
+    """
+    many = get_origin(response_model) is list
+    schema = get_args(response_model)[0] if many else response_model
+    if not (isinstance(schema, type) and issubclass(schema, BaseModel)):
+        return endpoint
+    serializer = get_serializer(schema)
+    is_coroutine = asyncio.iscoroutinefunction(endpoint)
+
+    @wraps(endpoint)
+    async def wrapper(**kwargs):
+        result = await endpoint(**kwargs) if is_coroutine else await run_in_threadpool(endpoint, **kwargs)
+        if isinstance(result, Response):
+            return result
+        response = ORJSONResponse(serializer.dump_many(result) if many else serializer.dump(result),
+                                  status_code=status_code or 200)
+        # headers and status code set by the endpoint on the injected response are not applied
+        # by FastAPI to returned responses, so they are copied here
+        for value in kwargs.values():
+            if isinstance(value, Response):
+                response.headers.update(value.headers)
+                if value.status_code:
+                    response.status_code = value.status_code
+        return response
+
+    return wrapper
+
+
+class SerializedRoute(APIRoute):
+    """
+    Route rendering ORM results without response model validation when fast serialization is enabled
+    """
+
+    def __init__(self, path: str, endpoint: Callable, *, response_model: Any = None, **kwargs):
+        if settings.fast_serialization and response_model is not None:
+            endpoint = serialized_endpoint(endpoint, response_model, kwargs.get('status_code'))
+        super().__init__(path, endpoint, response_model=response_model, **kwargs)
@@ -0,0 +1,83 @@
+"""
+Server-Sent Events feeds of join requests
+
+A feed sends heartbeat comments while idle and is closed after sse_connection_ttl, clients reconnect
+with Last-Event-ID header and get the events they missed from the replay buffer of the worker
+"""
+import asyncio
+from typing import AsyncIterator, Union
+
+import orjson
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.config import settings
+from app.core.auth import Principal
+from app.core.broadcast import Connection, QueueOverflow
+from app.core.events import GameEvent
+from app.core.feeds import Subscription, join_request_feeds
+
+
+SSE_MEDIA_TYPE = 'text/event-stream'
+# reconnection delay of clients (milliseconds)
+RETRY = 3000
+HEARTBEAT = b': heartbeat\n\n'
+# the last event id of the client is unknown, it has to refetch join requests
+RESET = b'event: reset\ndata: {}\n\n'
+
+
+def format_event(game_event: GameEvent) -> bytes:
+    return b'id: %s\nevent: %s\ndata: %s\n\n' % (game_event.event_id.encode(), game_event.type.encode(),
+                                                  orjson.dumps(game_event.data))
+
+
+async def _iter_feed(subscription: Subscription, last_event_id: Union[str, None]) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.sse_connection_ttl
+    try:
+        yield b'retry: %d\n\n' % RETRY
+        replayed = set()
+        if last_event_id:
+            events = join_request_feeds.replay(subscription, last_event_id)
+            if events is None:
+                yield RESET
+            elif events:
+                replayed = {game_event.event_id for game_event in events}
+                yield b''.join(format_event(game_event) for game_event in events)
+        while True:
+            timeout = min(settings.sse_heartbeat_interval, deadline - loop.time())
+            if timeout <= 0:
+                return
+            try:
+                events = await asyncio.wait_for(subscription.connection.get(), timeout)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+            # events committed while the feed was replayed are queued as well
+            chunk = b''.join(format_event(game_event) for game_event in events
+                             if game_event.event_id not in replayed)
+            if chunk:
+                yield chunk
+    except QueueOverflow:
+        # the client resumes from the replay buffer after reconnecting
+        return
+    finally:
+        join_request_feeds.unsubscribe(subscription)
+
+
+def join_request_feed_response(user: Principal, last_event_id: Union[str, None]) -> StreamingResponse:
+    """
+    Stream join request events of the user: requests of the user and requests to games of the user
+    :param user:
+    :param last_event_id: Last-Event-ID header of a reconnecting client
+    :return:
+    :raises FeedsExhausted: if the worker has no feed connections left
+    """
+    subscription = join_request_feeds.subscribe(user, Connection(settings.sse_queue_size))
+    return StreamingResponse(
+        _iter_feed(subscription, last_event_id),
+        media_type=SSE_MEDIA_TYPE,
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        # the feed is closed also when the response fails before streaming
+        background=BackgroundTask(join_request_feeds.unsubscribe, subscription)
+    )
@@ -0,0 +1,67 @@
+"""
+Streaming NDJSON export of collections
+
+Rows are fetched through a server-side cursor in batches and every batch is written to the response
+as soon as it is fetched, so memory stays flat regardless of collection size
+"""
+from typing import AsyncIterator, Iterator, Type
+
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.config import settings
+from app.core.serialization import ORMSerializer, get_serializer
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def wants_ndjson(request: Request) -> bool:
+    """
+    Check if the client asked for NDJSON stream in Accept header
+    :param request:
+    :return:
+    """
+    return NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def _render(serializer: ORMSerializer, rows: list) -> bytes:
+    return b''.join(orjson.dumps(row) + b'\n' for row in serializer.dump_many(rows))
+
+
+def _iter_ndjson(db: Session, statement: Select, serializer: ORMSerializer, batch_size: int) -> Iterator[bytes]:
+    result = db.execute(statement.execution_options(stream_results=True, max_row_buffer=batch_size))
+    for rows in result.scalars().partitions(batch_size):
+        yield _render(serializer, rows)
+
+
+async def _aiter_ndjson(db: AsyncSession,
+                        statement: Select,
+                        serializer: ORMSerializer,
+                        batch_size: int) -> AsyncIterator[bytes]:
+    result = await db.stream(statement.execution_options(max_row_buffer=batch_size))
+    async for rows in result.scalars().partitions(batch_size):
+        yield _render(serializer, rows)
+
+
+def ndjson_response(db, statement: Select, schema: Type[BaseModel]) -> StreamingResponse:
+    """
+    Stream rows of the statement as NDJSON
+    :param db: Session or AsyncSession
+    :param statement: select of ORM entities
+    :param schema: schema of the rows
+    :return:
+    """
+    serializer = get_serializer(schema)
+    batch_size = settings.export_batch_size
+    if isinstance(db, AsyncSession):
+        content = _aiter_ndjson(db, statement, serializer, batch_size)
+    else:
+        # sync iterator is consumed by starlette in the threadpool
+        content = _iter_ndjson(db, statement, serializer, batch_size)
+    return StreamingResponse(content, media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,56 @@
+"""
+WebSocket channels of games
+
+Every connection has a sender task draining its send queue and a receiver task watching for
+the disconnect, the connection is served until either of them finishes
+"""
+import asyncio
+
+import orjson
+from fastapi import WebSocket, status
+
+from app.config import settings
+from app.core.broadcast import Connection, QueueOverflow, game_channels
+
+
+async def _send(websocket: WebSocket, connection: Connection):
+    while True:
+        for message in await connection.get():
+            await websocket.send_text(orjson.dumps(message).decode())
+
+
+async def _receive(websocket: WebSocket):
+    # messages of clients are not expected, they are read only to notice the disconnect
+    while True:
+        message = await websocket.receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+
+
+async def serve_game_channel(websocket: WebSocket, game_id: int, user_id: int = None):
+    """
+    Accept the WebSocket and push events of the game until the client disconnects.
+    Clients which don't keep up with the events are disconnected with 1013 (try again later)
+    :param websocket:
+    :param game_id:
+    :param user_id: push only events of join requests of the user
+    :return:
+    """
+    connection = Connection(settings.ws_send_queue_size, user_id)
+    # subscribe before the handshake completes, so no event committed after it is missed
+    game_channels.subscribe(game_id, connection)
+    try:
+        await websocket.accept()
+    except Exception:
+        game_channels.unsubscribe(game_id, connection)
+        raise
+    sender = asyncio.create_task(_send(websocket, connection))
+    receiver = asyncio.create_task(_receive(websocket))
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        game_channels.unsubscribe(game_id, connection)
+        sender.cancel()
+        receiver.cancel()
+    if connection.overflowed:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
@@ -2,6 +2,7 @@
 Dragonroll Gameserver configuration
 """
 
+from typing import Optional
 from pydantic import BaseSettings
 
 
@@ -10,8 +11,55 @@ class Settings(BaseSettings):
     db_uri: str
     dev_mode: bool = True
     drop_db: bool = False
+    # orjson responses and ORM serialization without response model validation
+    fast_serialization: bool = False
+    # rows fetched per round trip by streaming exports
+    export_batch_size: int = 1000
+    # report request SQL statistics to clients in Server-Timing header
+    server_timing: bool = False
+    # check SQL statement budgets of endpoints, see app.core.query_budget
+    query_budgets: bool = False
+    # max number of queued events of a WebSocket connection, slower clients are disconnected
+    ws_send_queue_size: int = 256
 
+    # join request feeds (Server-Sent Events)
+    # max number of open feeds of a worker, further clients get 503
+    sse_max_connections: int = 1000
+    # interval (seconds) of heartbeat comments keeping idle feeds open through proxies
+    sse_heartbeat_interval: float = 15
+    # feeds are closed after the time (seconds) and resumed by clients, so connections rebalance between workers
+    sse_connection_ttl: float = 600
+    # join request events kept by a worker for resuming feeds
+    sse_replay_size: int = 1000
+    sse_queue_size: int = 256
 
-settings = Settings()
+    # game events delivery to all workers: 'memory' (single worker) or 'postgres' (LISTEN/NOTIFY)
+    event_bus: str = 'memory'
+    # database of postgres event bus, db_uri by default
+    event_bus_uri: Optional[str] = None
+    event_bus_channel: str = 'game_events'
+    # events committed within the interval (seconds) are sent by a single NOTIFY
+    event_bus_batch_interval: float = 0.02
+
+    # async database access
+    db_async: bool = False
+    db_async_uri: Optional[str] = None
+
+    # database connection pool
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    db_pool_timeout: int = 30
+    db_pool_warmup: bool = True
 
+    # authenticated users cache
+    auth_cache_size: int = 10000
+    auth_cache_ttl: float = 60
 
+    # adventures cache
+    adventure_cache_size: int = 64 * 1024 * 1024
+    adventure_latest_ttl: float = 5
+
+
+settings = Settings()
@@ -0,0 +1,90 @@
+"""
+Authenticated users (principals) resolution
+
+Principals are cached by every worker, changes of users and their owned games and characters
+invalidate the caches of all workers by events of the event bus
+"""
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.cache import TTLCache
+from app.core.events import GameEvent, add_handler, publish
+
+
+PRINCIPAL_INVALIDATED = 'principal_invalidated'
+
+
+class Principal:
+    """
+    Authenticated user resolved from bearer credentials.
+    Keeps only the data needed for permission checks, so it can be cached between requests
+    """
+
+    __slots__ = ('user_id', 'username', 'disabled', 'game_ids', 'character_ids')
+
+    def __init__(self,
+                 user_id: int,
+                 username: str,
+                 disabled: bool,
+                 game_ids: frozenset[int],
+                 character_ids: frozenset[int]):
+        self.user_id = user_id
+        self.username = username
+        self.disabled = disabled
+        self.game_ids = game_ids
+        self.character_ids = character_ids
+
+    def is_gm(self, game_id: int) -> bool:
+        """
+        Returns True if the user owns the game
+        :param game_id:
+        :return:
+        """
+        return game_id in self.game_ids
+
+    def owns_character(self, character_id: int) -> bool:
+        """
+        Check if the user owns the character with specified id
+        :param character_id:
+        :return:
+        """
+        return character_id in self.character_ids
+
+
+class PrincipalCache(TTLCache):
+    """
+    Principals cache keyed by bearer credentials
+    """
+
+    def invalidate_user(self, user_id: int) -> int:
+        """
+        Drop cached principals of the user, has to be called when user's row or owned games/characters change
+        :param user_id:
+        :return:
+        """
+        return self.pop_where(lambda principal: principal.user_id == user_id)
+
+    def dispatch(self, events: list[GameEvent]):
+        """
+        Drop cached principals of users invalidated by other workers (or by this one)
+        :param events:
+        :return:
+        """
+        for game_event in events:
+            if game_event.type == PRINCIPAL_INVALIDATED:
+                self.invalidate_user(game_event.data['user_id'])
+
+
+def publish_principal_invalidated(db: Session, user_id: int):
+    """
+    Invalidate cached principals of the user in all workers once the transaction commits,
+    the cache of this worker is invalidated right after the commit by invalidate_user
+    :param db:
+    :param user_id:
+    :return:
+    """
+    publish(db, GameEvent(None, PRINCIPAL_INVALIDATED, {'user_id': user_id}))
+
+
+principal_cache = PrincipalCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+add_handler(principal_cache.dispatch)
@@ -0,0 +1,130 @@
+"""
+Game channels broadcasting committed game events to WebSocket subscribers
+
+Every subscriber has a bounded send queue. Queued events with equal keys are coalesced, so a slow
+subscriber receives only the latest state of a game or join request; a subscriber whose queue
+overflows anyway is disconnected and has to resync after reconnecting
+"""
+import asyncio
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+from typing import Any
+
+from app.core.events import JOIN_REQUEST_EVENTS, GameEvent, add_handler
+
+
+class QueueOverflow(Exception):
+    pass
+
+
+class Connection:
+    """
+    Send queue of a subscriber, bound to the event loop serving the subscriber
+
+    user_id - if set, the subscriber gets only events of join requests of the user
+    """
+
+    def __init__(self, max_queue_size: int, user_id: int = None):
+        self.loop = asyncio.get_running_loop()
+        self.max_queue_size = max_queue_size
+        self.user_id = user_id
+        self.overflowed = False
+        self.coalesced = 0
+        self._messages: OrderedDict[Any, Any] = OrderedDict()
+        self._sequence = count()
+        self._ready = asyncio.Event()
+
+    def wants(self, game_event: GameEvent) -> bool:
+        return self.user_id is None or (game_event.type in JOIN_REQUEST_EVENTS
+                                        and game_event.data['user_id'] == self.user_id)
+
+    def put(self, message: Any, key: str = None):
+        """
+        Queue message, may be called from any thread
+        :param message:
+        :param key: coalescing key, a queued message with the same key is replaced
+        :return:
+        """
+        self.loop.call_soon_threadsafe(self._put, message, key)
+
+    def _put(self, message: Any, key: str = None):
+        if self.overflowed:
+            return
+        if key is not None and key in self._messages:
+            self._messages[key] = message
+            self.coalesced += 1
+            return
+        if len(self._messages) >= self.max_queue_size:
+            self.overflowed = True
+        else:
+            self._messages[key if key is not None else next(self._sequence)] = message
+        self._ready.set()
+
+    async def get(self) -> list:
+        """
+        Wait for queued messages and take all of them
+        :return:
+        :raises QueueOverflow: if the subscriber didn't keep up with the messages
+        """
+        await self._ready.wait()
+        if self.overflowed:
+            raise QueueOverflow
+        messages = list(self._messages.values())
+        self._messages.clear()
+        self._ready.clear()
+        return messages
+
+
+class GameChannels:
+    """
+    Subscribers of games
+    """
+
+    def __init__(self):
+        self._channels: dict[int, set[Connection]] = {}
+        self._lock = Lock()
+
+    def subscribe(self, game_id: int, connection: Connection):
+        with self._lock:
+            self._channels.setdefault(game_id, set()).add(connection)
+
+    def unsubscribe(self, game_id: int, connection: Connection):
+        with self._lock:
+            connections = self._channels.get(game_id)
+            if connections is not None:
+                connections.discard(connection)
+                if not connections:
+                    del self._channels[game_id]
+
+    def dispatch(self, events: list[GameEvent]):
+        """
+        Queue events to the subscribers of their games
+        :param events:
+        :return:
+        """
+        for game_event in events:
+            with self._lock:
+                connections = tuple(self._channels.get(game_event.game_id, ()))
+            if not connections:
+                continue
+            message = game_event.message()
+            for connection in connections:
+                if not connection.wants(game_event):
+                    continue
+                try:
+                    connection.put(message, game_event.key)
+                except RuntimeError:
+                    # event loop of the connection is closed
+                    self.unsubscribe(game_event.game_id, connection)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'games': len(self._channels),
+                'connections': sum(len(connections) for connections in self._channels.values())
+            }
+
+
+game_channels = GameChannels()
+add_handler(game_channels.dispatch)
@@ -0,0 +1,165 @@
+"""
+Game events
+
+CRUD functions publish events of committed changes: events are collected on the session and
+handed to the event bus only after the transaction commits, events of rolled back transactions are dropped.
+The bus delivers events to the handlers (e.g. WebSocket channels) of every worker process: the default
+in-process bus serves a single worker, see app.core.pg_events for the Postgres LISTEN/NOTIFY bus
+"""
+import logging
+import uuid
+from typing import Any, Callable, Union
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class GameEvent:
+    """
+    Change of a game or its join requests, events without game_id concern all workers (e.g. cache invalidation)
+
+    key - events of a game with equal keys supersede each other, so only the latest one has to be
+    delivered to a slow subscriber (e.g. 'game' for game state, 'join_request:1' for a join request status)
+    event_id - unique id assigned by the publishing process, the same in every worker the event is delivered to
+    """
+
+    __slots__ = ('game_id', 'type', 'data', 'key', 'event_id')
+
+    def __init__(self,
+                 game_id: Union[int, None],
+                 type_: str,
+                 data: dict[str, Any],
+                 key: Union[str, None] = None,
+                 event_id: Union[str, None] = None):
+        self.game_id = game_id
+        self.type = type_
+        self.data = data
+        self.key = key
+        self.event_id = event_id or uuid.uuid4().hex
+
+    def message(self) -> dict[str, Any]:
+        return {'type': self.type, 'game_id': self.game_id, 'data': self.data}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {'game_id': self.game_id, 'type': self.type, 'data': self.data, 'key': self.key,
+                'event_id': self.event_id}
+
+    @classmethod
+    def from_dict(cls, value: dict[str, Any]) -> 'GameEvent':
+        return cls(value['game_id'], value['type'], value['data'], value['key'], value['event_id'])
+
+
+# events of join requests, their data has the request author in user_id
+JOIN_REQUEST_EVENTS = frozenset({'join_request_created', 'join_request_accepted', 'join_request_declined'})
+
+EventsHandler = Callable[[list[GameEvent]], None]
+
+_handlers: list[EventsHandler] = []
+
+
+def add_handler(handler: EventsHandler):
+    """
+    Register handler of committed events. Handlers are called in the thread which committed the
+    transaction or in a thread of the event bus, so they have to be thread-safe and must not block
+    :param handler:
+    :return:
+    """
+    _handlers.append(handler)
+
+
+def remove_handler(handler: EventsHandler):
+    _handlers.remove(handler)
+
+
+def dispatch(events: list[GameEvent]):
+    """
+    Hand events to the handlers of this process
+    :param events:
+    :return:
+    """
+    for handler in _handlers:
+        try:
+            handler(events)
+        except Exception:
+            logger.exception('Game events handler %r failed', handler)
+
+
+class EventBus:
+    """
+    In-process event bus, delivers events to the handlers of this process right away
+    """
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, events: list[GameEvent]):
+        """
+        Deliver committed events to the handlers of all processes, must not block
+        :param events:
+        :return:
+        """
+        dispatch(events)
+
+
+_event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    return _event_bus
+
+
+def set_event_bus(event_bus: EventBus):
+    global _event_bus
+    _event_bus = event_bus
+
+
+def create_event_bus(backend: str) -> EventBus:
+    """
+    Create event bus of the backend configured in settings
+    :param backend: 'memory' or 'postgres'
+    :return:
+    """
+    if backend == 'postgres':
+        # the driver is needed only by this backend
+        from app.core.pg_events import PostgresEventBus
+        return PostgresEventBus(settings.event_bus_uri or settings.db_uri,
+                                channel=settings.event_bus_channel,
+                                batch_interval=settings.event_bus_batch_interval)
+    if backend == 'memory':
+        return EventBus()
+    raise ValueError(f'Unknown event bus backend {backend}')
+
+
+def publish(db: Session, game_event: GameEvent):
+    """
+    Publish event once the current transaction of the session commits
+    :param db:
+    :param game_event:
+    :return:
+    """
+    if not db.in_transaction():
+        # events belong to a transaction, so they are dropped by its rollback
+        db.begin()
+    db.info.setdefault('game_events', []).append(game_event)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session: Session):
+    events = session.info.pop('game_events', None)
+    if events:
+        _event_bus.publish(events)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session: Session, previous_transaction):
+    # soft rollback is fired also for sessions without database connection
+    if previous_transaction.parent is None:
+        session.info.pop('game_events', None)
@@ -0,0 +1,145 @@
+"""
+Join request feeds of users
+
+Committed join request events are kept in a bounded replay buffer of the worker and queued to the
+feed subscriptions of the users they concern: the author of the request and the GM of the game.
+A reconnecting client resumes after the last event it received as long as the event is still buffered.
+Event ids are assigned by the publishing process and the postgres event bus delivers events to all
+workers in the same order, so a feed may be resumed on any worker
+"""
+from collections import deque
+from threading import Lock
+from typing import Union
+
+from app.config import settings
+from app.core.auth import Principal
+from app.core.broadcast import Connection
+from app.core.events import JOIN_REQUEST_EVENTS, GameEvent, add_handler
+
+
+class FeedsExhausted(Exception):
+    """
+    The worker already serves as many feed connections as allowed
+    """
+
+
+class Subscription:
+    """
+    Feed of a user served by a connection. Games of the user are taken when the feed is opened,
+    requests to games created later are delivered after reconnecting
+    """
+
+    __slots__ = ('user_id', 'game_ids', 'connection', 'closed')
+
+    def __init__(self, user_id: int, game_ids: frozenset[int], connection: Connection):
+        self.user_id = user_id
+        self.game_ids = game_ids
+        self.connection = connection
+        self.closed = False
+
+    def wants(self, game_event: GameEvent) -> bool:
+        return game_event.data['user_id'] == self.user_id or game_event.game_id in self.game_ids
+
+
+def _discard(index: dict[int, set[Subscription]], key: int, subscription: Subscription):
+    subscriptions = index.get(key)
+    if subscriptions is not None:
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del index[key]
+
+
+class JoinRequestFeeds:
+    """
+    Feed subscriptions of a worker indexed by users and games
+    """
+
+    def __init__(self, replay_size: int, max_connections: int):
+        self.max_connections = max_connections
+        self._buffer: deque[GameEvent] = deque(maxlen=replay_size)
+        self._by_user: dict[int, set[Subscription]] = {}
+        self._by_game: dict[int, set[Subscription]] = {}
+        self._connections = 0
+        self._lock = Lock()
+
+    def subscribe(self, user: Principal, connection: Connection) -> Subscription:
+        """
+        Open feed of the user
+        :param user:
+        :param connection:
+        :return:
+        :raises FeedsExhausted: if there are max_connections open feeds
+        """
+        subscription = Subscription(user.user_id, user.game_ids, connection)
+        with self._lock:
+            if self._connections >= self.max_connections:
+                raise FeedsExhausted
+            self._connections += 1
+            self._by_user.setdefault(user.user_id, set()).add(subscription)
+            for game_id in user.game_ids:
+                self._by_game.setdefault(game_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Close the feed, closing an already closed feed is a no-op
+        :param subscription:
+        :return:
+        """
+        with self._lock:
+            if subscription.closed:
+                return
+            subscription.closed = True
+            self._connections -= 1
+            _discard(self._by_user, subscription.user_id, subscription)
+            for game_id in subscription.game_ids:
+                _discard(self._by_game, game_id, subscription)
+
+    def replay(self, subscription: Subscription, last_event_id: str) -> Union[list[GameEvent], None]:
+        """
+        Get buffered events of the feed which follow the event
+        :param subscription:
+        :param last_event_id: id of the last event received by the client
+        :return: None if the event is not buffered (anymore), the client has to resync
+        """
+        with self._lock:
+            events = list(self._buffer)
+        for position in range(len(events) - 1, -1, -1):
+            if events[position].event_id == last_event_id:
+                return [game_event for game_event in events[position + 1:] if subscription.wants(game_event)]
+        return None
+
+    def dispatch(self, events: list[GameEvent]):
+        """
+        Buffer join request events and queue them to the feeds of their users
+        :param events:
+        :return:
+        """
+        for game_event in events:
+            if game_event.type not in JOIN_REQUEST_EVENTS:
+                continue
+            with self._lock:
+                # buffered and looked up at once, so a feed gets an event either by replay or by its queue
+                self._buffer.append(game_event)
+                subscriptions = (self._by_user.get(game_event.data['user_id'], set())
+                                 | self._by_game.get(game_event.game_id, set()))
+            for subscription in subscriptions:
+                try:
+                    subscription.connection.put(game_event, game_event.key)
+                except RuntimeError:
+                    # event loop of the connection is closed
+                    self.unsubscribe(subscription)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'connections': self._connections,
+                'max_connections': self.max_connections,
+                'users': len(self._by_user),
+                'buffered_events': len(self._buffer)
+            }
+
+
+join_request_feeds = JoinRequestFeeds(replay_size=settings.sse_replay_size,
+                                      max_connections=settings.sse_max_connections)
+add_handler(join_request_feeds.dispatch)
@@ -0,0 +1,203 @@
+"""
+Request and SQL metrics
+
+Every HTTP request gets RequestStats in a context variable, SQL statements executed while handling
+the request (in the event loop, threadpool workers or AsyncSession greenlets) are accounted to it by
+engine event hooks. Aggregated metrics are rendered in Prometheus text exposition format
+"""
+import time
+from bisect import bisect_left
+from collections import Counter as StatementCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Iterator, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestStats:
+    """
+    SQL statistics of a single request
+
+    statement_counts - executions of every statement text, kept only when tracking is requested
+    """
+
+    __slots__ = ('statements', 'db_time', 'rows', 'statement_counts')
+
+    def __init__(self, track_statements: bool = False):
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.statement_counts = StatementCounter() if track_statements else None
+
+
+class QueryLog:
+    """
+    Statements executed by any engine while the log is active, see count_queries
+    """
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        """
+        Get statements executed at least threshold times, which usually are N+1 lazy loads
+        :param threshold:
+        :return: statement -> number of executions
+        """
+        return {statement: count for statement, count in StatementCounter(self.statements).items()
+                if count >= threshold}
+
+
+_query_logs: list[QueryLog] = []
+_query_logs_lock = Lock()
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryLog]:
+    """
+    Record statements executed in any thread while the context is active (meant for tests)
+    :return:
+    """
+    log = QueryLog()
+    with _query_logs_lock:
+        _query_logs.append(log)
+    try:
+        yield log
+    finally:
+        with _query_logs_lock:
+            _query_logs.remove(log)
+
+
+request_stats: ContextVar[Union[RequestStats, None]] = ContextVar('request_stats', default=None)
+
+
+def format_labels(labels: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return ','.join(f'{label}="{value}"' for label, value in zip(labels, values))
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with labels
+    """
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [bucket counts..., +Inf count], sum
+        self._series: dict[tuple, tuple[list[int], list[float]]] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total) in self._series.items():
+                labels = format_labels(self.labels, label_values)
+                cumulative = 0
+                for bound, count in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{{labels}}} {total[0]}')
+                lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """
+    Prometheus-style counter with labels
+    """
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._series: dict[tuple, float] = {}
+        self._lock = Lock()
+
+    def inc(self, *label_values: str, value: float = 1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in self._series.items():
+                lines.append(f'{self.name}{{{format_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+ROUTE_LABELS = ('method', 'route')
+
+requests_total = Counter('http_requests_total', 'HTTP requests', ('method', 'route', 'status'))
+request_duration = Histogram('http_request_duration_seconds', 'HTTP request latency',
+                             ROUTE_LABELS, LATENCY_BUCKETS)
+request_db_statements = Histogram('http_request_db_statements', 'SQL statements executed per request',
+                                  ROUTE_LABELS, COUNT_BUCKETS)
+request_db_duration = Histogram('http_request_db_duration_seconds', 'Time spent in SQL statements per request',
+                                ROUTE_LABELS, LATENCY_BUCKETS)
+request_db_rows = Histogram('http_request_db_rows', 'Rows returned or affected by SQL statements per request',
+                            ROUTE_LABELS, COUNT_BUCKETS)
+
+METRICS = (requests_total, request_duration, request_db_statements, request_db_duration, request_db_rows)
+
+
+def observe_request(method: str, route: str, status: int, duration: float, stats: RequestStats):
+    requests_total.inc(method, route, str(status))
+    request_duration.observe(duration, method, route)
+    request_db_statements.observe(stats.statements, method, route)
+    request_db_duration.observe(stats.db_time, method, route)
+    request_db_rows.observe(stats.rows, method, route)
+
+
+def render_metrics() -> str:
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context, which is dropped with the statement even if it fails
+    # (only a few dialect initialization statements run without context, they aren't timed)
+    if context is not None:
+        context.query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, 'query_started_at', None)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        if started_at is not None:
+            stats.db_time += time.perf_counter() - started_at
+        # drivers report -1 when the row count is unknown (e.g. sqlite selects)
+        stats.rows += max(cursor.rowcount, 0)
+        if stats.statement_counts is not None:
+            stats.statement_counts[statement] += 1
+    for log in tuple(_query_logs):
+        log.statements.append(statement)
+
+
+def instrument_engine(engine: Engine):
+    """
+    Account SQL statements of the engine to the current request
+    :param engine: sync engine, for AsyncEngine pass its sync_engine
+    :return:
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,236 @@
+"""
+Dice engine
+
+Dice notation is compiled once into a DiceExpression, which rolls all of its dice with NumPy:
+a batch of rolls is a single array operation per term, so millions of rolls take a fraction of a second.
+
+Notation: terms joined by + and -, a term is a constant or [count]d<sides>[!][modifier], e.g. 4d6kh3+2
+    d%      - d100
+    !       - exploding dice, a die showing its max is rolled again and added (before keep/drop)
+    kh<n>   - keep n highest dice (k<n> as well), kl<n> - keep n lowest dice
+    dl<n>   - drop n lowest dice (d<n> as well), dh<n> - drop n highest dice
+Advantage and disadvantage are modes of compilation, they turn every single d20 into 2d20kh1 or 2d20kl1
+"""
+import re
+from functools import lru_cache
+from typing import Union
+
+import numpy as np
+
+
+NORMAL = 'normal'
+ADVANTAGE = 'advantage'
+DISADVANTAGE = 'disadvantage'
+MODES = (NORMAL, ADVANTAGE, DISADVANTAGE)
+
+MAX_TERMS = 20
+MAX_DICE = 100
+MAX_SIDES = 1000
+MAX_CONSTANT = 10000
+# rerolls of exploding dice are capped, more than a few are astronomically unlikely anyway
+MAX_EXPLOSIONS = 100
+# batches are rolled in chunks of rows to keep memory bounded
+CHUNK_SIZE = 1 << 18
+
+_SPACES = re.compile(r'\s*([+-])\s*')
+_TERM = re.compile(r'([+-])?(?:(\d*)d(\d+|%)(!)?(?:(kh|kl|k|dh|dl|d)(\d+))?|(\d+))')
+
+_rng = np.random.default_rng()
+
+
+class DiceNotationError(ValueError):
+    pass
+
+
+class DiceTerm:
+    """
+    Dice of the same kind: count dice with sides faces, keep dice are kept (all when None)
+    """
+
+    __slots__ = ('count', 'sides', 'explode', 'keep', 'keep_lowest', 'sign')
+
+    def __init__(self,
+                 count: int,
+                 sides: int,
+                 explode: bool = False,
+                 keep: Union[int, None] = None,
+                 keep_lowest: bool = False,
+                 sign: int = 1):
+        self.count = count
+        self.sides = sides
+        self.explode = explode
+        self.keep = keep
+        self.keep_lowest = keep_lowest
+        self.sign = sign
+
+    def faces(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """
+        Roll the dice n times
+        :param rng:
+        :param n:
+        :return: (n, count) array of dice values, exploded dice hold the sum of their rerolls
+        """
+        faces = rng.integers(1, self.sides + 1, size=(n, self.count), dtype=np.int32)
+        if self.explode:
+            exploding = faces == self.sides
+            for _ in range(MAX_EXPLOSIONS):
+                exploded = np.count_nonzero(exploding)
+                if not exploded:
+                    break
+                rerolls = rng.integers(1, self.sides + 1, size=exploded, dtype=np.int32)
+                faces[exploding] += rerolls
+                exploding[exploding] = rerolls == self.sides
+        return faces
+
+    def kept(self, faces: np.ndarray) -> np.ndarray:
+        """
+        Get dice kept by the term
+        :param faces: (n, count) array of dice values
+        :return: (n, keep) array
+        """
+        if self.keep is None or self.keep == self.count:
+            return faces
+        if self.keep_lowest:
+            return np.partition(faces, self.keep - 1, axis=1)[:, :self.keep]
+        return np.partition(faces, self.count - self.keep, axis=1)[:, self.count - self.keep:]
+
+    def __str__(self) -> str:
+        notation = f'{self.count}d{self.sides}' + ('!' if self.explode else '')
+        if self.keep is not None:
+            notation += f'{"kl" if self.keep_lowest else "kh"}{self.keep}'
+        return notation
+
+
+class Roll:
+    """
+    Outcome of a single roll: the total and dice values of every term
+    """
+
+    __slots__ = ('total', 'dice')
+
+    def __init__(self, total: int, dice: list[list[int]]):
+        self.total = total
+        self.dice = dice
+
+
+class DiceExpression:
+    """
+    Compiled dice notation
+    """
+
+    def __init__(self, terms: list[DiceTerm], constant: int, mode: str = NORMAL):
+        self.terms = terms
+        self.constant = constant
+        self.mode = mode
+        parts = [('-' if term.sign < 0 else '+') + str(term) for term in terms]
+        if constant or not terms:
+            parts.append(f'{constant:+d}')
+        self.notation = ''.join(parts).lstrip('+')
+
+    def roll(self, rng: np.random.Generator = None) -> Roll:
+        """
+        Roll the expression once
+        :param rng: random generator, shared generator by default
+        :return:
+        """
+        rng = rng or _rng
+        total = self.constant
+        dice = []
+        for term in self.terms:
+            faces = term.faces(rng, 1)
+            total += term.sign * int(term.kept(faces).sum())
+            dice.append(faces[0].tolist())
+        return Roll(total, dice)
+
+    def roll_many(self, n: int, rng: np.random.Generator = None) -> np.ndarray:
+        """
+        Roll the expression n times
+        :param n:
+        :param rng: random generator, shared generator by default
+        :return: array of n totals
+        """
+        rng = rng or _rng
+        totals = np.full(n, self.constant, dtype=np.int64)
+        for start in range(0, n, CHUNK_SIZE):
+            chunk = totals[start:start + CHUNK_SIZE]
+            for term in self.terms:
+                kept = term.kept(term.faces(rng, len(chunk))).sum(axis=1)
+                if term.sign < 0:
+                    chunk -= kept
+                else:
+                    chunk += kept
+        return totals
+
+    def __str__(self) -> str:
+        return self.notation
+
+
+def _apply_mode(term: DiceTerm, mode: str) -> DiceTerm:
+    if mode == NORMAL or term.count != 1 or term.sides != 20 or term.keep is not None:
+        return term
+    return DiceTerm(2, 20, term.explode, keep=1, keep_lowest=mode == DISADVANTAGE, sign=term.sign)
+
+
+def parse_dice(notation: str, mode: str = NORMAL) -> DiceExpression:
+    """
+    Parse dice notation
+    :param notation: e.g. 4d6kh3+2
+    :param mode: normal, advantage or disadvantage
+    :return:
+    :raises DiceNotationError:
+    """
+    if mode not in MODES:
+        raise DiceNotationError(f'Unknown mode {mode}')
+    source = _SPACES.sub(r'\1', notation.strip().lower())
+    if not source:
+        raise DiceNotationError('Empty dice notation')
+    terms = []
+    constant = 0
+    position = 0
+    while position < len(source):
+        match = _TERM.match(source, position)
+        if match is None or (position and match.group(1) is None):
+            raise DiceNotationError(f'Invalid dice notation {notation}')
+        sign_text, count_text, sides_text, explode, modifier, modifier_count, constant_text = match.groups()
+        sign = -1 if sign_text == '-' else 1
+        position = match.end()
+        if constant_text is not None:
+            value = int(constant_text)
+            if value > MAX_CONSTANT:
+                raise DiceNotationError(f'Constants are limited to {MAX_CONSTANT}')
+            constant += sign * value
+            continue
+        count = int(count_text) if count_text else 1
+        sides = 100 if sides_text == '%' else int(sides_text)
+        if not 1 <= count <= MAX_DICE:
+            raise DiceNotationError(f'Dice count must be between 1 and {MAX_DICE}')
+        if not 1 <= sides <= MAX_SIDES:
+            raise DiceNotationError(f'Dice sides must be between 1 and {MAX_SIDES}')
+        if explode and sides == 1:
+            raise DiceNotationError('One-sided dice can not explode')
+        keep = None
+        keep_lowest = False
+        if modifier is not None:
+            modifier_count = int(modifier_count)
+            if modifier.startswith('k'):
+                keep, keep_lowest = modifier_count, modifier == 'kl'
+            else:
+                keep, keep_lowest = count - modifier_count, modifier == 'dh'
+            if not 1 <= keep <= count:
+                raise DiceNotationError(f'Dice term {match.group(0).lstrip("+-")} keeps no dice or too many')
+        terms.append(_apply_mode(DiceTerm(count, sides, bool(explode), keep, keep_lowest, sign), mode))
+        if len(terms) > MAX_TERMS:
+            raise DiceNotationError(f'Dice notation is limited to {MAX_TERMS} dice terms')
+    return DiceExpression(terms, constant, mode)
+
+
+@lru_cache(maxsize=1024)
+def compile_dice(notation: str, mode: str = NORMAL) -> DiceExpression:
+    """
+    Get compiled expression of dice notation, expressions are cached
+    :param notation:
+    :param mode: normal, advantage or disadvantage
+    :return:
+    :raises DiceNotationError:
+    """
+    return parse_dice(notation, mode)
@@ -0,0 +1,128 @@
+"""
+Deterministic random streams of games
+
+Every game has a secret seed and every roll of the game gets the next value of the game counter.
+Random numbers of a roll come from Philox, a counter-based generator keyed by (seed, stream), starting
+at a counter block reserved for the roll, so the roll is regenerated from (seed, stream, counter) alone:
+outcomes aren't stored, and generators don't share state, so rolls in different threads need no locks.
+Stream is the id of the rolling character, GAME_STREAM for rolls of the game itself (e.g. by the GM)
+
+Outcomes are regenerated the same way only as long as the numbers are drawn the same way, so every roll
+is stamped with RNG_VERSION and rolls of other versions are not replayed
+"""
+import secrets
+from typing import Iterable, Union
+
+import numpy as np
+
+from app.core.operations.dice import Roll, compile_dice
+
+
+GAME_STREAM = 0
+# has to be increased on any change of the outcomes of a stream: the generator or its counter layout,
+# the dice engine (e.g. CHUNK_SIZE, MAX_EXPLOSIONS, the order of draws, keeping dice) or the numpy version
+RNG_VERSION = 1
+
+
+class RngVersionMismatch(Exception):
+    """
+    Roll was made by another version of the random streams, its outcome can't be regenerated
+    """
+
+
+def new_seed() -> int:
+    # fits signed 64-bit columns
+    return secrets.randbits(63)
+
+
+def _roll_counter(counter: int) -> np.ndarray:
+    # draws of a roll advance the lowest counter words, the roll counter is the highest one, so rolls never overlap
+    return np.array([0, 0, 0, counter], dtype=np.uint64)
+
+
+def stream_generator(seed: int, stream: int, counter: int) -> np.random.Generator:
+    """
+    Get generator of a roll
+    :param seed:
+    :param stream:
+    :param counter:
+    :return:
+    """
+    return np.random.Generator(np.random.Philox(key=[seed, stream], counter=_roll_counter(counter)))
+
+
+class _StreamRewinder:
+    """
+    Generator of a stream rewound to the start of a roll, which is cheaper than creating a new one per roll
+    """
+
+    def __init__(self, seed: int, stream: int):
+        self.bit_generator = np.random.Philox(key=[seed, stream])
+        self.generator = np.random.Generator(self.bit_generator)
+        self.initial_state = self.bit_generator.state
+
+    def rewind(self, counter: int) -> np.random.Generator:
+        state = self.initial_state
+        state['state']['counter'] = _roll_counter(counter)
+        self.bit_generator.state = state
+        return self.generator
+
+
+class StreamRoll:
+    """
+    Outcome of a roll of a stream: totals of every repetition, dice values of a single roll
+    """
+
+    __slots__ = ('totals', 'dice')
+
+    def __init__(self, totals: list[int], dice: Union[list[list[int]], None] = None):
+        self.totals = totals
+        self.dice = dice
+
+
+def roll_stream(seed: int,
+                stream: int,
+                counter: int,
+                notation: str,
+                mode: str = 'normal',
+                times: int = 1) -> StreamRoll:
+    """
+    Roll (or regenerate a roll of) dice notation with the generator of the roll
+    :param seed: game seed
+    :param stream: character id or GAME_STREAM
+    :param counter: roll counter
+    :param notation:
+    :param mode: normal, advantage or disadvantage
+    :param times: number of repetitions
+    :return:
+    """
+    return _roll(stream_generator(seed, stream, counter), notation, mode, times)
+
+
+def _roll(rng: np.random.Generator, notation: str, mode: str, times: int) -> StreamRoll:
+    expression = compile_dice(notation, mode)
+    if times == 1:
+        roll: Roll = expression.roll(rng)
+        return StreamRoll([roll.total], roll.dice)
+    return StreamRoll(expression.roll_many(times, rng).tolist())
+
+
+def replay(seed: int, rolls: Iterable) -> list[StreamRoll]:
+    """
+    Regenerate outcomes of rolls of a game
+    :param seed: game seed
+    :param rolls: objects with character_id, counter, notation, mode, times and rng_version attributes
+    :return: outcomes in order of the rolls
+    :raises RngVersionMismatch:
+    """
+    rewinders: dict[int, _StreamRewinder] = {}
+    outcomes = []
+    for roll in rolls:
+        if roll.rng_version != RNG_VERSION:
+            raise RngVersionMismatch
+        stream = roll.character_id or GAME_STREAM
+        rewinder = rewinders.get(stream)
+        if rewinder is None:
+            rewinder = rewinders[stream] = _StreamRewinder(seed, stream)
+        outcomes.append(_roll(rewinder.rewind(roll.counter), roll.notation, roll.mode, roll.times))
+    return outcomes
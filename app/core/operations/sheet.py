@@ -0,0 +1,135 @@
+"""
+Character sheet values derived from ability scores, level and proficiencies
+
+Derived bonuses are kept packed into BONUSES_SIZE signed bytes: modifiers of the six abilities,
+their saving throws and the skills, in this order. When a score, the level or proficiencies change,
+only the bonuses depending on them are recomputed
+"""
+from array import array
+from typing import Iterable
+
+SCORES = ('hp', 'ac', 'str', 'dex', 'con', 'int', 'wis', 'cha')
+ABILITIES = ('str', 'dex', 'con', 'int', 'wis', 'cha')
+SKILLS = (
+    ('acrobatics', 'dex'),
+    ('animal_handling', 'wis'),
+    ('arcana', 'int'),
+    ('athletics', 'str'),
+    ('deception', 'cha'),
+    ('history', 'int'),
+    ('insight', 'wis'),
+    ('intimidation', 'cha'),
+    ('investigation', 'int'),
+    ('medicine', 'wis'),
+    ('nature', 'int'),
+    ('perception', 'wis'),
+    ('performance', 'cha'),
+    ('persuasion', 'cha'),
+    ('religion', 'int'),
+    ('sleight_of_hand', 'dex'),
+    ('stealth', 'dex'),
+    ('survival', 'wis'),
+)
+SKILL_NAMES = tuple(skill for skill, _ in SKILLS)
+
+MAX_LEVEL = 20
+MAX_ABILITY_SCORE = 30
+
+SAVES_OFFSET = len(ABILITIES)
+SKILLS_OFFSET = 2 * len(ABILITIES)
+BONUSES_SIZE = SKILLS_OFFSET + len(SKILLS)
+
+
+def ability_modifier(score: int) -> int:
+    return score // 2 - 5
+
+
+def proficiency_bonus(level: int) -> int:
+    return 2 + (level - 1) // 4
+
+
+def to_mask(names: Iterable[str], all_names: tuple[str, ...]) -> int:
+    """
+    Pack names into a bit mask of their positions in all_names
+    :param names:
+    :param all_names:
+    :return:
+    """
+    mask = 0
+    for name in names:
+        mask |= 1 << all_names.index(name)
+    return mask
+
+
+def from_mask(mask: int, all_names: tuple[str, ...]) -> list[str]:
+    return [name for position, name in enumerate(all_names) if mask >> position & 1]
+
+
+# bonus slots depending on a sheet value
+_DEPENDENT_SLOTS: dict[str, tuple[int, ...]] = {
+    ability: (position, SAVES_OFFSET + position,
+              *(SKILLS_OFFSET + skill for skill, (_, skill_ability) in enumerate(SKILLS) if skill_ability == ability))
+    for position, ability in enumerate(ABILITIES)
+}
+_DEPENDENT_SLOTS['save_proficiencies'] = tuple(range(SAVES_OFFSET, SKILLS_OFFSET))
+_DEPENDENT_SLOTS['skill_proficiencies'] = tuple(range(SKILLS_OFFSET, BONUSES_SIZE))
+_DEPENDENT_SLOTS['level'] = _DEPENDENT_SLOTS['save_proficiencies'] + _DEPENDENT_SLOTS['skill_proficiencies']
+
+
+def _bonus(slot: int, scores: dict[str, int], level: int, save_proficiencies: int, skill_proficiencies: int) -> int:
+    if slot < SAVES_OFFSET:
+        return ability_modifier(scores[ABILITIES[slot]])
+    if slot < SKILLS_OFFSET:
+        position = slot - SAVES_OFFSET
+        ability, proficient = ABILITIES[position], save_proficiencies >> position & 1
+    else:
+        position = slot - SKILLS_OFFSET
+        ability, proficient = SKILLS[position][1], skill_proficiencies >> position & 1
+    return ability_modifier(scores[ability]) + (proficiency_bonus(level) if proficient else 0)
+
+
+def compute_bonuses(scores: dict[str, int], level: int, save_proficiencies: int, skill_proficiencies: int) -> bytes:
+    """
+    Compute all derived bonuses
+    :param scores: ability name -> score
+    :param level:
+    :param save_proficiencies: mask of ABILITIES
+    :param skill_proficiencies: mask of SKILLS
+    :return: packed bonuses
+    """
+    return array('b', (_bonus(slot, scores, level, save_proficiencies, skill_proficiencies)
+                       for slot in range(BONUSES_SIZE))).tobytes()
+
+
+def update_bonuses(bonuses: bytes,
+                   changed: Iterable[str],
+                   scores: dict[str, int],
+                   level: int,
+                   save_proficiencies: int,
+                   skill_proficiencies: int) -> bytes:
+    """
+    Recompute bonuses depending on changed values
+    :param bonuses: packed bonuses of the previous values
+    :param changed: names of changed abilities, 'level', 'save_proficiencies' or 'skill_proficiencies'
+    :param scores: ability name -> current score
+    :param level: current level
+    :param save_proficiencies: current mask of ABILITIES
+    :param skill_proficiencies: current mask of SKILLS
+    :return: packed bonuses
+    """
+    values = array('b', bonuses)
+    for slot in {slot for name in changed for slot in _DEPENDENT_SLOTS.get(name, ())}:
+        values[slot] = _bonus(slot, scores, level, save_proficiencies, skill_proficiencies)
+    return values.tobytes()
+
+
+def unpack_bonuses(bonuses: bytes) -> tuple[dict[str, int], dict[str, int], dict[str, int]]:
+    """
+    Unpack bonuses
+    :param bonuses:
+    :return: ability modifiers, saving throws and skill bonuses by names
+    """
+    values = array('b', bonuses)
+    return (dict(zip(ABILITIES, values[:SAVES_OFFSET])),
+            dict(zip(ABILITIES, values[SAVES_OFFSET:SKILLS_OFFSET])),
+            dict(zip(SKILL_NAMES, values[SKILLS_OFFSET:])))
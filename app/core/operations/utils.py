@@ -1,7 +1,16 @@
 """
 Utils
 """
-from random import randint
+from typing import Iterable, Union
+
+import numpy as np
+
+from app.core.operations.dice import compile_dice
+from app.core.operations.sheet import ABILITIES, BONUSES_SIZE, SCORES, SKILLS, proficiency_bonus
+
+
+# uniform 10..18
+ABILITY_ROLL = compile_dice('1d9+9')
 
 
 class CharacterAbilities:
@@ -17,27 +26,33 @@ class CharacterAbilities:
     int - Intelligence
     wis - Wisdom
     cha - Charisma
+
+    Values are kept in slots in the order of SCORES, see AbilitiesBatch for abilities of many characters
     """
 
-    def __init__(self, character_id):
+    __slots__ = ('_character_id', *(f'_ab_{score}' for score in SCORES))
+
+    def __init__(self, character_id, rng: np.random.Generator = None, scores: Iterable[int] = None):
         """
         Get character abilities values
         :param character_id:
+        :param rng: random generator, e.g. a character stream of app.core.operations.rng
+        :param scores: values in the order of SCORES, rolled if not provided
         """
-        self.__character_id = character_id
-        self._ab_hp = 0
-        self._ab_ac = 0
-        self._ab_str = 0
-        self._ab_dex = 0
-        self._ab_con = 0
-        self._ab_int = 0
-        self._ab_wis = 0
-        self._ab_cha = 0
-        self.__set_random()
-
-    def __set_random(self):
-        for attr in [ability for ability in self.__dict__ if ability.startswith('_ab_')]:
-            setattr(self, attr, randint(10, 18))
+        self._character_id = character_id
+        if scores is None:
+            scores = ABILITY_ROLL.roll_many(len(SCORES), rng).tolist()
+        (self._ab_hp, self._ab_ac, self._ab_str, self._ab_dex,
+         self._ab_con, self._ab_int, self._ab_wis, self._ab_cha) = scores
+
+    @property
+    def character_id(self):
+        return self._character_id
+
+    @property
+    def scores(self) -> tuple:
+        return (self._ab_hp, self._ab_ac, self._ab_str, self._ab_dex,
+                self._ab_con, self._ab_int, self._ab_wis, self._ab_cha)
 
     @property
     def hp(self):
@@ -61,6 +76,10 @@ class CharacterAbilities:
 
     @property
     def int(self):
+        return self._ab_int
+
+    @property
+    def wis(self):
         return self._ab_wis
 
     @property
@@ -68,8 +87,84 @@ class CharacterAbilities:
         return self._ab_cha
 
 
-if __name__ == '__main__':
+# position of the ability of every skill among ability modifiers
+_SKILL_ABILITIES = np.array([ABILITIES.index(ability) for _, ability in SKILLS])
+_ABILITIES_START = SCORES.index(ABILITIES[0])
+
 
-    abilities = CharacterAbilities(1)
+class AbilitiesBatch:
+    """
+    Abilities of many characters in a single contiguous (n, len(SCORES)) array of int16,
+    derived values are computed for all characters at once
+    """
 
-    pass
+    __slots__ = ('character_ids', 'scores')
+
+    def __init__(self, character_ids: np.ndarray, scores: np.ndarray):
+        """
+        :param character_ids: (n,) array
+        :param scores: (n, len(SCORES)) array of values in the order of SCORES
+        """
+        self.character_ids = np.ascontiguousarray(character_ids, dtype=np.int64)
+        self.scores = np.ascontiguousarray(scores, dtype=np.int16)
+
+    @classmethod
+    def roll(cls, character_ids: Iterable[int], rng: np.random.Generator = None) -> 'AbilitiesBatch':
+        """
+        Roll abilities of the characters with a single batch roll
+        :param character_ids:
+        :param rng: random generator
+        :return:
+        """
+        character_ids = np.fromiter(character_ids, dtype=np.int64)
+        scores = ABILITY_ROLL.roll_many(len(character_ids) * len(SCORES), rng).reshape(-1, len(SCORES))
+        return cls(character_ids, scores)
+
+    @classmethod
+    def from_abilities(cls, abilities: Iterable[CharacterAbilities]) -> 'AbilitiesBatch':
+        abilities = list(abilities)
+        return cls(np.fromiter((item.character_id for item in abilities), dtype=np.int64, count=len(abilities)),
+                   np.array([item.scores for item in abilities], dtype=np.int16).reshape(-1, len(SCORES)))
+
+    def __len__(self) -> int:
+        return len(self.character_ids)
+
+    def __getitem__(self, index: int) -> CharacterAbilities:
+        return CharacterAbilities(int(self.character_ids[index]), scores=self.scores[index].tolist())
+
+    def column(self, score: str) -> np.ndarray:
+        """
+        Get values of a score of all characters
+        :param score: name from SCORES
+        :return: (n,) view of the batch
+        """
+        return self.scores[:, SCORES.index(score)]
+
+    def modifiers(self) -> np.ndarray:
+        """
+        Get ability modifiers
+        :return: (n, len(ABILITIES)) array in the order of ABILITIES
+        """
+        return (self.scores[:, _ABILITIES_START:_ABILITIES_START + len(ABILITIES)] // 2 - 5).astype(np.int8)
+
+    def bonuses(self,
+                levels: Union[np.ndarray, int] = 1,
+                save_proficiencies: Union[np.ndarray, int] = 0,
+                skill_proficiencies: Union[np.ndarray, int] = 0) -> np.ndarray:
+        """
+        Compute derived bonuses of all characters, rows are laid out as packed bonuses
+        of app.core.operations.sheet
+        :param levels: level of every character or of all of them
+        :param save_proficiencies: masks of ABILITIES
+        :param skill_proficiencies: masks of SKILLS
+        :return: (n, BONUSES_SIZE) array of int8
+        """
+        modifiers = self.modifiers()
+        proficiency = proficiency_bonus(np.broadcast_to(np.asarray(levels, dtype=np.int64), (len(self),)))[:, None]
+        save_proficient = np.asarray(save_proficiencies, dtype=np.int64).reshape(-1, 1) >> np.arange(len(ABILITIES)) & 1
+        skill_proficient = np.asarray(skill_proficiencies, dtype=np.int64).reshape(-1, 1) >> np.arange(len(SKILLS)) & 1
+        bonuses = np.empty((len(self), BONUSES_SIZE), dtype=np.int8)
+        bonuses[:, :len(ABILITIES)] = modifiers
+        bonuses[:, len(ABILITIES):2 * len(ABILITIES)] = modifiers + save_proficient * proficiency
+        bonuses[:, 2 * len(ABILITIES):] = modifiers[:, _SKILL_ABILITIES] + skill_proficient * proficiency
+        return bonuses
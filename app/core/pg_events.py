@@ -0,0 +1,183 @@
+"""
+Postgres LISTEN/NOTIFY event bus
+
+Committed events are queued to a sender thread, which collects events committed within the batch
+interval and sends them by as few NOTIFY statements as the payload size limit allows. A listener
+thread of every worker receives the notifications, including ones sent by the worker itself,
+and hands the events to the handlers of the worker
+"""
+import logging
+import queue
+import select
+import time
+from threading import Event, Thread
+from typing import Iterator, Union
+
+import orjson
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy.engine import make_url
+
+from app.core.events import EventBus, GameEvent, dispatch
+
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payload has to be shorter than 8000 bytes
+MAX_PAYLOAD_SIZE = 7900
+# delay before reconnecting after a connection failure, seconds
+RECONNECT_DELAY = 1.0
+# listener wakes up this often to check if the bus is stopped, seconds
+POLL_TIMEOUT = 1.0
+
+
+def encode_payloads(events: list[GameEvent], max_size: int = MAX_PAYLOAD_SIZE) -> Iterator[str]:
+    """
+    Encode events as JSON arrays no longer than max_size bytes
+    :param events:
+    :param max_size:
+    :return:
+    """
+    batch, size = [], 2
+    for game_event in events:
+        encoded = orjson.dumps(game_event.to_dict())
+        if len(encoded) + 2 > max_size:
+            logger.warning('Game event %s of game %s is too large to be sent', game_event.type, game_event.game_id)
+            continue
+        if batch and size + len(encoded) + 1 > max_size:
+            yield '[' + ','.join(batch) + ']'
+            batch, size = [], 2
+        batch.append(encoded.decode())
+        size += len(encoded) + 1
+    if batch:
+        yield '[' + ','.join(batch) + ']'
+
+
+def decode_payload(payload: str) -> list[GameEvent]:
+    return [GameEvent.from_dict(value) for value in orjson.loads(payload)]
+
+
+def dispatch_payload(payload: str):
+    """
+    Hand events of a notification to the handlers of this process, malformed payloads
+    (e.g. notifications of other senders on the channel) are logged and skipped
+    :param payload:
+    :return:
+    """
+    try:
+        game_events = decode_payload(payload)
+    except (ValueError, TypeError, KeyError):
+        logger.exception('Malformed game events notification %.200r', payload)
+        return
+    dispatch(game_events)
+
+
+def get_dsn(db_uri: str) -> str:
+    """
+    Get libpq connection string of SQLAlchemy database uri
+    :param db_uri:
+    :return:
+    """
+    return make_url(db_uri).set(drivername='postgresql').render_as_string(hide_password=False)
+
+
+class PostgresEventBus(EventBus):
+    """
+    Event bus delivering events to all workers connected to the database
+    """
+
+    def __init__(self, db_uri: str, channel: str = 'game_events', batch_interval: float = 0.02):
+        self.dsn = get_dsn(db_uri)
+        self.channel = channel
+        self.batch_interval = batch_interval
+        self._queue: queue.SimpleQueue[Union[list[GameEvent], None]] = queue.SimpleQueue()
+        self._stopped = Event()
+        self._threads: list[Thread] = []
+
+    def start(self):
+        self._stopped.clear()
+        self._threads = [
+            Thread(target=self._send, name='event-bus-sender', daemon=True),
+            Thread(target=self._listen, name='event-bus-listener', daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        # wake the sender up, queued events are sent before it exits
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=POLL_TIMEOUT * 2)
+        self._threads = []
+
+    def publish(self, events: list[GameEvent]):
+        self._queue.put(events)
+
+    def _connect(self):
+        connection = psycopg2.connect(self.dsn)
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        return connection
+
+    def _collect(self) -> tuple[list[GameEvent], bool]:
+        """
+        Wait for events and collect the ones published within the batch interval
+        :return: events, True if the bus is stopped
+        """
+        events = self._queue.get()
+        if events is None:
+            return [], True
+        batch = list(events)
+        deadline = time.monotonic() + self.batch_interval
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                events = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if events is None:
+                return batch, True
+            batch.extend(events)
+        return batch, False
+
+    def _send(self):
+        connection = None
+        stopped = False
+        while not stopped:
+            batch, stopped = self._collect()
+            if not batch:
+                continue
+            try:
+                if connection is None or connection.closed:
+                    connection = self._connect()
+                with connection.cursor() as cursor:
+                    for payload in encode_payloads(batch):
+                        cursor.execute('SELECT pg_notify(%s, %s)', (self.channel, payload))
+            except psycopg2.Error:
+                # events are lost, subscribers resync on reconnect
+                logger.exception('Failed to send %d game events', len(batch))
+                if connection is not None:
+                    connection.close()
+                connection = None
+        if connection is not None:
+            connection.close()
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                while not self._stopped.is_set():
+                    if select.select([connection], [], [], POLL_TIMEOUT) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        dispatch_payload(notify.payload)
+            except psycopg2.Error:
+                logger.exception('Game events listener failed, reconnecting')
+                self._stopped.wait(RECONNECT_DELAY)
+            finally:
+                if connection is not None:
+                    connection.close()
@@ -0,0 +1,63 @@
+"""
+SQL statement budgets of endpoints
+
+Endpoints declare the max number of statements a request may execute with the query_budget decorator.
+When budgets are enforced (tests, development) requests exceeding the budget are logged and collected
+in budget_violations together with statements suspected to be N+1 lazy loads
+"""
+import logging
+from typing import Callable
+
+from app.core.metrics import RequestStats
+
+
+logger = logging.getLogger(__name__)
+
+# statements executed this many times within a request are reported as suspected N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+
+class QueryBudgetViolation:
+
+    def __init__(self, route: str, budget: int, stats: RequestStats):
+        self.route = route
+        self.budget = budget
+        self.statements = stats.statements
+        self.repeated = {statement: count for statement, count in (stats.statement_counts or {}).items()
+                         if count >= N_PLUS_ONE_THRESHOLD}
+
+    def __str__(self):
+        report = f'{self.route} executed {self.statements} SQL statements, budget is {self.budget}'
+        for statement, count in self.repeated.items():
+            report += f'\n  suspected N+1, executed {count} times: {statement}'
+        return report
+
+
+budget_violations: list[QueryBudgetViolation] = []
+
+
+def query_budget(max_statements: int) -> Callable[[Callable], Callable]:
+    """
+    Declare SQL statement budget of an endpoint
+    :param max_statements:
+    :return:
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_statements
+        return endpoint
+    return decorator
+
+
+def check_query_budget(endpoint: Callable, route: str, stats: RequestStats):
+    """
+    Report the request if it exceeded the budget of the endpoint
+    :param endpoint:
+    :param route: route path
+    :param stats:
+    :return:
+    """
+    budget = getattr(endpoint, 'query_budget', None)
+    if budget is not None and stats.statements > budget:
+        violation = QueryBudgetViolation(route, budget, stats)
+        budget_violations.append(violation)
+        logger.warning(str(violation))
@@ -0,0 +1,47 @@
+"""
+Fast serialization of ORM objects
+
+Serializers are compiled once per pydantic schema and read the schema fields straight from ORM objects.
+ORM output is trusted, so pydantic validation and jsonable_encoder are skipped: the dicts are rendered
+by orjson, which natively handles datetimes and other basic types of the schemas
+"""
+from operator import attrgetter
+from typing import Any, Iterable, Type
+
+from pydantic import BaseModel
+
+
+class ORMSerializer:
+    """
+    Precompiled serializer of ORM objects into dicts matching the schema
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.schema = schema
+        fields = list(schema.__fields__.values())
+        self.keys = tuple(field.alias for field in fields)
+        getter = attrgetter(*(field.name for field in fields))
+        # attrgetter of a single attribute doesn't return a tuple
+        self._values = getter if len(fields) > 1 else lambda obj: (getter(obj),)
+
+    def dump(self, obj: Any) -> dict:
+        return dict(zip(self.keys, self._values(obj)))
+
+    def dump_many(self, objs: Iterable[Any]) -> list[dict]:
+        keys, values = self.keys, self._values
+        return [dict(zip(keys, values(obj))) for obj in objs]
+
+
+_serializers: dict[Type[BaseModel], ORMSerializer] = {}
+
+
+def get_serializer(schema: Type[BaseModel]) -> ORMSerializer:
+    """
+    Get compiled serializer of the schema
+    :param schema:
+    :return:
+    """
+    serializer = _serializers.get(schema)
+    if serializer is None:
+        serializer = _serializers[schema] = ORMSerializer(schema)
+    return serializer
@@ -16,4 +16,8 @@ class CharacterNotFound(Exception):
 
 
 class CharacterUnavailable(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class AdventureVersionConflict(Exception):
+    pass
@@ -4,49 +4,82 @@ CRUD operations for Adventure
 
 from typing import Union
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, tuple_
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from sqlalchemy import and_, select
+from sqlalchemy.exc import IntegrityError
 
+from app.config import settings
+from app.core.cache import SizedLRUCache, TTLCache
+from app.crud import AdventureVersionConflict
+from app.crud.search import search
 from app.models.adventure import Adventure
 from app.schemas.adventure import AdventureCreateSchema, AdventureUpdateSchema
 
 
+ADVENTURE_COLUMNS = tuple(column.key for column in Adventure.__table__.columns)
+
+
+def _adventure_snapshot(adventure: Adventure) -> dict:
+    return {column: getattr(adventure, column) for column in ADVENTURE_COLUMNS}
+
+
+def _snapshot_size(snapshot: dict) -> int:
+    # text columns dominate the size, other values are counted as 8 bytes
+    return sum(len(value) if isinstance(value, str) else 8 for value in snapshot.values())
+
+
+# content of locked adventure versions is immutable, so it is cached by aid without expiration;
+# snapshots include is_latest and is_active flags, so they are dropped when the flags change
+adventure_cache = SizedLRUCache(maxsize=settings.adventure_cache_size, sizeof=_snapshot_size)
+# adventure_id -> aid of the latest version
+latest_adventure_cache = TTLCache(maxsize=10000, ttl=settings.adventure_latest_ttl)
+
+
 def get_adventures(db: Session,
                    q: str = None,
-                   offset: int = 0,
+                   after: int = None,
                    limit: int = 100) -> Union[list[Adventure], list]:
     """
     Get list of adventures from database
     :param db:
-    :param q: search filter query
-    :param offset:
+    :param q: search filter query, results are ranked by relevance and not paginated
+    :param after: keyset cursor, return adventures with adventure_id greater than this value
     :param limit:
     :return:
     """
-    adventures = db.query(Adventure) \
-        .filter(
-            tuple_(Adventure.adventure_id, Adventure.aid)
-            .in_(
-                db.query(Adventure.adventure_id, func.max(Adventure.aid).label('last_id'))
-                .group_by(Adventure.adventure_id)
-            )
-        )
+    adventures = db.query(Adventure).filter(Adventure.is_latest.is_(True))
 
     if q:
-        adventures = adventures.filter(or_(
-            Adventure.name.like(f'%{q}%'),
-            Adventure.plot.like(f'%{q}%')
-        ))
-    return adventures.order_by(Adventure.adventure_id.asc()).offset(offset).limit(limit).all()
+        return search(db, adventures, Adventure.adventure_id, [Adventure.name, Adventure.plot], q, limit)
+    if after is not None:
+        adventures = adventures.filter(Adventure.adventure_id > after)
+    return adventures.order_by(Adventure.adventure_id.asc()).limit(limit).all()
+
+
+def select_adventures() -> Select:
+    """
+    Get statement selecting latest versions of all adventures ordered by id, used for streaming export
+    :return:
+    """
+    return select(Adventure).where(Adventure.is_latest.is_(True)).order_by(Adventure.adventure_id.asc())
 
 
 def get_adventure_by_aid(db: Session, aid: int) -> Union[Adventure, None]:
     """
-    Get adventure by its id (NOT original id)
+    Get adventure by its id (NOT original id).
+    Locked versions are served from cache as detached copies
     :param db:
     :param aid:
     :return:
     """
-    return db.get(Adventure, aid)
+    snapshot = adventure_cache.get(aid)
+    if snapshot is not None:
+        return Adventure(**snapshot)
+    adventure = db.get(Adventure, aid)
+    if adventure is not None and adventure.is_locked:
+        adventure_cache.set(aid, _adventure_snapshot(adventure))
+    return adventure
 
 
 def get_adventure_by_id(db: Session, adventure_id: int) -> Union[Adventure, None]:
@@ -57,11 +90,56 @@ def get_adventure_by_id(db: Session, adventure_id: int) -> Union[Adventure, None
     :return:
     """
     return db.query(Adventure) \
-        .filter(Adventure.adventure_id == adventure_id) \
-        .order_by(Adventure.aid.desc()) \
+        .filter(and_(Adventure.adventure_id == adventure_id, Adventure.is_latest.is_(True))) \
         .first()
 
 
+def get_latest_adventure_version(db: Session, adventure_id: int) -> Union[Row, None]:
+    """
+    Get aid and updated_at of the most recent adventure version without loading it
+    :param db:
+    :param adventure_id:
+    :return:
+    """
+    return db.execute(select(Adventure.aid, Adventure.updated_at).where(and_(
+        Adventure.adventure_id == adventure_id,
+        Adventure.is_latest.is_(True)
+    ))).first()
+
+
+def get_latest_adventure(db: Session, adventure_id: int) -> Union[Adventure, None]:
+    """
+    Get the most recent adventure version for reading.
+    Latest version aid is cached for a short time, so the result may lag behind a new version
+    :param db:
+    :param adventure_id:
+    :return:
+    """
+    aid = latest_adventure_cache.get(adventure_id)
+    if aid is not None:
+        return get_adventure_by_aid(db, aid)
+    adventure = get_adventure_by_id(db, adventure_id)
+    if adventure is not None:
+        latest_adventure_cache.set(adventure_id, adventure.aid)
+        if adventure.is_locked:
+            adventure_cache.set(adventure.aid, _adventure_snapshot(adventure))
+    return adventure
+
+
+def lock_adventure(db: Session, adventure_id: int) -> Union[Adventure, None]:
+    """
+    Lock the most recent adventure version, e.g. when a game table starts to use it
+    :param db:
+    :param adventure_id:
+    :return: locked version or None if adventure not found
+    """
+    adventure = get_adventure_by_id(db, adventure_id)
+    if adventure is not None and not adventure.locked:
+        adventure.locked = True
+        db.commit()
+    return adventure
+
+
 def create_adventure(db: Session, adventure: AdventureCreateSchema) -> Adventure:
     """
     Create new adventure
@@ -91,9 +169,26 @@ def disable_adventure(db: Session, adventure_id: int) -> Union[int, None]:
     else:
         adventure.is_active = False
         db.commit()
+        adventure_cache.pop(adventure.aid)
         return adventure.adventure_id
 
 
+def _lock_latest_adventure(db: Session, adventure_id: int) -> Union[Adventure, None]:
+    """
+    Get the most recent adventure version locked for update until the end of the transaction (no-op on SQLite,
+    which serializes writers by itself)
+    :param db:
+    :param adventure_id:
+    :return:
+    """
+    return db.execute(
+        select(Adventure)
+        .where(and_(Adventure.adventure_id == adventure_id, Adventure.is_latest.is_(True)))
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+
+
 def update_adventure(
         db: Session,
         adventure_id: int,
@@ -105,16 +200,28 @@ def update_adventure(
     :param adventure_id:
     :param adventure:
     :return:
+    :raises AdventureVersionConflict: if a concurrent update has created a new version already
     """
-    existing_adventure = get_adventure_by_id(db, adventure_id)
+    existing_adventure = _lock_latest_adventure(db, adventure_id)
     if existing_adventure is None:
         return None
     # if existing adventure is locked by some gametable, then create a new one with the same original id
     if existing_adventure.is_locked:
+        # previous version has to be unmarked first, only one version may be the latest one
+        existing_adventure.is_latest = False
+        db.flush()
         new_adventure = Adventure(**adventure.dict(exclude_unset=True))
         new_adventure.adventure_id = existing_adventure.adventure_id
+        new_adventure.is_latest = True
         db.add(new_adventure)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # the only latest version is guarded by the unique index
+            db.rollback()
+            raise AdventureVersionConflict
+        latest_adventure_cache.pop(adventure_id)
+        adventure_cache.pop(existing_adventure.aid)
         return new_adventure
     # if adventure is not locked, then just update current one
     else:
@@ -0,0 +1,25 @@
+"""
+Async CRUD operations
+
+Functions mirror the sync CRUD modules and accept either AsyncSession or Session as the first
+argument. With AsyncSession the sync function runs inside AsyncSession.run_sync on the async driver,
+with Session it runs in the threadpool, so the event loop is never blocked by a database round trip.
+"""
+from functools import wraps
+from typing import Callable, Awaitable
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+
+def to_async(func: Callable) -> Callable[..., Awaitable]:
+    """
+    Make async variant of sync CRUD function
+    :param func: function taking Session as the first argument
+    :return:
+    """
+    @wraps(func)
+    async def wrapper(db, *args, **kwargs):
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(func, *args, **kwargs)
+        return await run_in_threadpool(func, db, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,16 @@
+"""
+Async CRUD operations for Adventures
+"""
+
+from app.crud import adventure as crud
+from app.crud.aio import to_async
+
+
+get_adventures = to_async(crud.get_adventures)
+get_adventure_by_aid = to_async(crud.get_adventure_by_aid)
+get_adventure_by_id = to_async(crud.get_adventure_by_id)
+get_latest_adventure_version = to_async(crud.get_latest_adventure_version)
+get_latest_adventure = to_async(crud.get_latest_adventure)
+create_adventure = to_async(crud.create_adventure)
+disable_adventure = to_async(crud.disable_adventure)
+update_adventure = to_async(crud.update_adventure)
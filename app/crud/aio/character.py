@@ -0,0 +1,18 @@
+"""
+Async CRUD operations for Characters
+"""
+
+from app.crud import character as crud
+from app.crud.aio import to_async
+
+
+get_characters = to_async(crud.get_characters)
+get_character_by_id = to_async(crud.get_character_by_id)
+get_user_character_by_id = to_async(crud.get_user_character_by_id)
+get_user_character_version = to_async(crud.get_user_character_version)
+get_characters_by_ids = to_async(crud.get_characters_by_ids)
+create_character = to_async(crud.create_character)
+update_character = to_async(crud.update_character)
+get_character_sheet = to_async(crud.get_character_sheet)
+update_character_sheet = to_async(crud.update_character_sheet)
+disable_character = to_async(crud.disable_character)
@@ -0,0 +1,23 @@
+"""
+Async CRUD operations for Games
+"""
+
+from app.crud import game as crud
+from app.crud.aio import to_async
+
+
+get_games = to_async(crud.get_games)
+get_lobby = to_async(crud.get_lobby)
+get_game_by_id = to_async(crud.get_game_by_id)
+get_game_version = to_async(crud.get_game_version)
+get_games_by_ids = to_async(crud.get_games_by_ids)
+create_game = to_async(crud.create_game)
+update_game = to_async(crud.update_game)
+disable_game = to_async(crud.disable_game)
+get_join_requests = to_async(crud.get_join_requests)
+create_join_request = to_async(crud.create_join_request)
+join_request_accept = to_async(crud.join_request_accept)
+join_request_decline = to_async(crud.join_request_decline)
+join_requests_bulk_update = to_async(crud.join_requests_bulk_update)
+create_roll = to_async(crud.create_roll)
+get_rolls = to_async(crud.get_rolls)
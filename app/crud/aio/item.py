@@ -0,0 +1,15 @@
+"""
+Async CRUD operations for Items
+"""
+
+from app.crud import item as crud
+from app.crud.aio import to_async
+
+
+get_items = to_async(crud.get_items)
+get_item_by_id = to_async(crud.get_item_by_id)
+get_item_version = to_async(crud.get_item_version)
+get_items_by_ids = to_async(crud.get_items_by_ids)
+create_item = to_async(crud.create_item)
+update_item = to_async(crud.update_item)
+disable_item = to_async(crud.disable_item)
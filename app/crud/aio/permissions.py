@@ -0,0 +1,12 @@
+"""
+Async permission checks
+"""
+
+from app.crud import permissions as crud
+from app.crud.aio import to_async
+
+
+is_game_master = to_async(crud.is_game_master)
+is_character_owner = to_async(crud.is_character_owner)
+is_game_participant = to_async(crud.is_game_participant)
+has_join_request = to_async(crud.has_join_request)
@@ -0,0 +1,21 @@
+"""
+Async CRUD operations for Users
+"""
+
+from app.crud import user as crud
+from app.crud.user import UsernameNotUnique
+from app.crud.aio import to_async
+
+
+get_users = to_async(crud.get_users)
+get_user_by_id = to_async(crud.get_user_by_id)
+get_user_version = to_async(crud.get_user_version)
+get_users_by_ids = to_async(crud.get_users_by_ids)
+get_user_info = to_async(crud.get_user_info)
+get_user_by_name = to_async(crud.get_user_by_name)
+get_principal = to_async(crud.get_principal)
+create_user = to_async(crud.create_user)
+update_user = to_async(crud.update_user)
+disable_user = to_async(crud.disable_user)
+enable_user = to_async(crud.enable_user)
+
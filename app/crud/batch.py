@@ -0,0 +1,32 @@
+"""
+Batch loading of rows by primary keys
+"""
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.orm.util import identity_key
+
+
+def get_by_ids(db: Session, key: InstrumentedAttribute, ids: Iterable[int]) -> dict:
+    """
+    Get objects by primary keys. Objects already present in the session identity map are reused,
+    the rest are fetched by a single IN query
+    :param db:
+    :param key: primary key column of the model
+    :param ids:
+    :return: primary key -> object, missing rows are omitted
+    """
+    model = key.class_
+    found, missing = {}, []
+    for id_ in set(ids):
+        obj = db.identity_map.get(identity_key(model, id_))
+        if obj is None:
+            missing.append(id_)
+        else:
+            found[id_] = obj
+    if missing:
+        for obj in db.execute(select(model).where(key.in_(missing))).scalars():
+            found[getattr(obj, key.key)] = obj
+    return found
@@ -3,24 +3,32 @@ CRUD operations for Characters
 """
 
 from typing import Union
-from sqlalchemy import and_
+from sqlalchemy import and_, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
 
-from app.models.character import Character
-from app.schemas.character import CharacterCreateSchema, CharacterUpdateSchema
+from app.crud.search import search
+from app.crud.batch import get_by_ids
+from app.models.character import Character, CharacterSheet
+from app.schemas.character import CharacterCreateSchema, CharacterUpdateSchema, CharacterAbilitiesUpdateScheme
+from app.core.operations.sheet import ABILITIES, SKILL_NAMES, to_mask
+from app.core.operations.utils import CharacterAbilities
+from app.core.auth import principal_cache, publish_principal_invalidated
 
 
 def get_characters(db: Session,
                    q: str = None,
                    user_owner_id: int = None,
-                   offset: int = 0,
+                   after: int = None,
                    limit: int = 100) -> Union[list[Character], list]:
     """
     Get list of characters from database
     :param db:
-    :param q: search filter query
+    :param q: search filter query, results are ranked by relevance and not paginated
     :param user_owner_id: filter by owner id
-    :param offset:
+    :param after: keyset cursor, return rows with primary key greater than this value
     :param limit:
     :return:
     """
@@ -28,10 +36,22 @@ def get_characters(db: Session,
     if user_owner_id:
         characters = characters.filter(Character.user_owner_id == user_owner_id)
     if q:
-        characters = characters.filter(
-            Character.name.like(f'%{q}%')
-        )
-    return characters.order_by(Character.character_id.asc()).offset(offset).limit(limit).all()
+        return search(db, characters, Character.character_id, [Character.name], q, limit)
+    if after is not None:
+        characters = characters.filter(Character.character_id > after)
+    return characters.order_by(Character.character_id.asc()).limit(limit).all()
+
+
+def select_characters(user_owner_id: int = None) -> Select:
+    """
+    Get statement selecting all characters ordered by id, used for streaming export
+    :param user_owner_id: filter by owner id
+    :return:
+    """
+    statement = select(Character)
+    if user_owner_id:
+        statement = statement.where(Character.user_owner_id == user_owner_id)
+    return statement.order_by(Character.character_id.asc())
 
 
 def get_character_by_id(db: Session, character_id: int) -> Union[Character, None]:
@@ -66,6 +86,30 @@ def get_user_character_by_id(db: Session, user_id: int, character_id: int) -> Un
         return None
 
 
+def get_user_character_version(db: Session, user_id: int, character_id: int) -> Union[Row, None]:
+    """
+    Get id and updated_at of the character filtered by user owner id without loading it
+    :param db:
+    :param user_id: character owner id
+    :param character_id:
+    :return:
+    """
+    return db.execute(select(Character.character_id, Character.updated_at).where(and_(
+        Character.user_owner_id == user_id,
+        Character.character_id == character_id
+    ))).first()
+
+
+def get_characters_by_ids(db: Session, character_ids: list[int]) -> dict[int, Character]:
+    """
+    Get characters by ids with a single query, see get_by_ids
+    :param db:
+    :param character_ids:
+    :return: character id -> character, missing characters are omitted
+    """
+    return get_by_ids(db, Character.character_id, character_ids)
+
+
 def create_character(db: Session, character: CharacterCreateSchema, user_owner_id: int) -> Character:
     """
     Create new character
@@ -75,9 +119,14 @@ def create_character(db: Session, character: CharacterCreateSchema, user_owner_i
     :return:
     """
     new_character = Character(user_owner_id=user_owner_id, **character.dict(exclude_unset=True), )
+    # abilities are rolled once, sheets are served as stored afterwards
+    new_character.load()
     db.add(new_character)
+    publish_principal_invalidated(db, user_owner_id)
     db.commit()
     db.refresh(new_character)
+    # owned characters of the user are cached with the principal
+    principal_cache.invalidate_user(user_owner_id)
     return new_character
 
 
@@ -99,6 +148,64 @@ def update_character(db: Session, character_id: int, character: CharacterUpdateS
         return existing_character
 
 
+def get_character_sheet(db: Session, character_id: int) -> Union[CharacterSheet, None]:
+    """
+    Get abilities of the character with derived values. Abilities of characters created without them
+    (e.g. before sheets were stored) are rolled and stored on the first access
+    :param db:
+    :param character_id:
+    :return: None if the character doesn't exist
+    """
+    character_sheet = db.get(CharacterSheet, character_id)
+    if character_sheet is not None:
+        return character_sheet
+    if db.execute(select(Character.character_id).where(Character.character_id == character_id)).first() is None:
+        return None
+    character_sheet = CharacterSheet.from_abilities(CharacterAbilities(character_id))
+    character_sheet.character_id = character_id
+    db.add(character_sheet)
+    try:
+        db.commit()
+    except IntegrityError:
+        # the sheet was created by a concurrent request
+        db.rollback()
+        return db.get(CharacterSheet, character_id)
+    return character_sheet
+
+
+def update_character_sheet(db: Session,
+                           character_id: int,
+                           abilities: CharacterAbilitiesUpdateScheme) -> Union[CharacterSheet, None]:
+    """
+    Update abilities of the character, only derived values depending on the changed ones are recomputed.
+    The sheet row is locked for the transaction (no-op on SQLite, which serializes writers by itself),
+    so concurrent updates recompute bonuses of the committed values
+    :param db:
+    :param character_id:
+    :param abilities:
+    :return:
+    """
+    if get_character_sheet(db, character_id) is None:
+        return None
+    character_sheet = db.execute(
+        select(CharacterSheet)
+        .where(CharacterSheet.character_id == character_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one()
+    changes = abilities.dict(exclude_unset=True, exclude_none=True)
+    for name, value in changes.items():
+        if name == 'save_proficiencies':
+            character_sheet.save_proficiencies_mask = to_mask(value, ABILITIES)
+        elif name == 'skill_proficiencies':
+            character_sheet.skill_proficiencies_mask = to_mask(value, SKILL_NAMES)
+        else:
+            setattr(character_sheet, name, value)
+    character_sheet.recompute(changes)
+    db.commit()
+    return character_sheet
+
+
 def disable_character(db: Session, character_id: int) -> Union[None, bool]:
     """
     Disable character by id
@@ -4,11 +4,29 @@ CRUD operations for Games
 
 from typing import Union
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 
-from app.models.game import Game, GameJoinRequest
+from app.crud.batch import get_by_ids
+from app.models.game import Game, GameJoinRequest, GameRoll
 from app.models.character import Character
-from app.schemas.game import GameCreateSchema, GameUpdateSchema, JoinRequestCreateSchema
+from app.models.user import User
+from app.models.refs import game_character
+from app.schemas.game import (
+    GameCreateSchema,
+    GameUpdateSchema,
+    GameSchema,
+    JoinRequestCreateSchema,
+    GameRollCreateSchema,
+    GameRollSchema
+)
+from app.core.auth import principal_cache, publish_principal_invalidated
+from app.core.events import GameEvent, publish
+from app.core.serialization import get_serializer
+from app.core.operations.dice import compile_dice
+from app.core.operations.rng import GAME_STREAM, RNG_VERSION, replay, roll_stream
 from app.crud import (
     GameNotFound,
     JoinRequestNotFound,
@@ -17,22 +35,111 @@ from app.crud import (
 )
 
 
+def _publish_game_updated(db: Session, game: Game):
+    # flush to get updated_at of the new state
+    db.flush()
+    publish(db, GameEvent(game.game_id, 'game_updated', get_serializer(GameSchema).dump(game), key='game'))
+
+
+def _publish_join_request(db: Session,
+                          type_: str,
+                          request_id: int,
+                          game_id: int,
+                          user_id: int,
+                          character_id: int,
+                          status: str):
+    publish(db, GameEvent(game_id, type_, {
+        'request_id': request_id,
+        'game_id': game_id,
+        'user_id': user_id,
+        'character_id': character_id,
+        'status': status
+    }, key=f'join_request:{request_id}'))
+
+
+def _publish_character_joined(db: Session, game_id: int, character_id: int):
+    publish(db, GameEvent(game_id, 'character_joined', {'game_id': game_id, 'character_id': character_id}))
+
+
 def get_games(db: Session,
               owner_id: int = None,
-              offset: int = 0,
+              after: int = None,
               limit: int = 100) -> Union[list[Game], list]:
     """
     Get list of games from database
     :param db:
     :param owner_id: filter by owner id
-    :param offset:
+    :param after: keyset cursor, return rows with primary key greater than this value
     :param limit:
     :return:
     """
     games = db.query(Game)
     if owner_id:
-        games = games.filter(Game.owner_id == owner_id)
-    return games.order_by(Game.game_id.asc()).offset(offset).limit(limit).all()
+        games = games.filter(Game.game_master_id == owner_id)
+    if after is not None:
+        games = games.filter(Game.game_id > after)
+    return games.order_by(Game.game_id.asc()).limit(limit).all()
+
+
+def select_games(owner_id: int = None) -> Select:
+    """
+    Get statement selecting all games ordered by id, used for streaming export
+    :param owner_id: filter by owner id
+    :return:
+    """
+    statement = select(Game)
+    if owner_id:
+        statement = statement.where(Game.game_master_id == owner_id)
+    return statement.order_by(Game.game_id.asc())
+
+
+def select_lobby(game_state: bool = None, disabled: bool = None) -> Select:
+    """
+    Get statement selecting games with number of characters, number of pending join requests
+    and game master nickname, ordered by id.
+    Counts are correlated subqueries served by the game_id indexes of the ref and join requests tables,
+    so only games of the requested page are counted
+    :param game_state: filter by game state
+    :param disabled: filter by disabled flag
+    :return:
+    """
+    characters_count = select(func.count()) \
+        .where(game_character.c.game_id == Game.game_id) \
+        .scalar_subquery()
+    pending_requests_count = select(func.count()) \
+        .where(and_(GameJoinRequest.game_id == Game.game_id, GameJoinRequest.status_code == 1)) \
+        .scalar_subquery()
+    statement = select(
+        *Game.__table__.columns,
+        characters_count.label('characters_count'),
+        pending_requests_count.label('pending_requests_count'),
+        User.nickname.label('game_master_nickname')
+    ).join(User, User.user_id == Game.game_master_id)
+    if game_state is not None:
+        statement = statement.where(Game.game_state.is_(game_state))
+    if disabled is not None:
+        statement = statement.where(Game.disabled.is_(disabled))
+    return statement.order_by(Game.game_id.asc())
+
+
+def get_lobby(db: Session,
+              game_state: bool = None,
+              disabled: bool = None,
+              after: int = None,
+              limit: int = 100) -> list[Row]:
+    """
+    Get games for the lobby in a single statement, see select_lobby
+    :param db:
+    :param game_state: filter by game state
+    :param disabled: filter by disabled flag
+    :param after: keyset cursor, return rows with primary key greater than this value
+    :param limit:
+    :return: rows with game columns, characters_count, pending_requests_count and game_master_nickname
+    """
+    statement = select_lobby(game_state=game_state, disabled=disabled)
+    if after is not None:
+        statement = statement.where(Game.game_id > after)
+    return db.execute(statement.limit(limit)).all()
 
 
 def get_game_by_id(db: Session, game_id: int) -> Union[Game, None]:
@@ -49,6 +156,26 @@ def get_game_by_id(db: Session, game_id: int) -> Union[Game, None]:
         return None
 
 
+def get_game_version(db: Session, game_id: int) -> Union[Row, None]:
+    """
+    Get id and updated_at of the game without loading it
+    :param db:
+    :param game_id:
+    :return:
+    """
+    return db.execute(select(Game.game_id, Game.updated_at).where(Game.game_id == game_id)).first()
+
+
+def get_games_by_ids(db: Session, game_ids: list[int]) -> dict[int, Game]:
+    """
+    Get games by ids with a single query, see get_by_ids
+    :param db:
+    :param game_ids:
+    :return: game id -> game, missing games are omitted
+    """
+    return get_by_ids(db, Game.game_id, game_ids)
+
+
 def create_game(db: Session, game: GameCreateSchema, game_master_id: int) -> Game:
     """
     Create new game
@@ -59,8 +186,11 @@ def create_game(db: Session, game: GameCreateSchema, game_master_id: int) -> Gam
     """
     new_game = Game(game_master_id=game_master_id, **game.dict(exclude_unset=True))
     db.add(new_game)
+    publish_principal_invalidated(db, game_master_id)
     db.commit()
     db.refresh(new_game)
+    # owned games of the user are cached with the principal
+    principal_cache.invalidate_user(game_master_id)
     return new_game
 
 
@@ -78,6 +208,7 @@ def update_game(db: Session, game_id: int, game: GameUpdateSchema) -> Union[Game
     else:
         for var, value in game.dict(exclude_unset=False).items():
             setattr(existing_game, var, value)
+        _publish_game_updated(db, existing_game)
         db.commit()
         return existing_game
 
@@ -95,6 +226,7 @@ def disable_game(db: Session, game_id: int) -> Union[None, bool]:
     else:
         try:
             game.disabled = True
+            _publish_game_updated(db, game)
             db.commit()
             return True
         except:
@@ -128,49 +260,240 @@ def create_join_request(db: Session, game_id: int, join_request: JoinRequestCrea
     """
     new_request = GameJoinRequest(game_id=game_id, **join_request.dict(exclude_unset=True))
     db.add(new_request)
+    db.flush()
+    _publish_join_request(db, 'join_request_created', new_request.request_id, game_id,
+                          new_request.user_id, new_request.character_id, 'pending')
     db.commit()
     return new_request
 
 
-def join_request_accept(db: Session, request_id: int):
+def _lock_join_request(db: Session, game_id: int, request_id: int) -> GameJoinRequest:
     """
-    Accept join request and add character to game
+    Get pending join request of the game locked for update until the end of the transaction (no-op on SQLite,
+    which serializes writers by itself)
     :param db:
+    :param game_id:
     :param request_id:
     :return:
     """
-    join_request = db.get(GameJoinRequest, request_id)
-    if join_request is None:
+    statement = select(GameJoinRequest).where(and_(
+        GameJoinRequest.request_id == request_id,
+        GameJoinRequest.game_id == game_id
+    )).with_for_update()
+    join_request = db.execute(statement).scalar_one_or_none()
+    # requests of other games and already accepted or declined ones aren't updated
+    if join_request is None or join_request.status_code != 1:
+        db.rollback()
         raise JoinRequestNotFound
+    return join_request
+
+
+def join_request_accept(db: Session, game_id: int, request_id: int):
+    """
+    Accept pending join request of the game and add character to game.
+    The join request row is locked for the transaction, a character joining two games at once is
+    prevented by the unique character_id constraint of the ref table, so concurrent accepts are safe
+    :param db:
+    :param game_id:
+    :param request_id:
+    :return:
+    """
+    join_request = _lock_join_request(db, game_id, request_id)
 
     # check if the game still exists
-    game = db.get(Game, join_request.game_id)
-    if game is None:
+    if db.execute(select(Game.game_id).where(Game.game_id == join_request.game_id)).first() is None:
+        db.rollback()
         raise GameNotFound
 
     # check if the character with specified id still exists
-    character = db.get(Character, join_request.character_id)
-    if character is None:
+    if db.execute(select(Character.character_id).where(Character.character_id == join_request.character_id)) \
+            .first() is None:
+        db.rollback()
         raise CharacterNotFound
-    if character.games:
-        raise CharacterUnavailable
 
-    game.characters.append(character)
-    # set status_code as accepted
-    join_request.status_code = 2
-    db.commit()
+    try:
+        db.execute(insert(game_character).values(game_id=join_request.game_id,
+                                                 character_id=join_request.character_id))
+        # set status_code as accepted
+        join_request.status_code = 2
+        _publish_join_request(db, 'join_request_accepted', join_request.request_id, join_request.game_id,
+                              join_request.user_id, join_request.character_id, 'accepted')
+        _publish_character_joined(db, join_request.game_id, join_request.character_id)
+        db.commit()
+    except IntegrityError:
+        # the character participates another game already
+        db.rollback()
+        raise CharacterUnavailable
 
 
-def join_request_decline(db: Session, request_id: int):
+def join_request_decline(db: Session, game_id: int, request_id: int):
     """
-    Update join request with declined status
+    Update pending join request of the game with declined status
     :param db:
+    :param game_id:
     :param request_id:
     :return:
     """
-    join_request = db.get(GameJoinRequest, request_id)
-    if join_request is None:
-        raise JoinRequestNotFound
+    join_request = _lock_join_request(db, game_id, request_id)
     # set status code as declined
     join_request.status_code = 3
+    _publish_join_request(db, 'join_request_declined', join_request.request_id, join_request.game_id,
+                          join_request.user_id, join_request.character_id, 'declined')
+    db.commit()
+
+
+# outcomes of bulk join requests update
+ACCEPTED = 'accepted'
+DECLINED = 'declined'
+NOT_FOUND = 'not_found'
+NOT_PENDING = 'not_pending'
+CHARACTER_NOT_FOUND = 'character_not_found'
+CHARACTER_UNAVAILABLE = 'character_unavailable'
+
+# bulk accept is retried if a concurrent transaction adds the same characters to games
+BULK_ACCEPT_ATTEMPTS = 3
+
+
+def join_requests_bulk_update(db: Session, game_id: int, request_ids: list[int], accept: bool) -> dict[int, str]:
+    """
+    Accept or decline pending join requests of the game in a single transaction.
+    Statuses are updated by a single UPDATE, accepted characters are added to the game by a single bulk INSERT
+    :param db:
+    :param game_id:
+    :param request_ids:
+    :param accept: accept requests if True, decline otherwise
+    :return: request id -> outcome
+    """
+    for _ in range(BULK_ACCEPT_ATTEMPTS):
+        try:
+            return _join_requests_bulk_update(db, game_id, request_ids, accept)
+        except IntegrityError:
+            db.rollback()
+    raise CharacterUnavailable
+
+
+def _join_requests_bulk_update(db: Session, game_id: int, request_ids: list[int], accept: bool) -> dict[int, str]:
+    outcomes = dict.fromkeys(request_ids, NOT_FOUND)
+    requests = db.execute(
+        select(GameJoinRequest.request_id, GameJoinRequest.character_id, GameJoinRequest.user_id,
+               GameJoinRequest.status_code)
+        .where(and_(GameJoinRequest.game_id == game_id, GameJoinRequest.request_id.in_(request_ids)))
+        .order_by(GameJoinRequest.request_id.asc())
+        .with_for_update()
+    ).all()
+    pending = []
+    for request_id, character_id, user_id, status_code in requests:
+        if status_code == 1:
+            pending.append((request_id, character_id, user_id))
+        else:
+            outcomes[request_id] = NOT_PENDING
+
+    if not accept:
+        updated = [request_id for request_id, _, _ in pending]
+        status_code = 3
+        outcomes.update(dict.fromkeys(updated, DECLINED))
+    else:
+        character_ids = {character_id for _, character_id, _ in pending}
+        existing = set(db.execute(
+            select(Character.character_id).where(Character.character_id.in_(character_ids))
+        ).scalars())
+        unavailable = set(db.execute(
+            select(game_character.c.character_id).where(game_character.c.character_id.in_(existing))
+        ).scalars())
+        updated, accepted_characters = [], []
+        for request_id, character_id, _ in pending:
+            if character_id not in existing:
+                outcomes[request_id] = CHARACTER_NOT_FOUND
+            elif character_id in unavailable:
+                outcomes[request_id] = CHARACTER_UNAVAILABLE
+            else:
+                # the first request of a character wins
+                unavailable.add(character_id)
+                updated.append(request_id)
+                accepted_characters.append(character_id)
+                outcomes[request_id] = ACCEPTED
+        status_code = 2
+        if accepted_characters:
+            db.execute(insert(game_character), [{'game_id': game_id, 'character_id': character_id}
+                                                for character_id in accepted_characters])
+
+    if updated:
+        db.execute(update(GameJoinRequest)
+                   .where(GameJoinRequest.request_id.in_(updated))
+                   .values(status_code=status_code)
+                   .execution_options(synchronize_session=False))
+    for request_id, character_id, user_id in pending:
+        outcome = outcomes[request_id]
+        if outcome in (ACCEPTED, DECLINED):
+            _publish_join_request(db, f'join_request_{outcome}', request_id, game_id, user_id, character_id, outcome)
+        if outcome == ACCEPTED:
+            _publish_character_joined(db, game_id, character_id)
+    db.commit()
+    return outcomes
+
+
+def create_roll(db: Session, game_id: int, user_id: int, roll: GameRollCreateSchema) -> GameRoll:
+    """
+    Roll dice in the game. The roll takes the next counter of the game and its outcome is generated
+    by the random stream of the character (or of the game)
+    :param db:
+    :param game_id:
+    :param user_id: rolling user
+    :param roll:
+    :return: roll with outcome
+    :raises GameNotFound:
+    :raises CharacterNotFound: if the character doesn't participate the game
+    """
+    if roll.character_id is not None and db.execute(select(game_character.c.character_id).where(and_(
+        game_character.c.game_id == game_id,
+        game_character.c.character_id == roll.character_id
+    ))).first() is None:
+        raise CharacterNotFound
+    # the update locks the game row until commit, so concurrent rolls get distinct counters;
+    # updated_at is kept, as rolls don't change the game itself
+    result = db.execute(update(Game).where(Game.game_id == game_id).values(
+        rng_counter=Game.rng_counter + 1,
+        updated_at=Game.updated_at
+    ).execution_options(synchronize_session=False))
+    if result.rowcount == 0:
+        db.rollback()
+        raise GameNotFound
+    seed, counter = db.execute(select(Game.rng_seed, Game.rng_counter).where(Game.game_id == game_id)).one()
+    new_roll = GameRoll(game_id=game_id,
+                        counter=counter,
+                        user_id=user_id,
+                        character_id=roll.character_id,
+                        notation=compile_dice(roll.notation).notation,
+                        mode=roll.mode,
+                        times=roll.times,
+                        rng_version=RNG_VERSION)
+    outcome = roll_stream(seed, roll.character_id or GAME_STREAM, counter, new_roll.notation, roll.mode, roll.times)
+    new_roll.totals, new_roll.dice = outcome.totals, outcome.dice
+    db.add(new_roll)
+    db.flush()
+    publish(db, GameEvent(game_id, 'dice_rolled', get_serializer(GameRollSchema).dump(new_roll)))
     db.commit()
+    return new_roll
+
+
+def get_rolls(db: Session, game_id: int, after: int = None, limit: int = 100) -> list[GameRoll]:
+    """
+    Get rolls of the game with outcomes regenerated from the game random streams
+    :param db:
+    :param game_id:
+    :param after: keyset cursor, return rolls with counter greater than this value
+    :param limit:
+    :return:
+    :raises GameNotFound:
+    :raises RngVersionMismatch: if a roll was made by another version of the random streams
+    """
+    seed = db.execute(select(Game.rng_seed).where(Game.game_id == game_id)).scalar()
+    if seed is None:
+        raise GameNotFound
+    rolls = db.query(GameRoll).filter(GameRoll.game_id == game_id)
+    if after is not None:
+        rolls = rolls.filter(GameRoll.counter > after)
+    rolls = rolls.order_by(GameRoll.counter.asc()).limit(limit).all()
+    for game_roll, outcome in zip(rolls, replay(seed, rolls)):
+        game_roll.totals, game_roll.dice = outcome.totals, outcome.dice
+    return rolls
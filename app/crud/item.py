@@ -4,32 +4,42 @@ CRUD operations for Items
 
 from typing import Union
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from sqlalchemy import select
 
+from app.crud.search import search
+from app.crud.batch import get_by_ids
 from app.models.item import Item
 from app.schemas.item import ItemCreateSchema, ItemUpdateSchema
 
 
 def get_items(db: Session,
               q: str = None,
-              offset: int = 0,
+              after: int = None,
               limit: int = 100) -> Union[list[Item], list]:
     """
     Get list of items from database
     :param db:
-    :param q: search filter query
-    :param offset:
+    :param q: search filter query, results are ranked by relevance and not paginated
+    :param after: keyset cursor, return rows with primary key greater than this value
     :param limit:
     :return:
     """
     items = db.query(Item)
     if q:
-        items = items.filter(
-            or_(
-                Item.name.like(f'%{q}%'),
-                Item.description.like(f'%{q}%')
-            ))
-    return items.order_by(Item.item_id.asc()).offset(offset).limit(limit).all()
+        return search(db, items, Item.item_id, [Item.name, Item.description], q, limit)
+    if after is not None:
+        items = items.filter(Item.item_id > after)
+    return items.order_by(Item.item_id.asc()).limit(limit).all()
+
+
+def select_items() -> Select:
+    """
+    Get statement selecting all items ordered by id, used for streaming export
+    :return:
+    """
+    return select(Item).order_by(Item.item_id.asc())
 
 
 def get_item_by_id(db: Session, item_id: int) -> Union[Item, None]:
@@ -46,6 +56,26 @@ def get_item_by_id(db: Session, item_id: int) -> Union[Item, None]:
         return None
 
 
+def get_item_version(db: Session, item_id: int) -> Union[Row, None]:
+    """
+    Get id and updated_at of the item without loading it
+    :param db:
+    :param item_id:
+    :return:
+    """
+    return db.execute(select(Item.item_id, Item.updated_at).where(Item.item_id == item_id)).first()
+
+
+def get_items_by_ids(db: Session, item_ids: list[int]) -> dict[int, Item]:
+    """
+    Get items by ids with a single query, see get_by_ids
+    :param db:
+    :param item_ids:
+    :return: item id -> item, missing items are omitted
+    """
+    return get_by_ids(db, Item.item_id, item_ids)
+
+
 def create_item(db: Session, item: ItemCreateSchema) -> Item:
     """
     Create new item
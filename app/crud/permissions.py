@@ -0,0 +1,66 @@
+"""
+Permission checks
+
+Every check is a single query of EXISTS on indexed columns, so no relationship collections are loaded
+"""
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.orm import Session
+
+from app.models.game import Game, GameJoinRequest
+from app.models.character import Character
+from app.models.refs import game_character
+
+
+def is_game_master(db: Session, user_id: int, game_id: int) -> bool:
+    """
+    Check if the user is the game master of the game
+    :param db:
+    :param user_id:
+    :param game_id:
+    :return:
+    """
+    return db.query(Game.mastered_by(user_id, game_id)).scalar()
+
+
+def is_character_owner(db: Session, user_id: int, character_id: int) -> bool:
+    """
+    Check if the user owns the character
+    :param db:
+    :param user_id:
+    :param character_id:
+    :return:
+    """
+    return db.query(Character.owned_by(user_id, character_id)).scalar()
+
+
+def is_game_participant(db: Session, user_id: int, game_id: int) -> bool:
+    """
+    Check if the user is the game master of the game or owns a character of the game
+    :param db:
+    :param user_id:
+    :param game_id:
+    :return:
+    """
+    return db.query(or_(
+        Game.mastered_by(user_id, game_id),
+        exists().where(and_(
+            game_character.c.game_id == game_id,
+            game_character.c.character_id == Character.character_id,
+            Character.user_owner_id == user_id
+        ))
+    )).scalar()
+
+
+def has_join_request(db: Session, user_id: int, game_id: int) -> bool:
+    """
+    Check if the user has requested to join the game
+    :param db:
+    :param user_id:
+    :param game_id:
+    :return:
+    """
+    return db.query(exists().where(and_(
+        GameJoinRequest.game_id == game_id,
+        GameJoinRequest.user_id == user_id
+    ))).scalar()
@@ -0,0 +1,213 @@
+"""
+Search backends for list filters
+
+Postgres backend relies on pg_trgm GIN indexes (see app.database.ddl) which serve '%q%' filters and
+ranks results by trigram word similarity. Other dialects (SQLite in tests and development) use an
+in-process trigram inverted index, which sees only ORM changes of its process: the LIKE filter always runs
+on a bounded number of rows, and rows the index finds beyond the bound are merged in.
+"""
+from threading import Lock
+from typing import Union
+
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+
+# candidate sets larger than this are not worth an IN filter, the query is filtered by LIKE only
+MAX_CANDIDATES = 500
+# LIKE filter ranks at most this many times limit rows, taken in primary key order
+FALLBACK_ROWS_FACTOR = 10
+
+
+def trigrams(value: str) -> set[str]:
+    """
+    Get lowercase trigrams of a string. A string contains q only if it contains every trigram of q
+    :param value:
+    :return:
+    """
+    value = value.lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def similarity(q_trigrams: set[str], value: Union[str, None]) -> float:
+    if not value or not q_trigrams:
+        return 0.0
+    value_trigrams = trigrams(value)
+    return len(q_trigrams & value_trigrams) / len(q_trigrams | value_trigrams)
+
+
+class SearchBackend:
+    """
+    Base search backend, filters with LIKE and keeps primary key ordering
+    """
+
+    def search(self,
+               db: Session,
+               query: Query,
+               key: InstrumentedAttribute,
+               columns: list[InstrumentedAttribute],
+               q: str,
+               limit: int) -> list:
+        """
+        Get rows of the query matching q in any of the columns
+        :param db:
+        :param query: base query, may have filters already
+        :param key: primary key column of the queried model
+        :param columns: searched columns
+        :param q: search string
+        :param limit:
+        :return: rows ordered by relevance
+        """
+        return query.filter(self.condition(columns, q)).order_by(key.asc()).limit(limit).all()
+
+    @staticmethod
+    def condition(columns: list[InstrumentedAttribute], q: str):
+        return or_(*[column.like(f'%{q}%') for column in columns])
+
+
+class TrigramSearchBackend(SearchBackend):
+    """
+    Postgres pg_trgm backend
+    """
+
+    def search(self,
+               db: Session,
+               query: Query,
+               key: InstrumentedAttribute,
+               columns: list[InstrumentedAttribute],
+               q: str,
+               limit: int) -> list:
+        rank = func.greatest(*[func.word_similarity(q, column) for column in columns])
+        return query.filter(self.condition(columns, q)).order_by(rank.desc(), key.asc()).limit(limit).all()
+
+    @staticmethod
+    def condition(columns: list[InstrumentedAttribute], q: str):
+        return or_(*[column.ilike(f'%{q}%') for column in columns])
+
+
+class InvertedIndex:
+    """
+    Trigram -> primary keys index of table columns, built on the first search and
+    kept up to date by mapper events of this process
+    """
+
+    def __init__(self, key: InstrumentedAttribute, columns: list[InstrumentedAttribute]):
+        self.key = key
+        self.columns = columns
+        self.postings: dict[str, set] = {}
+        self._built = False
+        self._lock = Lock()
+        self._build_lock = Lock()
+
+    def add(self, key_value, values: list[Union[str, None]]):
+        with self._lock:
+            for value in values:
+                if value:
+                    for trigram in trigrams(value):
+                        self.postings.setdefault(trigram, set()).add(key_value)
+
+    def build(self, db: Session, model):
+        """
+        Index all rows of the table
+        :param db:
+        :param model: mapped class of the indexed table
+        :return:
+        """
+        if self._built:
+            return
+        with self._build_lock:
+            if self._built:
+                return
+            # listen before the scan, so rows inserted meanwhile are not missed
+            event.listen(model, 'after_insert', self._on_change)
+            event.listen(model, 'after_update', self._on_change)
+            for row in db.query(self.key, *self.columns):
+                self.add(row[0], list(row[1:]))
+            self._built = True
+
+    def _on_change(self, mapper, connection, target):
+        # stale postings of old values only produce extra candidates, which are filtered out by the query
+        self.add(getattr(target, self.key.key), [getattr(target, column.key) for column in self.columns])
+
+    def candidates(self, q: str) -> Union[set, None]:
+        """
+        Get primary keys of rows which may contain q
+        :param q:
+        :return: None if q is too short to be looked up
+        """
+        q_trigrams = trigrams(q)
+        if not q_trigrams:
+            return None
+        with self._lock:
+            postings = sorted((self.postings.get(trigram, set()) for trigram in q_trigrams), key=len)
+            return set.intersection(*postings)
+
+
+class InvertedIndexSearchBackend(SearchBackend):
+    """
+    In-process backend for dialects without trigram indexes
+    """
+
+    def __init__(self):
+        self.indexes: dict[tuple, InvertedIndex] = {}
+        self._lock = Lock()
+
+    def get_index(self,
+                  db: Session,
+                  key: InstrumentedAttribute,
+                  columns: list[InstrumentedAttribute]) -> InvertedIndex:
+        index_key = (key.class_.__tablename__, *(column.key for column in columns))
+        with self._lock:
+            index = self.indexes.get(index_key)
+            if index is None:
+                index = self.indexes[index_key] = InvertedIndex(key, columns)
+        index.build(db, key.class_)
+        return index
+
+    def search(self,
+               db: Session,
+               query: Query,
+               key: InstrumentedAttribute,
+               columns: list[InstrumentedAttribute],
+               q: str,
+               limit: int) -> list:
+        candidates = self.get_index(db, key, columns).candidates(q)
+        query = query.filter(self.condition(columns, q)).order_by(key.asc())
+        rows = query.limit(limit * FALLBACK_ROWS_FACTOR).all()
+        # the index sees only ORM changes of this process, so candidates add rows but never exclude them
+        if candidates and len(candidates) <= MAX_CANDIDATES:
+            found = {getattr(row, key.key) for row in rows}
+            missing = candidates - found
+            if missing and len(rows) == limit * FALLBACK_ROWS_FACTOR:
+                rows.extend(query.filter(key.in_(missing)).all())
+        q_trigrams = trigrams(q)
+        rows.sort(key=lambda row: -max(similarity(q_trigrams, getattr(row, column.key)) for column in columns))
+        return rows[:limit]
+
+
+search_backends = {
+    'postgresql': TrigramSearchBackend()
+}
+fallback_search_backend = InvertedIndexSearchBackend()
+
+
+def get_search_backend(db: Session) -> SearchBackend:
+    """
+    Get search backend for the dialect of the session
+    :param db:
+    :return:
+    """
+    return search_backends.get(db.get_bind().dialect.name, fallback_search_backend)
+
+
+def search(db: Session,
+           query: Query,
+           key: InstrumentedAttribute,
+           columns: list[InstrumentedAttribute],
+           q: str,
+           limit: int) -> list:
+    """
+    Search the query rows, see SearchBackend.search
+    """
+    return get_search_backend(db).search(db, query, key, columns, q, limit)
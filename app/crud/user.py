@@ -3,11 +3,18 @@ CRUD operations for Users
 """
 
 from typing import Union
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+from sqlalchemy import select
 
+from app.crud.search import search
+from app.crud.batch import get_by_ids
 from app.models.user import User
+from app.models.game import Game
+from app.models.character import Character
 from app.schemas.user import UserCreateSchema, UserUpdateSchema
+from app.core.auth import Principal, principal_cache, publish_principal_invalidated
 
 
 class UsernameNotUnique(Exception):
@@ -16,24 +23,30 @@ class UsernameNotUnique(Exception):
 
 def get_users(db: Session,
               q: str = None,
-              offset: int = 0,
+              after: int = None,
               limit: int = 100) -> Union[list[User], list]:
     """
     Get list of users from database
     :param db:
-    :param q: search filter query
-    :param offset:
+    :param q: search filter query, results are ranked by relevance and not paginated
+    :param after: keyset cursor, return rows with primary key greater than this value
     :param limit:
     :return:
     """
     users = db.query(User)
     if q:
-        users = users.filter(
-            or_(
-                User.username.like(f'%{q}%'),
-                User.nickname.like(f'%{q}%')
-            ))
-    return users.order_by(User.user_id.asc()).offset(offset).limit(limit).all()
+        return search(db, users, User.user_id, [User.username, User.nickname], q, limit)
+    if after is not None:
+        users = users.filter(User.user_id > after)
+    return users.order_by(User.user_id.asc()).limit(limit).all()
+
+
+def select_users() -> Select:
+    """
+    Get statement selecting all users ordered by id, used for streaming export
+    :return:
+    """
+    return select(User).order_by(User.user_id.asc())
 
 
 def get_user_by_id(db: Session, user_id: int) -> Union[User, None]:
@@ -50,6 +63,42 @@ def get_user_by_id(db: Session, user_id: int) -> Union[User, None]:
         return None
 
 
+def get_user_version(db: Session, user_id: int) -> Union[Row, None]:
+    """
+    Get id and updated_at of the user without loading it
+    :param db:
+    :param user_id:
+    :return:
+    """
+    return db.execute(select(User.user_id, User.updated_at).where(User.user_id == user_id)).first()
+
+
+def get_users_by_ids(db: Session, user_ids: list[int]) -> dict[int, User]:
+    """
+    Get users by ids with a single query, see get_by_ids
+    :param db:
+    :param user_ids:
+    :return: user id -> user, missing users are omitted
+    """
+    return get_by_ids(db, User.user_id, user_ids)
+
+
+def get_user_info(db: Session, user_id: int) -> Union[User, None]:
+    """
+    Get user with games, characters and join requests loaded. Every collection is loaded by a single
+    IN query, so the number of statements doesn't depend on the collection sizes
+    :param db:
+    :param user_id:
+    :return:
+    """
+    statement = select(User).where(User.user_id == user_id).options(
+        selectinload(User.games),
+        selectinload(User.characters),
+        selectinload(User.join_requests)
+    )
+    return db.execute(statement).scalar_one_or_none()
+
+
 def get_user_by_name(db: Session, username: str) -> Union[User, None]:
     """
     Get user by username. Full match
@@ -64,6 +113,27 @@ def get_user_by_name(db: Session, username: str) -> Union[User, None]:
         return None
 
 
+def get_principal(db: Session, username: str) -> Union[Principal, None]:
+    """
+    Get principal of the user with ids of owned games and characters
+    :param db:
+    :param username:
+    :return:
+    """
+    user = get_user_by_name(db, username)
+    if user is None:
+        return None
+    game_ids = db.query(Game.game_id).filter(Game.game_master_id == user.user_id)
+    character_ids = db.query(Character.character_id).filter(Character.user_owner_id == user.user_id)
+    return Principal(
+        user_id=user.user_id,
+        username=user.username,
+        disabled=user.disabled,
+        game_ids=frozenset(game_id for game_id, in game_ids),
+        character_ids=frozenset(character_id for character_id, in character_ids)
+    )
+
+
 def create_user(db: Session, user: UserCreateSchema) -> User:
     """
     Create new user
@@ -96,7 +166,9 @@ def update_user(db: Session, user_id: int, user: UserUpdateSchema) -> Union[User
     else:
         for var, value in user.dict(exclude_unset=False).items():
             setattr(existing_user, var, value)
+        publish_principal_invalidated(db, user_id)
         db.commit()
+        principal_cache.invalidate_user(user_id)
         return existing_user
 
 
@@ -113,7 +185,9 @@ def disable_user(db: Session, user_id: int) -> Union[None, bool]:
     else:
         try:
             user.disabled = True
+            publish_principal_invalidated(db, user_id)
             db.commit()
+            principal_cache.invalidate_user(user_id)
             return True
         except:
             # todo: need to log exception in disable_item
@@ -133,7 +207,9 @@ def enable_user(db: Session, user_id: int) -> Union[None, bool]:
     else:
         try:
             user.disabled = False
+            publish_principal_invalidated(db, user_id)
             db.commit()
+            principal_cache.invalidate_user(user_id)
             return True
         except:
             # todo: need to log exception in disable_item
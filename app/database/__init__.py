@@ -1,6 +1,8 @@
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession as _AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 
 Base = declarative_base()
-Session = sessionmaker(autocommit=False, autoflush=False)
+Session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+AsyncSession = sessionmaker(class_=_AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,30 @@
+"""
+Dialect specific DDL attached to tables
+"""
+from sqlalchemy import DDL, Table, event
+
+from app.database import Base
+
+
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+
+def trigram_indexes(table: Table, *columns: str):
+    """
+    Create pg_trgm GIN indexes on table columns, used by LIKE/ILIKE search filters on Postgres.
+    Other dialects don't get any index as a b-tree one can't be used by '%q%' filters
+    :param table:
+    :param columns:
+    :return:
+    """
+    for column in columns:
+        event.listen(
+            table,
+            'after_create',
+            DDL(f'CREATE INDEX IF NOT EXISTS ix_{table.name}_{column}_trgm '
+                f'ON {table.name} USING gin ({column} gin_trgm_ops)').execute_if(dialect='postgresql')
+        )
@@ -1,21 +1,144 @@
 """
 Database service functions
 """
+from typing import Union
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
 from sqlalchemy_utils import database_exists, drop_database, create_database
 
 from app.config import settings
-from app.database import Base, Session
+from app.database import Base, Session, AsyncSession
+from app.core.metrics import instrument_engine
+from app.database.pool import InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool
+# models have to be imported to be registered in metadata before create_all
+from app.models import user, game, character, item, adventure  # noqa: F401
 
 
-def init_database():
+# async drivers used when db_async_uri is not set explicitly
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+_engine: Union[Engine, None] = None
+_async_engine: Union[AsyncEngine, None] = None
+
+
+def get_engine_options(db_uri: str, is_async: bool = False) -> dict:
+    """
+    Get create_engine keyword arguments for configured connection pool
+    :param db_uri:
+    :param is_async: build options for create_async_engine
+    :return:
+    """
+    # sqlite uses its own non-queue pools, which don't accept queue sizing options.
+    # A session may be used from several threadpool workers within a single request
+    if make_url(db_uri).get_backend_name() == 'sqlite':
+        return {} if is_async else {'connect_args': {'check_same_thread': False}}
+    return {
+        'poolclass': InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool,
+        'pool_size': settings.db_pool_size,
+        'max_overflow': settings.db_max_overflow,
+        'pool_pre_ping': settings.db_pool_pre_ping,
+        'pool_recycle': settings.db_pool_recycle,
+        'pool_timeout': settings.db_pool_timeout
+    }
+
+
+def get_async_uri(db_uri: str) -> str:
+    """
+    Get database uri with async driver
+    :param db_uri:
+    :return:
+    """
+    url = make_url(db_uri)
+    return str(url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]))
+
+
+def init_database() -> Engine:
+    global _engine, _async_engine
+
     if not database_exists(settings.db_uri):
         create_database(settings.db_uri)
     elif settings.dev_mode and settings.drop_db:
         drop_database(settings.db_uri)
         create_database(settings.db_uri)
 
-    engine = create_engine(settings.db_uri)
+    engine = create_engine(settings.db_uri, **get_engine_options(settings.db_uri))
+    instrument_engine(engine)
     Session.configure(bind=engine)
     Base.metadata.create_all(engine)
-    return
+    _engine = engine
+
+    if settings.db_async:
+        async_uri = settings.db_async_uri or get_async_uri(settings.db_uri)
+        _async_engine = create_async_engine(async_uri, **get_engine_options(async_uri, is_async=True))
+        instrument_engine(_async_engine.sync_engine)
+        AsyncSession.configure(bind=_async_engine)
+    return engine
+
+
+def get_engine() -> Union[Engine, None]:
+    """
+    Get engine created by init_database
+    :return:
+    """
+    return _engine
+
+
+def get_async_engine() -> Union[AsyncEngine, None]:
+    """
+    Get async engine created by init_database, None if async mode is disabled
+    :return:
+    """
+    return _async_engine
+
+
+def warm_up_pool(engine: Engine) -> int:
+    """
+    Open pool connections in advance, so first requests don't pay for connecting
+    :param engine:
+    :return: number of connections opened
+    """
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+    # connections have to be held simultaneously, otherwise the pool hands out the same one
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def warm_up_async_pool(engine: AsyncEngine) -> int:
+    """
+    Open async pool connections in advance
+    :param engine:
+    :return: number of connections opened
+    """
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            connections.append(await engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+async def dispose_database():
+    """
+    Close all pooled connections of the engines
+    :return:
+    """
+    if _engine is not None:
+        _engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
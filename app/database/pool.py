@@ -0,0 +1,65 @@
+"""
+Database connection pool
+"""
+import time
+from threading import Lock
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool which keeps track of checkouts and time spent waiting for a connection
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = Lock()
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait_time = time.perf_counter() - started_at
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_time_total += wait_time
+                self.wait_time_max = max(self.wait_time_max, wait_time)
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """
+    Instrumented pool for asyncio engines
+    """
+    pass
+
+
+def get_pool_status(engine: Engine) -> dict:
+    """
+    Get connection pool statistics
+    :param engine:
+    :return: dict with pool size, checked out connections, overflow and wait time
+    """
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'timeout': pool.timeout()
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update({
+            'checkouts': pool.checkouts,
+            'wait_time_total': pool.wait_time_total,
+            'wait_time_avg': pool.wait_time_total / pool.checkouts if pool.checkouts else 0.0,
+            'wait_time_max': pool.wait_time_max
+        })
+    return status
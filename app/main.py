@@ -1,16 +1,29 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
-from app.database.init_database import init_database
+from app.database.init_database import (
+    init_database, get_engine, get_async_engine, warm_up_pool, warm_up_async_pool, dispose_database
+)
+from app.database.pool import get_pool_status
+from app.core.auth import principal_cache
+from app.crud.adventure import adventure_cache
+from app.core.broadcast import game_channels
+from app.core.feeds import join_request_feeds
+from app.core.events import create_event_bus, get_event_bus, set_event_bus
 from app.api import api_router
+from app.api.middleware import MetricsMiddleware
+from app.core.metrics import render_metrics
 
 
 init_database()
 
 app = FastAPI(
     title='Dragonroll Gameserver API',
-    version='0.0.1'
+    version='0.0.1',
+    default_response_class=ORJSONResponse if settings.fast_serialization else JSONResponse
 )
 
 app.include_router(api_router)
@@ -23,6 +36,26 @@ app.add_middleware(
     allow_headers=['*']
 )
 
+app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
+
+
+@app.on_event('startup')
+async def startup():
+    event_bus = create_event_bus(settings.event_bus)
+    set_event_bus(event_bus)
+    event_bus.start()
+    if settings.db_pool_warmup:
+        if settings.db_async:
+            await warm_up_async_pool(get_async_engine())
+        else:
+            warm_up_pool(get_engine())
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await run_in_threadpool(get_event_bus().stop)
+    await dispose_database()
+
 
 @app.get('/info')
 async def root():
@@ -30,3 +63,34 @@ async def root():
         'app_name': settings.app_name,
         'sqlalchemy_uri': settings.db_uri
     }
+
+
+@app.get('/info/db_pool')
+async def db_pool():
+    engine = get_async_engine().sync_engine if settings.db_async else get_engine()
+    return get_pool_status(engine)
+
+
+@app.get('/info/auth_cache')
+async def auth_cache():
+    return principal_cache.stats()
+
+
+@app.get('/info/adventure_cache')
+async def adventure_cache_info():
+    return adventure_cache.stats()
+
+
+@app.get('/info/game_channels')
+async def game_channels_info():
+    return game_channels.stats()
+
+
+@app.get('/info/join_request_feeds')
+async def join_request_feeds_info():
+    return join_request_feeds.stats()
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics():
+    return render_metrics()
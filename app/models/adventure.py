@@ -8,6 +8,7 @@ from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 
 from app.database import Base
+from app.database.ddl import trigram_indexes
 
 
 class Adventure(Base):
@@ -19,9 +20,23 @@ class Adventure(Base):
     name = Column(String(255), nullable=False)
     plot = Column(Text, default=None)
     is_active = Column(Boolean, default=True)
+    # marks the current version of the adventure, maintained by crud on every new version
+    is_latest = Column(Boolean, default=True, nullable=False)
+    # locked by a game table, updates of a locked adventure create a new version
+    locked = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # one current version per adventure, listing and fetching current adventures is an index lookup
+        Index('ix_adventures_latest', 'adventure_id', unique=True,
+              postgresql_where=is_latest.is_(True), sqlite_where=is_latest.is_(True)),
+    )
+
     @property
     def is_locked(self):
-        return False
+        # versions superseded by a newer one are never changed either
+        return bool(self.locked) or self.is_latest is False
+
+
+trigram_indexes(Adventure.__table__, 'name', 'plot')
@@ -3,13 +3,18 @@ Character model class
 """
 
 from sqlalchemy import Integer, String, Column, ForeignKey, \
-    Boolean, Text, UniqueConstraint, PrimaryKeyConstraint, Index, DateTime
+    Boolean, Text, UniqueConstraint, PrimaryKeyConstraint, Index, DateTime, SmallInteger, LargeBinary, \
+    and_, exists
 from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql.expression import Exists
 from datetime import datetime
+from typing import Iterable
 
 from app.database import Base
+from app.database.ddl import trigram_indexes
 from app.models.refs import game_character
 from app.core.operations.utils import CharacterAbilities
+from app.core.operations import sheet
 
 
 class Character(Base):
@@ -20,12 +25,13 @@ class Character(Base):
     name = Column(String(255), nullable=False)
     biography = Column(String(255), default=None)
     disabled = Column(Boolean, default=False)
-    user_owner_id = Column(Integer, ForeignKey('users.user_id'))
+    user_owner_id = Column(Integer, ForeignKey('users.user_id'), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = relationship('User', back_populates='characters')
     games = relationship('Game', secondary=game_character, back_populates='characters')
+    abilities = relationship('CharacterSheet', uselist=False)
 
     def __init__(self,
                  name: str,
@@ -39,4 +45,96 @@ class Character(Base):
         self.abilities = None
 
     def load(self):
-        self.abilities = CharacterAbilities(self.character_id)
+        """
+        Roll abilities of a character which has none
+        """
+        if self.abilities is None:
+            self.abilities = CharacterSheet.from_abilities(CharacterAbilities(self.character_id))
+
+    @classmethod
+    def owned_by(cls, user_id: int, character_id: int) -> Exists:
+        """
+        Condition of the user owning the character, an index lookup
+        :param user_id:
+        :param character_id:
+        :return:
+        """
+        return exists().where(and_(cls.character_id == character_id, cls.user_owner_id == user_id))
+
+
+trigram_indexes(Character.__table__, 'name')
+
+
+class CharacterSheet(Base):
+    """
+    Ability scores of a character with derived values, which are computed when the scores, level
+    or proficiencies change, so sheets are served as stored.
+    Proficiencies are bit masks and bonuses are packed, see app.core.operations.sheet
+    """
+
+    __tablename__ = 'characters_sheets'
+
+    character_id = Column(Integer, ForeignKey('characters.character_id'), primary_key=True)
+    level = Column(SmallInteger, nullable=False, default=1)
+    proficiency_bonus = Column(SmallInteger, nullable=False)
+    save_proficiencies_mask = Column(SmallInteger, nullable=False, default=0)
+    skill_proficiencies_mask = Column(Integer, nullable=False, default=0)
+    bonuses = Column(LargeBinary(sheet.BONUSES_SIZE), nullable=False)
+    hp = Column(SmallInteger, nullable=False)
+    ac = Column(SmallInteger, nullable=False)
+    # names of the builtins are shadowed in the class body only
+    str = Column(SmallInteger, nullable=False)
+    dex = Column(SmallInteger, nullable=False)
+    con = Column(SmallInteger, nullable=False)
+    int = Column(SmallInteger, nullable=False)
+    wis = Column(SmallInteger, nullable=False)
+    cha = Column(SmallInteger, nullable=False)
+
+    @classmethod
+    def from_abilities(cls, abilities: CharacterAbilities) -> 'CharacterSheet':
+        """
+        Create level 1 sheet without proficiencies
+        :param abilities: rolled abilities
+        :return:
+        """
+        character_sheet = cls(level=1, save_proficiencies_mask=0, skill_proficiencies_mask=0,
+                              **{score: getattr(abilities, score) for score in sheet.SCORES})
+        character_sheet.recompute()
+        return character_sheet
+
+    @property
+    def scores(self) -> dict:
+        return {ability: getattr(self, ability) for ability in sheet.ABILITIES}
+
+    def recompute(self, changed: Iterable = None):
+        """
+        Recompute derived values
+        :param changed: names of changed values, everything is recomputed by default
+        :return:
+        """
+        self.proficiency_bonus = sheet.proficiency_bonus(self.level)
+        values = (self.scores, self.level, self.save_proficiencies_mask, self.skill_proficiencies_mask)
+        if changed is None or self.bonuses is None:
+            self.bonuses = sheet.compute_bonuses(*values)
+        else:
+            self.bonuses = sheet.update_bonuses(self.bonuses, changed, *values)
+
+    @property
+    def save_proficiencies(self) -> list:
+        return sheet.from_mask(self.save_proficiencies_mask, sheet.ABILITIES)
+
+    @property
+    def skill_proficiencies(self) -> list:
+        return sheet.from_mask(self.skill_proficiencies_mask, sheet.SKILL_NAMES)
+
+    @property
+    def modifiers(self) -> dict:
+        return sheet.unpack_bonuses(self.bonuses)[0]
+
+    @property
+    def saves(self) -> dict:
+        return sheet.unpack_bonuses(self.bonuses)[1]
+
+    @property
+    def skills(self) -> dict:
+        return sheet.unpack_bonuses(self.bonuses)[2]
@@ -3,12 +3,15 @@ Gametable model class
 """
 
 from sqlalchemy import Integer, String, Column, ForeignKey, \
-    Boolean, Text, UniqueConstraint, PrimaryKeyConstraint, Index, DateTime, Table
+    Boolean, Text, UniqueConstraint, PrimaryKeyConstraint, Index, DateTime, Table, BigInteger, SmallInteger, \
+    and_, exists
 from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql.expression import Exists
 from datetime import datetime
 
 from app.database import Base
 from app.models.refs import game_character
+from app.core.operations.rng import RNG_VERSION, new_seed
 
 
 class Game(Base):
@@ -16,15 +19,28 @@ class Game(Base):
     __tablename__ = 'games'
 
     game_id = Column(Integer, primary_key=True)
-    game_master_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+    game_master_id = Column(Integer, ForeignKey('users.user_id'), nullable=False, index=True)
     game_state = Column(Boolean, default=True)
     disabled = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # random streams of the game rolls (see app.core.operations.rng), the seed is never exposed
+    rng_seed = Column(BigInteger, nullable=False, default=new_seed)
+    rng_counter = Column(BigInteger, nullable=False, default=0)
 
     characters = relationship('Character', secondary=game_character, back_populates='games')
     game_master = relationship('User', back_populates='games')
 
+    @classmethod
+    def mastered_by(cls, user_id: int, game_id: int) -> Exists:
+        """
+        Condition of the user being the game master of the game, an index lookup
+        :param user_id:
+        :param game_id:
+        :return:
+        """
+        return exists().where(and_(cls.game_id == game_id, cls.game_master_id == user_id))
+
 
 class GameJoinRequest(Base):
     """
@@ -34,6 +50,10 @@ class GameJoinRequest(Base):
         3 - declined
     """
     __tablename__ = 'games_join_requests'
+    __table_args__ = (
+        # pending requests count of the lobby and join requests of a game
+        Index('ix_games_join_requests_game_id_status_code', 'game_id', 'status_code'),
+    )
 
     request_id = Column(Integer, primary_key=True)
     game_id = Column(Integer, ForeignKey('games.game_id'), nullable=False)
@@ -63,3 +83,25 @@ class GameJoinRequest(Base):
             3: 'declined'
         }
         return codes[self.status_code]
+
+
+class GameRoll(Base):
+    """
+    Dice roll of a game. Outcomes are not stored, they are regenerated from the game seed
+    and the roll counter by the random streams of rng_version
+    """
+    __tablename__ = 'games_rolls'
+
+    game_id = Column(Integer, ForeignKey('games.game_id'), primary_key=True)
+    counter = Column(BigInteger, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.character_id'), default=None)
+    notation = Column(String(100), nullable=False)
+    mode = Column(String(12), nullable=False, default='normal')
+    times = Column(Integer, nullable=False, default=1)
+    rng_version = Column(SmallInteger, nullable=False, default=RNG_VERSION)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # outcome of the roll, set by app.crud.game when the roll is made or replayed
+    totals = None
+    dice = None
@@ -8,6 +8,7 @@ from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 
 from app.database import Base
+from app.database.ddl import trigram_indexes
 
 
 """
@@ -43,6 +44,9 @@ class Item(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+trigram_indexes(Item.__table__, 'name', 'description')
+
+
 # class ItemFeatureUse(Base):
 #
 #     __tablename__ = 'items_features_use'
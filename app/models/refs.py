@@ -13,7 +13,9 @@ from app.database import Base
 game_character = Table('games_characters_ref',
                        Base.metadata,
                        Column('id', Integer, primary_key=True),
-                       Column('game_id', Integer, ForeignKey('games.game_id')),
-                       Column('character_id', Integer, ForeignKey('characters.character_id'))
+                       Column('game_id', Integer, ForeignKey('games.game_id'), index=True),
+                       Column('character_id', Integer, ForeignKey('characters.character_id')),
+                       # a character participates one game at most
+                       UniqueConstraint('character_id', name='uq_games_characters_ref_character_id')
                        )
 
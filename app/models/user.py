@@ -3,11 +3,14 @@ User model class
 """
 
 from sqlalchemy import Integer, String, Column, ForeignKey, \
-    Boolean, Text, UniqueConstraint, PrimaryKeyConstraint, Index, DateTime
-from sqlalchemy.orm import relationship, validates
+    Boolean, Text, UniqueConstraint, PrimaryKeyConstraint, Index, DateTime, inspect
+from sqlalchemy.orm import relationship, validates, object_session
+from sqlalchemy.orm.attributes import NO_VALUE
+from sqlalchemy.orm.exc import DetachedInstanceError
 from datetime import datetime
 
 from app.database import Base
+from app.database.ddl import trigram_indexes
 from app.models.game import Game
 from app.models.character import Character
 
@@ -29,24 +32,38 @@ class User(Base):
     characters = relationship('Character', back_populates='user')
     join_requests = relationship('GameJoinRequest', back_populates='user')
 
+    def _loaded(self, collection: str) -> list:
+        # detached users can't load collections, only the loaded ones can be checked
+        value = inspect(self).attrs[collection].loaded_value
+        if value is NO_VALUE:
+            raise DetachedInstanceError(f'{collection} of detached user {self.user_id} are not loaded')
+        return value
+
     def is_gm(self, game_id: int) -> bool:
         """
-        Returns True if the user owns the game
+        Returns True if the user owns the game.
+        Checked by EXISTS query without loading games, detached users check their loaded games
         :param game_id:
         :return:
+        :raises DetachedInstanceError: if the user is detached and games aren't loaded
         """
-        if game_id in [g.game_id for g in self.games]:
-            return True
-        else:
-            return False
+        db = object_session(self)
+        if db is None:
+            return game_id in [g.game_id for g in self._loaded('games')]
+        return db.query(Game.mastered_by(self.user_id, game_id)).scalar()
 
     def owns_character(self, character_id: int) -> bool:
         """
-        Check if the user owns the character with specified id
+        Check if the user owns the character with specified id.
+        Checked by EXISTS query without loading characters, detached users check their loaded characters
         :param character_id:
         :return:
+        :raises DetachedInstanceError: if the user is detached and characters aren't loaded
         """
-        if character_id in [char.character_id for char in self.characters]:
-            return True
-        else:
-            return False
+        db = object_session(self)
+        if db is None:
+            return character_id in [char.character_id for char in self._loaded('characters')]
+        return db.query(Character.owned_by(self.user_id, character_id)).scalar()
+
+
+trigram_indexes(User.__table__, 'username', 'nickname')
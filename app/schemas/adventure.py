@@ -32,4 +32,5 @@ class AdventureSchema(AdventureBase):
 class AdventureInDBSchema(AdventureSchema):
     aid: int
     is_active: bool
+    is_latest: bool
     is_locked: bool
@@ -1,21 +1,52 @@
 
-from typing import Optional, Any
+from typing import Optional, Any, Literal
 import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, conint
+
+from app.core.operations.sheet import ABILITIES, SKILL_NAMES, MAX_ABILITY_SCORE, MAX_LEVEL
+
+
+# noinspection PyUnboundLocalVariable
+class CharacterAbilitiesScheme(BaseModel):
+    hp: int
+    ac: int
+    str: int
+    dex: int
+    con: int
+    int: int
+    wis: int
+    cha: int
+    level: int
+    proficiency_bonus: int
+    save_proficiencies: list[Literal[ABILITIES]]
+    skill_proficiencies: list[Literal[SKILL_NAMES]]
+    modifiers: dict[Literal[ABILITIES], int]
+    saves: dict[Literal[ABILITIES], int]
+    skills: dict[Literal[SKILL_NAMES], int]
+
+    class Config:
+        orm_mode = True
+
+
+Score = conint(ge=1, le=MAX_ABILITY_SCORE)
 
 
 # noinspection PyUnboundLocalVariable
-# class CharacterAbilitiesScheme(BaseModel):
-#     hp: Optional[int]
-#     ac: Optional[int]
-#     str: Optional[int]
-#     dex: Optional[int]
-#     con: Optional[int]
-#     int: Optional[int]
-#     cha: Optional[int]
-#
-#     class Config:
-#         orm_mode: True
+class CharacterAbilitiesUpdateScheme(BaseModel):
+    """
+    Changes of gear, effects or level, abilities which are not set keep their values
+    """
+    hp: Optional[conint(ge=0, le=9999)]
+    ac: Optional[conint(ge=0, le=99)]
+    str: Optional[Score]
+    dex: Optional[Score]
+    con: Optional[Score]
+    int: Optional[Score]
+    wis: Optional[Score]
+    cha: Optional[Score]
+    level: Optional[conint(ge=1, le=MAX_LEVEL)]
+    save_proficiencies: Optional[list[Literal[ABILITIES]]]
+    skill_proficiencies: Optional[list[Literal[SKILL_NAMES]]]
 
 
 class CharacterBase(BaseModel):
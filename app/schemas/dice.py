@@ -0,0 +1,30 @@
+from typing import Literal, Optional
+from pydantic import BaseModel, conint, constr, validator
+
+from app.core.operations.dice import compile_dice
+
+'''
+Dice rolls schemas
+'''
+
+MAX_ROLLS = 10000
+
+
+class DiceRollCreateSchema(BaseModel):
+    notation: constr(max_length=100)
+    mode: Literal['normal', 'advantage', 'disadvantage'] = 'normal'
+    times: conint(ge=1, le=MAX_ROLLS) = 1
+
+    @validator('notation')
+    def notation_is_valid(cls, notation: str) -> str:
+        # DiceNotationError is a ValueError, so it is reported as validation error
+        compile_dice(notation)
+        return notation
+
+
+class DiceRollsSchema(BaseModel):
+    notation: str
+    mode: Literal['normal', 'advantage', 'disadvantage']
+    totals: list[int]
+    # dice values of every dice term, only for a single roll
+    dice: Optional[list[list[int]]]
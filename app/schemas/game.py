@@ -1,8 +1,8 @@
 from typing import Optional, Literal
 import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
 
-from .user import UserBase
+from app.schemas.dice import DiceRollCreateSchema
 
 '''
 Game entity schemas
@@ -34,6 +34,12 @@ class GameSchema(GameBase):
         orm_mode = True
 
 
+class GameLobbySchema(GameSchema):
+    characters_count: int
+    pending_requests_count: int
+    game_master_nickname: Optional[str]
+
+
 '''
 Join requests entity schemas
 '''
@@ -60,3 +66,39 @@ class JoinRequestSchema(JoinRequestBaseSchema):
 
     class Config:
         orm_mode = True
+
+
+class JoinRequestsBulkUpdateSchema(BaseModel):
+    action: Literal['accept', 'decline']
+    request_ids: conlist(int, min_items=1, max_items=1000)
+
+
+class JoinRequestOutcomeSchema(BaseModel):
+    request_id: int
+    outcome: Literal['accepted', 'declined', 'not_found', 'not_pending', 'character_not_found',
+                     'character_unavailable']
+
+
+'''
+Game rolls schemas
+'''
+
+
+class GameRollCreateSchema(DiceRollCreateSchema):
+    # roll of the character stream, rolls without character are made by the GM
+    character_id: Optional[int]
+
+
+class GameRollSchema(BaseModel):
+    counter: int
+    user_id: int
+    character_id: Optional[int]
+    notation: str
+    mode: Literal['normal', 'advantage', 'disadvantage']
+    times: int
+    totals: list[int]
+    dice: Optional[list[list[int]]]
+    created_at: datetime.datetime
+
+    class Config:
+        orm_mode = True
@@ -3,6 +3,9 @@ from typing import Optional
 import datetime
 from pydantic import BaseModel
 
+from .game import GameSchema, JoinRequestSchema
+from .character import CharacterSchema
+
 
 class UserBase(BaseModel):
     username: str
@@ -31,3 +34,9 @@ class UserSchema(UserBase):
 
 class UserLobbySchema(BaseModel):
     pass
+
+
+class UserInfoSchema(UserSchema):
+    games: list[GameSchema]
+    characters: list[CharacterSchema]
+    join_requests: list[JoinRequestSchema]
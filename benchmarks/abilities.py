@@ -0,0 +1,115 @@
+"""
+Character abilities benchmark: memory and speed of the former __dict__ based class
+vs __slots__ instances and a single AbilitiesBatch
+
+Run with: python -m benchmarks.abilities
+"""
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from app.core.operations.dice import compile_dice
+from app.core.operations.utils import AbilitiesBatch, CharacterAbilities
+
+
+CHARACTERS = 100_000
+REPEAT = 5
+ABILITY_ROLL = compile_dice('1d9+9')
+
+
+class DictCharacterAbilities:
+    """Abilities the way they were kept before: instance __dict__ with a property per score"""
+
+    def __init__(self, character_id, rng: np.random.Generator = None):
+        self.__character_id = character_id
+        self._ab_hp = 0
+        self._ab_ac = 0
+        self._ab_str = 0
+        self._ab_dex = 0
+        self._ab_con = 0
+        self._ab_int = 0
+        self._ab_wis = 0
+        self._ab_cha = 0
+        attrs = [ability for ability in self.__dict__ if ability.startswith('_ab_')]
+        for attr, value in zip(attrs, ABILITY_ROLL.roll_many(len(attrs), rng).tolist()):
+            setattr(self, attr, value)
+
+    @property
+    def str(self):
+        return self._ab_str
+
+    @property
+    def dex(self):
+        return self._ab_dex
+
+    @property
+    def con(self):
+        return self._ab_con
+
+    @property
+    def int(self):
+        return self._ab_int
+
+    @property
+    def wis(self):
+        return self._ab_wis
+
+    @property
+    def cha(self):
+        return self._ab_cha
+
+
+def python_modifiers(abilities: list) -> list:
+    return [(item.str // 2 - 5, item.dex // 2 - 5, item.con // 2 - 5,
+             item.int // 2 - 5, item.wis // 2 - 5, item.cha // 2 - 5) for item in abilities]
+
+
+def allocated(factory) -> int:
+    """Bytes held by the result of the factory"""
+    tracemalloc.start()
+    result = factory()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    rng = np.random.default_rng()
+    scores = ABILITY_ROLL.roll_many(CHARACTERS * 8, rng).reshape(-1, 8).tolist()
+
+    print(f'memory of {CHARACTERS:,} characters')
+    sizes = {
+        '__dict__': allocated(lambda: [DictCharacterAbilities(i, rng) for i in range(CHARACTERS)]),
+        '__slots__': allocated(lambda: [CharacterAbilities(i, scores=values) for i, values in enumerate(scores)]),
+        'batch': allocated(lambda: AbilitiesBatch.roll(range(CHARACTERS), rng)),
+    }
+    for name, size in sizes.items():
+        print(f'{name:<10} {size / 2 ** 20:>8.2f} MiB   {size / CHARACTERS:>6.1f} B/character   '
+              f'x{sizes["__dict__"] / size:.1f}')
+
+    print(f'\ncreation (rolled), best of {REPEAT} runs')
+    dict_time = min(timeit.repeat(lambda: [DictCharacterAbilities(i, rng) for i in range(CHARACTERS)],
+                                  number=1, repeat=REPEAT))
+    slots_time = min(timeit.repeat(lambda: [CharacterAbilities(i, rng) for i in range(CHARACTERS)],
+                                   number=1, repeat=REPEAT))
+    batch_time = min(timeit.repeat(lambda: AbilitiesBatch.roll(range(CHARACTERS), rng), number=1, repeat=REPEAT))
+    for name, seconds in (('__dict__', dict_time), ('__slots__', slots_time), ('batch', batch_time)):
+        print(f'{name:<10} {seconds * 1000:>9.1f} ms   x{dict_time / seconds:.1f}')
+
+    print(f'\nability modifiers, best of {REPEAT} runs')
+    dict_abilities = [DictCharacterAbilities(i, rng) for i in range(CHARACTERS)]
+    slots_abilities = [CharacterAbilities(i, rng) for i in range(CHARACTERS)]
+    batch = AbilitiesBatch.from_abilities(slots_abilities)
+    dict_time = min(timeit.repeat(lambda: python_modifiers(dict_abilities), number=1, repeat=REPEAT))
+    slots_time = min(timeit.repeat(lambda: python_modifiers(slots_abilities), number=1, repeat=REPEAT))
+    batch_time = min(timeit.repeat(batch.modifiers, number=1, repeat=REPEAT))
+    bonuses_time = min(timeit.repeat(lambda: batch.bonuses(5, 0b11, 0b101), number=1, repeat=REPEAT))
+    for name, seconds in (('__dict__', dict_time), ('__slots__', slots_time), ('batch', batch_time),
+                          ('bonuses', bonuses_time)):
+        print(f'{name:<10} {seconds * 1000:>9.1f} ms   x{dict_time / seconds:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Response serialization benchmark: pydantic response model path vs compiled ORM serializers + orjson
+
+Run with: python -m benchmarks.serialization
+"""
+import json
+import timeit
+from datetime import datetime
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+
+from app.core.serialization import get_serializer
+from app.models.adventure import Adventure
+from app.models.character import Character
+from app.models.game import Game
+from app.models.item import Item
+from app.models.user import User
+from app.schemas.adventure import AdventureSchema
+from app.schemas.character import CharacterSchema
+from app.schemas.game import GameSchema
+from app.schemas.item import ItemSchema
+from app.schemas.user import UserSchema
+
+
+ROWS = 1000
+REPEAT = 20
+
+
+def make_rows() -> dict:
+    now = datetime.utcnow()
+    rows = {
+        GameSchema: [Game(game_id=i, game_master_id=i, game_state=True, disabled=False) for i in range(ROWS)],
+        CharacterSchema: [Character(name=f'Character {i}', user_owner_id=i, biography='Bio ' * 20)
+                          for i in range(ROWS)],
+        UserSchema: [User(user_id=i, username=f'user_{i}', nickname=f'Nick {i}', disabled=False)
+                     for i in range(ROWS)],
+        ItemSchema: [Item(item_id=i, name=f'Item {i}', description='Description ' * 10, type=1,
+                          reusable=False, weight=1.5, cost=10, disabled=False) for i in range(ROWS)],
+        AdventureSchema: [Adventure(aid=i, adventure_id=i, name=f'Adventure {i}', plot='Plot ' * 200)
+                          for i in range(ROWS)]
+    }
+    for i, character in enumerate(rows[CharacterSchema]):
+        character.character_id = i
+        character.disabled = False
+    for objs in rows.values():
+        for obj in objs:
+            obj.created_at = obj.updated_at = now
+    return rows
+
+
+def pydantic_path(schema, objs) -> bytes:
+    """What FastAPI does for response_model=list[schema] with JSONResponse"""
+    return json.dumps(jsonable_encoder(parse_obj_as(list[schema], objs))).encode()
+
+
+def fast_path(schema, objs) -> bytes:
+    return orjson.dumps(get_serializer(schema).dump_many(objs))
+
+
+def main():
+    print(f'{ROWS} rows, best of {REPEAT} runs')
+    for schema, objs in make_rows().items():
+        assert json.loads(pydantic_path(schema, objs)) == json.loads(fast_path(schema, objs))
+        slow = min(timeit.repeat(lambda: pydantic_path(schema, objs), number=1, repeat=REPEAT))
+        fast = min(timeit.repeat(lambda: fast_path(schema, objs), number=1, repeat=REPEAT))
+        print(f'{schema.__name__:<18} pydantic: {slow * 1000:8.2f} ms   '
+              f'compiled+orjson: {fast * 1000:8.2f} ms   x{slow / fast:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@ import pytest
 from starlette.testclient import TestClient
 
 from app.main import app
+from app.config import settings
+from app.core.metrics import count_queries
+from app.core.query_budget import budget_violations
 from app.database import Session
 
 
@@ -15,3 +18,22 @@ def test_app():
 def test_db_connection():
     db = Session()
     yield db
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(monkeypatch):
+    """Fail tests making requests which exceed SQL statement budgets of endpoints"""
+    monkeypatch.setattr(settings, 'query_budgets', True)
+    budget_violations.clear()
+    yield
+    violations = list(budget_violations)
+    budget_violations.clear()
+    if violations:
+        pytest.fail('\n'.join(str(violation) for violation in violations))
+
+
+@pytest.fixture
+def query_counter():
+    """Record SQL statements executed during the test"""
+    with count_queries() as log:
+        yield log
@@ -0,0 +1,82 @@
+"""
+Adventures versioning tests
+"""
+import pytest
+from sqlalchemy import and_, select
+
+from app.crud import adventure as crud
+from app.crud import AdventureVersionConflict
+from app.database import Session
+from app.models.adventure import Adventure
+from app.schemas.adventure import AdventureCreateSchema, AdventureUpdateSchema
+
+
+def test_adventure_versions(test_db_connection):
+    db = test_db_connection
+    adventure = crud.create_adventure(db, AdventureCreateSchema(name='Lost Mine', plot='Goblins'))
+    assert adventure.is_latest is True
+
+    # unlocked adventures are updated in place
+    assert crud.update_adventure(db, adventure.adventure_id, AdventureUpdateSchema(name='Lost Mine')).aid == \
+           adventure.aid
+    assert adventure.is_locked is False
+
+    # locked adventures get a new version on update
+    crud.lock_adventure(db, adventure.adventure_id)
+    new_version = crud.update_adventure(db, adventure.adventure_id, AdventureUpdateSchema(name='Lost Mine v2'))
+    assert new_version.aid != adventure.aid
+    assert adventure.is_latest is False
+    assert new_version.is_locked is False
+
+    assert crud.get_adventure_by_id(db, adventure.adventure_id).aid == new_version.aid
+    assert crud.get_adventure_by_aid(db, adventure.aid).name == 'Lost Mine'
+    listed = [a for a in crud.get_adventures(db) if a.adventure_id == adventure.adventure_id]
+    assert [a.aid for a in listed] == [new_version.aid]
+
+
+def test_locked_adventure_cache(test_db_connection):
+    db = test_db_connection
+    adventure = crud.create_adventure(db, AdventureCreateSchema(name='Tomb of Horrors', plot='Traps'))
+    crud.get_latest_adventure(db, adventure.adventure_id)
+    assert crud.adventure_cache.get(adventure.aid) is None
+    crud.latest_adventure_cache.pop(adventure.adventure_id)
+    crud.lock_adventure(db, adventure.adventure_id)
+
+    latest = crud.get_latest_adventure(db, adventure.adventure_id)
+    assert latest.aid == adventure.aid
+    assert crud.adventure_cache.get(adventure.aid) is not None
+    cached = crud.get_adventure_by_aid(db, adventure.aid)
+    assert cached is not adventure
+    assert cached.plot == 'Traps'
+
+    new_version = crud.update_adventure(db, adventure.adventure_id, AdventureUpdateSchema(name='Tomb v2'))
+    assert crud.get_latest_adventure(db, adventure.adventure_id).aid == new_version.aid
+    # the previous version isn't served as the latest one from cache
+    assert crud.get_adventure_by_aid(db, adventure.aid).is_latest is False
+    assert crud.get_adventure_by_aid(db, adventure.aid).name == 'Tomb of Horrors'
+
+    crud.disable_adventure(db, adventure.adventure_id)
+    assert crud.get_adventure_by_aid(db, new_version.aid).is_active is False
+
+
+def test_superseded_version_is_locked():
+    assert Adventure(name='Curse of Strahd', locked=False, is_latest=False).is_locked is True
+    assert Adventure(name='Curse of Strahd', locked=False, is_latest=True).is_locked is False
+    assert Adventure(name='Curse of Strahd', locked=True, is_latest=True).is_locked is True
+
+
+def test_concurrent_adventure_versions(test_db_connection, monkeypatch):
+    """An update racing with another one is rejected instead of creating a second latest version"""
+    db = test_db_connection
+    adventure = crud.create_adventure(db, AdventureCreateSchema(name='Out of the Abyss'))
+    crud.lock_adventure(db, adventure.adventure_id)
+    with Session() as other_db:
+        # the other update has read the latest version before this one committed a new one
+        stale = other_db.get(Adventure, adventure.aid)
+        crud.update_adventure(db, adventure.adventure_id, AdventureUpdateSchema(name='Out of the Abyss v2'))
+        monkeypatch.setattr(crud, '_lock_latest_adventure', lambda _, __: stale)
+        with pytest.raises(AdventureVersionConflict):
+            crud.update_adventure(other_db, adventure.adventure_id, AdventureUpdateSchema(name='Abyss v2'))
+    versions = db.execute(select(Adventure.name).where(and_(Adventure.adventure_id == adventure.adventure_id,
+                                                            Adventure.is_latest.is_(True))))
+    assert versions.scalars().all() == ['Out of the Abyss v2']
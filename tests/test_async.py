@@ -0,0 +1,42 @@
+"""
+Async CRUD path tests
+"""
+import asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, AsyncSession
+from app.database.init_database import get_async_uri, get_engine_options
+from app.crud.aio import user as crud
+from app.schemas.user import UserCreateSchema
+
+
+def test_get_async_uri():
+    assert get_async_uri('postgresql://postgres:postgres@db/dragonroll') == \
+           'postgresql+asyncpg://postgres:postgres@db/dragonroll'
+    assert get_async_uri('sqlite:///test.db') == 'sqlite+aiosqlite:///test.db'
+
+
+def test_async_crud(tmp_path):
+    """Check async CRUD functions with both AsyncSession and Session"""
+    db_uri = f'sqlite:///{tmp_path / "async.db"}'
+    engine = create_engine(db_uri, **get_engine_options(db_uri))
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine(get_async_uri(db_uri))
+
+    async def run():
+        async with AsyncSession(bind=async_engine) as db:
+            user = await crud.create_user(db, UserCreateSchema(username='async_user', nickname='Async'))
+            assert user.user_id is not None
+            assert await crud.get_user_by_name(db, 'async_user') is user
+            principal = await crud.get_principal(db, 'async_user')
+            assert principal.user_id == user.user_id
+            assert principal.is_gm(1) is False
+        with sessionmaker(bind=engine)() as db:
+            user = await crud.get_user_by_name(db, 'async_user')
+            assert user.nickname == 'Async'
+        await async_engine.dispose()
+
+    asyncio.run(run())
+    engine.dispose()
@@ -5,6 +5,7 @@ import json
 import pytest
 from random import choice
 
+from app.config import settings
 from app.crud import user as crud
 from app.models.character import Character
 from app.models.game import Game
@@ -152,6 +153,22 @@ class TestUsersEndpoints:
         response = test_app.get('/users')
         assert response.status_code == 403
 
+    def test_read_all_paginated(self, test_app, test_suite):
+        """Test GET /users with cursor pagination"""
+        headers = test_suite.user.authorization_header
+        response = test_app.get('/users', params={'limit': 1}, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        cursor = response.headers['X-Next-Cursor']
+        next_page = test_app.get('/users', params={'limit': 1, 'after': cursor}, headers=headers)
+        assert next_page.status_code == 200
+        assert next_page.json()[0]['user_id'] > response.json()[0]['user_id']
+
+    def test_read_all_invalid_cursor(self, test_app, test_suite):
+        """Test GET /users with malformed cursor"""
+        response = test_app.get('/users', params={'after': '%%%'}, headers=test_suite.user.authorization_header)
+        assert response.status_code == 400
+
     def test_read_one(self, test_app, test_suite):
         """Test GET /users/{user_id}"""
         response = test_app.get(f'/users/{test_suite.user.user_id}',
@@ -287,6 +304,66 @@ class TestCharactersEndpoints:
         }), headers=test_suite.another_user.authorization_header)
         assert response.status_code == 404
 
+    def test_read_abilities(self, test_app, test_suite):
+        """Test GET /characters/{character_id}/abilities"""
+        user = test_suite.user
+        character_id = user.characters[0].character_id
+        response = test_app.get(f'/characters/{character_id}/abilities', headers=user.authorization_header)
+        assert response.status_code == 200
+        abilities = response.json()
+        assert all(10 <= abilities[ability] <= 18 for ability in ('str', 'dex', 'con', 'int', 'wis', 'cha'))
+        assert abilities['level'] == 1
+        assert abilities['proficiency_bonus'] == 2
+        assert abilities['modifiers']['dex'] == abilities['dex'] // 2 - 5
+        assert abilities['saves'] == abilities['modifiers']
+        assert abilities['skills']['stealth'] == abilities['modifiers']['dex']
+        # abilities are rolled once
+        response = test_app.get(f'/characters/{character_id}/abilities', headers=user.authorization_header)
+        assert response.json() == abilities
+
+    def test_update_abilities(self, test_app, test_suite):
+        """Test PUT /characters/{character_id}/abilities"""
+        user = test_suite.user
+        character_id = user.characters[0].character_id
+        response = test_app.put(f'/characters/{character_id}/abilities', data=json.dumps({
+            'dex': 18,
+            'level': 5,
+            'save_proficiencies': ['dex'],
+            'skill_proficiencies': ['stealth', 'perception']
+        }), headers=user.authorization_header)
+        assert response.status_code == 200
+        abilities = response.json()
+        assert abilities['proficiency_bonus'] == 3
+        assert abilities['modifiers']['dex'] == 4
+        assert abilities['saves']['dex'] == 7
+        assert abilities['saves']['str'] == abilities['modifiers']['str']
+        assert abilities['skills']['stealth'] == 7
+        assert abilities['skills']['acrobatics'] == 4
+        assert abilities['skills']['perception'] == abilities['modifiers']['wis'] + 3
+        assert abilities['skill_proficiencies'] == ['perception', 'stealth']
+
+        response = test_app.put(f'/characters/{character_id}/abilities', data=json.dumps({'level': 9}),
+                                headers=user.authorization_header)
+        abilities = response.json()
+        assert abilities['dex'] == 18
+        assert abilities['saves']['dex'] == 8
+        assert abilities['skills']['stealth'] == 8
+        assert abilities['skills']['acrobatics'] == 4
+
+        response = test_app.put(f'/characters/{character_id}/abilities', data=json.dumps({'dex': 31}),
+                                headers=user.authorization_header)
+        assert response.status_code == 422
+
+    def test_abilities_not_owned(self, test_app, test_suite):
+        """Test GET and PUT /characters/{character_id}/abilities of a character not owned by the user"""
+        character_id = test_suite.user.characters[0].character_id
+        headers = test_suite.another_user.authorization_header
+        response = test_app.get(f'/characters/{character_id}/abilities', headers=headers)
+        assert response.status_code == 404
+        response = test_app.put(f'/characters/{character_id}/abilities', data=json.dumps({'level': 20}),
+                                headers=headers)
+        assert response.status_code == 404
+
     def test_delete(self, test_app, test_suite, test_db_connection):
         """Test DELETE /characters/{character_id}"""
         character_id = test_suite.user.characters[0].character_id
@@ -312,6 +389,44 @@ class TestGamesEndpoints:
         assert response.json().get('game_id') is not None
         test_suite.user.games.append(response.json())
 
+    def test_read_one_not_modified(self, test_app, test_suite):
+        """Test conditional GET /games/{game_id}"""
+        user = test_suite.user
+        game_id = user.games[0]['game_id']
+        response = test_app.get(f'/games/{game_id}')
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+        response = test_app.get(f'/games/{game_id}', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        response = test_app.get(f'/games/{game_id}', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+        # the game is modified
+        test_app.put(f'/games/{game_id}', data=json.dumps({'game_state': False}), headers=user.authorization_header)
+        response = test_app.get(f'/games/{game_id}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.json()['game_state'] is False
+
+    def test_read_all_not_modified(self, test_app, test_suite):
+        """Test conditional GET /games"""
+        etag = test_app.get('/games').headers['ETag']
+        response = test_app.get('/games', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        # the list changes with a new game
+        test_app.post('/games/', data=json.dumps({}), headers=test_suite.another_user.authorization_header)
+        assert test_app.get('/games', headers={'If-None-Match': etag}).status_code == 200
+
+    def test_read_all_ndjson(self, test_app, test_suite, monkeypatch):
+        """Test GET /games streamed as NDJSON"""
+        monkeypatch.setattr(settings, 'export_batch_size', 1)
+        test_app.post('/games/', data=json.dumps({}), headers=test_suite.another_user.authorization_header)
+        response = test_app.get('/games', headers={'Accept': 'application/x-ndjson'})
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        games = [json.loads(line) for line in response.text.splitlines()]
+        assert len(games) > 1
+        assert [game['game_id'] for game in games] == [game['game_id'] for game in test_app.get('/games').json()]
+
     def test_delete_not_by_owner(self, test_app, test_suite):
         """Test DELETE on /games/{game_id} by unauthorized user"""
         game_id = test_suite.user.games[0]['game_id']
@@ -325,3 +440,36 @@ class TestGamesEndpoints:
         assert response.status_code == 200
         game = test_db_connection.get(Game, game_id)
         assert game.disabled is True
+
+
+class TestCurrentUserEndpoint:
+
+    def test_read_me(self, test_app, test_suite):
+        """Test GET /users/me"""
+        user = test_suite.user
+        response = test_app.get('/users/me', headers=user.authorization_header)
+        info = response.json()
+        assert response.status_code == 200
+        assert info['user_id'] == user.user_id
+        assert sorted(character['character_id'] for character in info['characters']) == \
+               sorted(character.character_id for character in user.characters)
+        assert [game['game_id'] for game in info['games']] == [game['game_id'] for game in user.games]
+        assert info['join_requests'] == []
+
+    def test_read_me_not_modified(self, test_app, test_suite):
+        """Test GET /users/me with If-None-Match"""
+        headers = test_suite.user.authorization_header
+        etag = test_app.get('/users/me', headers=headers).headers['ETag']
+        response = test_app.get('/users/me', headers={**headers, 'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.content == b''
+        # the info changes with a new game
+        test_app.post('/games/', data=json.dumps({}), headers=headers)
+        response = test_app.get('/users/me', headers={**headers, 'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_read_me_unauthorized(self, test_app):
+        """Test GET /users/me without Authorization header provided"""
+        response = test_app.get('/users/me')
+        assert response.status_code == 403
@@ -0,0 +1,79 @@
+"""
+Batch fetch by ids tests
+"""
+import asyncio
+
+from app.api.v1.batch import Loaders
+from app.crud import item as crud
+from app.models.item import Item
+
+
+def test_loader_coalescing():
+    batches = []
+
+    async def batch_load(db, keys):
+        batches.append(keys)
+        return {key: key * 10 for key in keys if key != 3}
+
+    async def run():
+        loader = Loaders(db=None)[batch_load]
+        single, many = await asyncio.gather(loader.load(1), loader.load_many([2, 3, 1]))
+        cached = await loader.load_many([1, 2])
+        return single, many, cached
+
+    single, many, cached = asyncio.run(run())
+    assert (single, many, cached) == (10, [20, None, 10], [10, 20])
+    assert batches == [[1, 2, 3]]
+
+
+def test_loader_cancelled_load():
+    batches = []
+    release = asyncio.Event()
+
+    async def batch_load(db, keys):
+        batches.append(keys)
+        await release.wait()
+        return {key: key * 10 for key in keys}
+
+    async def run():
+        loader = Loaders(db=None)[batch_load]
+        cancelled = asyncio.create_task(loader.load(1))
+        other = asyncio.create_task(loader.load(2))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        release.set()
+        # the dispatch completes the other load, the cancelled key is loaded again
+        return await other, await asyncio.wait_for(loader.load(1), timeout=1), loader._dispatches
+
+    other, reloaded, dispatches = asyncio.run(run())
+    assert (other, reloaded) == (20, 10)
+    assert batches == [[1, 2], [1]]
+    assert not dispatches
+
+
+def test_get_by_ids(test_db_connection, query_counter):
+    db = test_db_connection
+    items = [Item(name=f'Batch item {i}', type=1) for i in range(5)]
+    db.add_all(items)
+    db.commit()
+    ids = [item.item_id for item in items]
+    statements = query_counter.count
+    # every item is in the identity map already
+    assert crud.get_items_by_ids(db, ids) == dict(zip(ids, items))
+    assert query_counter.count == statements
+    db.expunge(items[0])
+    found = crud.get_items_by_ids(db, [*ids, 0])
+    assert query_counter.count == statements + 1
+    assert sorted(found) == sorted(ids)
+
+
+def test_read_by_ids(test_app, test_db_connection):
+    """Test GET /users?ids="""
+    db = test_db_connection
+    response = test_app.post('/users/', json={'username': 'batch_user_test'})
+    user_id = response.json()['user_id']
+    headers = {'Authorization': 'Bearer batch_user_test'}
+    response = test_app.get('/users', params={'ids': f'{user_id},0,{user_id}'}, headers=headers)
+    assert response.status_code == 200
+    assert [user['user_id'] for user in response.json()] == [user_id]
+    assert test_app.get('/users', params={'ids': 'a,b'}, headers=headers).status_code == 400
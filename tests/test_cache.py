@@ -0,0 +1,86 @@
+"""
+In-process caches tests
+"""
+import time
+
+from app.core import events
+from app.core.cache import TTLCache, SizedLRUCache
+from app.core.auth import PRINCIPAL_INVALIDATED, Principal, PrincipalCache
+from app.crud import game as crud
+from app.models.user import User
+from app.schemas.game import GameCreateSchema
+
+
+def test_ttl_cache_lru():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    # 'b' is the least recently used entry
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['hits'] == 3
+    assert cache.stats()['misses'] == 1
+
+
+def test_ttl_cache_expiration():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_principal_cache_invalidation():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.set('player_1', Principal(1, 'player_1', False, frozenset({1}), frozenset()))
+    cache.set('player_2', Principal(2, 'player_2', False, frozenset(), frozenset({5})))
+    assert cache.invalidate_user(1) == 1
+    assert cache.get('player_1') is None
+    assert cache.get('player_2').owns_character(5)
+
+
+def test_principal_cache_invalidation_by_events(test_db_connection):
+    """Principals are invalidated by events, which the event bus delivers to every worker"""
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.set('player_1', Principal(1, 'player_1', False, frozenset(), frozenset()))
+    cache.set('player_2', Principal(2, 'player_2', False, frozenset(), frozenset()))
+    cache.dispatch([events.GameEvent(None, PRINCIPAL_INVALIDATED, {'user_id': 1}),
+                    events.GameEvent(2, 'game_updated', {'user_id': 2})])
+    assert cache.get('player_1') is None
+    assert cache.get('player_2') is not None
+
+    db = test_db_connection
+    gm = User(username='invalidated_gm_test')
+    db.add(gm)
+    db.commit()
+    published = []
+    events.add_handler(published.extend)
+    try:
+        crud.create_game(db, GameCreateSchema(), gm.user_id)
+    finally:
+        events.remove_handler(published.extend)
+    assert [(game_event.type, game_event.data) for game_event in published] == \
+           [(PRINCIPAL_INVALIDATED, {'user_id': gm.user_id})]
+
+
+def test_auth_cache_stats(test_app):
+    """Test GET /info/auth_cache"""
+    response = test_app.get('/info/auth_cache')
+    assert response.status_code == 200
+    assert {'hits', 'misses', 'size'} <= response.json().keys()
+
+
+def test_sized_lru_cache():
+    cache = SizedLRUCache(maxsize=10, sizeof=len)
+    cache.set(1, 'aaaa')
+    cache.set(2, 'bbbb')
+    assert cache.get(1) == 'aaaa'
+    cache.set(3, 'cccc')
+    # 2 is evicted to keep total size within 10 bytes
+    assert cache.get(2) is None
+    assert cache.size == 8
+    cache.set(4, 'x' * 11)
+    assert cache.get(4) is None
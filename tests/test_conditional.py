@@ -0,0 +1,47 @@
+"""
+Conditional GET validators tests
+"""
+from datetime import datetime
+
+from starlette.requests import Request
+
+from app.api.v1.conditional import Validators, http_date
+
+
+def make_request(**headers) -> Request:
+    return Request({
+        'type': 'http',
+        'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+def test_etag_matching():
+    validators = Validators.of_version(1, datetime(2022, 9, 1, 12, 30, 15, 250))
+    assert validators.matches(make_request(if_none_match=validators.etag))
+    assert validators.matches(make_request(if_none_match=f'W/"other", {validators.etag.removeprefix("W/")}'))
+    assert validators.matches(make_request(if_none_match='*'))
+    assert not validators.matches(make_request(if_none_match='W/"other"'))
+    assert not validators.matches(make_request())
+    assert Validators.of_version(2, validators.last_modified).etag != validators.etag
+
+
+def test_modified_since():
+    updated_at = datetime(2022, 9, 1, 12, 30, 15, 250)
+    validators = Validators.of_version(1, updated_at)
+    assert http_date(updated_at) == 'Thu, 01 Sep 2022 12:30:15 GMT'
+    assert validators.matches(make_request(if_modified_since='Thu, 01 Sep 2022 12:30:15 GMT'))
+    assert not validators.matches(make_request(if_modified_since='Thu, 01 Sep 2022 12:30:14 GMT'))
+    assert not validators.matches(make_request(if_modified_since='yesterday'))
+    # If-None-Match takes precedence
+    assert not validators.matches(make_request(if_none_match='W/"other"',
+                                               if_modified_since='Thu, 01 Sep 2022 12:30:15 GMT'))
+
+
+def test_rows_validators():
+    rows = [Validators.of_version(1, datetime(2022, 9, 1)), Validators.of_version(2, datetime(2022, 9, 2))]
+    for key, row in enumerate(rows, 1):
+        row.key, row.updated_at = key, row.last_modified
+    validators = Validators.of_rows(rows, 'key')
+    assert validators.last_modified == datetime(2022, 9, 2)
+    assert Validators.of_rows(rows[:1], 'key').etag != validators.etag
+    assert Validators.of_rows([], 'key').last_modified is None
@@ -0,0 +1,29 @@
+"""
+Database engine and connection pool tests
+"""
+from sqlalchemy import create_engine
+
+from app.database.init_database import warm_up_pool
+from app.database.pool import InstrumentedQueuePool, get_pool_status
+
+
+def test_pool_status(test_app):
+    """Test GET /info/db_pool"""
+    response = test_app.get('/info/db_pool')
+    assert response.status_code == 200
+    assert 'pool_class' in response.json()
+
+
+def test_instrumented_pool():
+    """Check pool warm-up and checkout statistics"""
+    engine = create_engine('sqlite://', poolclass=InstrumentedQueuePool, pool_size=3, max_overflow=0)
+    assert warm_up_pool(engine) == 3
+    with engine.connect():
+        status = get_pool_status(engine)
+        assert status['checked_out'] == 1
+        assert status['checked_in'] == 2
+    status = get_pool_status(engine)
+    assert status['checkouts'] == 4
+    assert status['checked_out'] == 0
+    assert status['wait_time_max'] >= 0
+    engine.dispose()
@@ -0,0 +1,93 @@
+"""
+Dice engine tests
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.core.operations.dice import DiceNotationError, compile_dice, parse_dice
+from app.models.user import User
+
+
+@pytest.mark.parametrize('notation, normalized, low, high', [
+    ('4d6kh3+2', '4d6kh3+2', 5, 20),
+    ('d20', '1d20', 1, 20),
+    ('2D20kl1 - 1', '2d20kl1-1', 0, 19),
+    ('4d6d1', '4d6kh3', 3, 18),
+    ('4d6dh1', '4d6kl3', 3, 18),
+    ('10 + d%', '1d100+10', 11, 110),
+    ('2d6-1d4+3', '2d6-1d4+3', 1, 14),
+    ('7', '7', 7, 7),
+])
+def test_dice_bounds(notation, normalized, low, high):
+    expression = compile_dice(notation)
+    assert expression.notation == normalized
+    totals = expression.roll_many(100000, np.random.default_rng(1))
+    assert totals.min() == low
+    assert totals.max() == high
+    roll = expression.roll(np.random.default_rng(1))
+    assert low <= roll.total <= high
+    assert [len(dice) for dice in roll.dice] == [term.count for term in expression.terms]
+
+
+def test_dice_distribution():
+    rng = np.random.default_rng(2)
+    # mean of 4d6 keep highest 3 is about 12.24
+    assert abs(compile_dice('4d6kh3').roll_many(200000, rng).mean() - 12.24) < 0.05
+    assert abs(compile_dice('d20', 'advantage').roll_many(200000, rng).mean() - 13.82) < 0.05
+    assert abs(compile_dice('d20', 'disadvantage').roll_many(200000, rng).mean() - 7.18) < 0.05
+    # exploding d6 never totals a multiple of 6 and has mean 4.2
+    totals = compile_dice('1d6!').roll_many(200000, rng)
+    assert not np.any(totals % 6 == 0)
+    assert totals.max() > 6
+    assert abs(totals.mean() - 4.2) < 0.05
+
+
+def test_dice_modes():
+    assert compile_dice('d20+5', 'advantage').notation == '2d20kh1+5'
+    assert compile_dice('1d20-d20', 'disadvantage').notation == '2d20kl1-2d20kl1'
+    # only single d20s roll with advantage
+    assert compile_dice('2d20+1d6', 'advantage').notation == '2d20+1d6'
+
+
+def test_dice_seeded_rolls_are_reproducible():
+    expression = compile_dice('3d6!+1d8kh1')
+    first = expression.roll_many(1000, np.random.default_rng(42))
+    assert np.array_equal(first, expression.roll_many(1000, np.random.default_rng(42)))
+
+
+@pytest.mark.parametrize('notation', ['', 'd', '2d', '4d6kh5', '4d6dl4', '1d6++2', '3 4', 'd1!', '101d6',
+                                      '1d1001', 'd6x', '1d6' + '+1d6' * 20])
+def test_invalid_dice_notation(notation):
+    with pytest.raises(DiceNotationError):
+        parse_dice(notation)
+
+
+def test_dice_rolls_endpoint(test_app, test_db_connection):
+    """Test /dice/rolls"""
+    db = test_db_connection
+    db.add(User(username='dice_roller_test'))
+    db.commit()
+    headers = {'Authorization': 'Bearer dice_roller_test'}
+
+    response = test_app.post('/dice/rolls', data=json.dumps({'notation': '4d6kh3 + 2'}), headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result['notation'] == '4d6kh3+2'
+    assert result['mode'] == 'normal'
+    assert len(result['dice']) == 1 and len(result['dice'][0]) == 4
+    assert result['totals'] == [sum(sorted(result['dice'][0])[1:]) + 2]
+
+    response = test_app.post('/dice/rolls', data=json.dumps({'notation': 'd20', 'mode': 'advantage', 'times': 100}),
+                             headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert result['notation'] == '2d20kh1'
+    assert len(result['totals']) == 100
+    assert result['dice'] is None
+
+    response = test_app.post('/dice/rolls', data=json.dumps({'notation': '4d6kh5'}), headers=headers)
+    assert response.status_code == 422
+    response = test_app.post('/dice/rolls', data=json.dumps({'notation': 'd20', 'times': 10001}), headers=headers)
+    assert response.status_code == 422
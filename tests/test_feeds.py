@@ -0,0 +1,130 @@
+"""
+Join request feeds tests
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.config import settings
+from app.core.auth import Principal
+from app.core.broadcast import Connection
+from app.core.events import GameEvent, add_handler, remove_handler
+from app.core.feeds import FeedsExhausted, JoinRequestFeeds, join_request_feeds
+from app.crud import game as crud
+from app.database import Session
+from app.models.user import User
+from app.models.game import Game
+from app.models.character import Character
+from app.schemas.game import JoinRequestCreateSchema
+
+
+def join_request_event(type_: str, request_id: int, game_id: int, user_id: int) -> GameEvent:
+    return GameEvent(game_id, type_, {'request_id': request_id, 'game_id': game_id, 'user_id': user_id},
+                     key=f'join_request:{request_id}')
+
+
+def test_feeds_dispatch_and_replay():
+    async def run():
+        feeds = JoinRequestFeeds(replay_size=3, max_connections=2)
+        player = Principal(1, 'player', False, frozenset(), frozenset())
+        gm = Principal(2, 'gm', False, frozenset({10}), frozenset())
+        player_connection, gm_connection = Connection(8), Connection(8)
+        player_feed = feeds.subscribe(player, player_connection)
+        gm_feed = feeds.subscribe(gm, gm_connection)
+        with pytest.raises(FeedsExhausted):
+            feeds.subscribe(player, Connection(8))
+
+        created = join_request_event('join_request_created', 1, 10, 1)
+        other = join_request_event('join_request_created', 2, 11, 3)
+        accepted = join_request_event('join_request_accepted', 1, 10, 1)
+        feeds.dispatch([created, other, GameEvent(10, 'game_updated', {}, key='game'), accepted])
+        await asyncio.sleep(0)
+        # events of a join request are coalesced
+        assert await player_connection.get() == [accepted]
+        assert await gm_connection.get() == [accepted]
+
+        assert feeds.replay(player_feed, created.event_id) == [accepted]
+        assert feeds.replay(gm_feed, other.event_id) == [accepted]
+        assert feeds.replay(gm_feed, accepted.event_id) == []
+        assert feeds.replay(gm_feed, 'unknown') is None
+        # the oldest event is dropped from the buffer
+        feeds.dispatch([join_request_event('join_request_created', 3, 12, 3)])
+        assert feeds.replay(player_feed, created.event_id) is None
+
+        feeds.unsubscribe(player_feed)
+        feeds.unsubscribe(player_feed)
+        assert feeds.stats()['connections'] == 1
+        feeds.subscribe(player, Connection(8))
+
+    asyncio.run(run())
+
+
+def read_feed(test_app, username: str, last_event_id: str = None) -> list[str]:
+    headers = {'Authorization': f'Bearer {username}'}
+    if last_event_id is not None:
+        headers['Last-Event-ID'] = last_event_id
+    response = test_app.get('/users/me/join_requests/events', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    return response.text.split('\n\n')
+
+
+def test_join_request_feed(test_app, test_db_connection, monkeypatch):
+    """Test /users/me/join_requests/events"""
+    monkeypatch.setattr(settings, 'sse_connection_ttl', 0.5)
+    monkeypatch.setattr(settings, 'sse_heartbeat_interval', 0.2)
+    db = test_db_connection
+    gm = User(username='feed_gm_test')
+    player = User(username='feed_player_test')
+    db.add_all([gm, player])
+    db.flush()
+    game = Game(game_master_id=gm.user_id)
+    character = Character(name='Beregond', user_owner_id=player.user_id)
+    db.add_all([game, character])
+    db.commit()
+
+    response = test_app.get('/users/me/join_requests/events?token=unknown_user_test')
+    assert response.status_code == 403
+
+    published = []
+    add_handler(published.extend)
+    try:
+        join_request = crud.create_join_request(db, game.game_id, JoinRequestCreateSchema(
+            user_id=player.user_id, character_id=character.character_id))
+    finally:
+        remove_handler(published.extend)
+    created_event_id = published[0].event_id
+
+    def accept():
+        with Session() as session:
+            crud.join_request_accept(session, game.game_id, join_request.request_id)
+
+    # the request is accepted while the feed is open
+    timer = threading.Timer(0.1, accept)
+    timer.start()
+    chunks = read_feed(test_app, 'feed_player_test')
+    timer.join()
+    assert chunks[0] == 'retry: 3000'
+    accepted = [chunk for chunk in chunks if 'event: join_request_accepted' in chunk]
+    assert len(accepted) == 1
+    assert f'"request_id":{join_request.request_id}' in accepted[0]
+    assert ': heartbeat' in chunks
+
+    # the GM resumes after the created event and gets the accepted one from the replay buffer
+    chunks = read_feed(test_app, 'feed_gm_test', last_event_id=created_event_id)
+    assert 'event: join_request_accepted' in chunks[1]
+    accepted_event_id = chunks[1].split('\n')[0][len('id: '):]
+    assert not read_feed(test_app, 'feed_gm_test', last_event_id=accepted_event_id)[1].startswith('id:')
+    assert read_feed(test_app, 'feed_gm_test', last_event_id='unknown')[1] == 'event: reset\ndata: {}'
+
+
+def test_join_request_feeds_exhausted(test_app, test_db_connection, monkeypatch):
+    db = test_db_connection
+    db.add(User(username='feed_exhausted_test'))
+    db.commit()
+    monkeypatch.setattr(join_request_feeds, 'max_connections', 0)
+    response = test_app.get('/users/me/join_requests/events',
+                            headers={'Authorization': 'Bearer feed_exhausted_test'})
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '5'
@@ -0,0 +1,154 @@
+"""
+Join requests concurrency tests
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+from app.crud import game as crud
+from app.crud import CharacterUnavailable, JoinRequestNotFound
+from app.database import Session
+from app.models.user import User
+from app.models.game import Game, GameJoinRequest
+from app.models.character import Character
+from app.models.refs import game_character
+
+
+THREADS = 16
+
+
+def accept(request_id: int) -> bool:
+    with Session() as db:
+        try:
+            crud.join_request_accept(db, db.get(GameJoinRequest, request_id).game_id, request_id)
+            return True
+        except (CharacterUnavailable, JoinRequestNotFound):
+            return False
+
+
+def create_requests(db, name: str, games_count: int) -> tuple[Character, list[int]]:
+    """Create character with join requests to games_count new games"""
+    gm = User(username=f'{name}_gm_test', nickname='GM')
+    player = User(username=f'{name}_player_test', nickname='Player')
+    db.add_all([gm, player])
+    db.flush()
+    games = [Game(game_master_id=gm.user_id) for _ in range(games_count)]
+    character = Character(name=name, user_owner_id=player.user_id)
+    db.add_all([*games, character])
+    db.flush()
+    requests = [GameJoinRequest(game_id=game.game_id, user_id=player.user_id, character_id=character.character_id)
+                for game in games]
+    db.add_all(requests)
+    db.commit()
+    return character, [request.request_id for request in requests]
+
+
+def test_concurrent_accept(test_db_connection):
+    """Character joins a single game when requests to many games are accepted at once"""
+    db = test_db_connection
+    character, request_ids = create_requests(db, 'Faramir', THREADS)
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        accepted = list(executor.map(accept, request_ids))
+    assert accepted.count(True) == 1
+
+    refs = db.execute(select(func.count()).where(game_character.c.character_id == character.character_id)).scalar()
+    assert refs == 1
+    statuses = db.execute(select(GameJoinRequest.status_code).where(GameJoinRequest.request_id.in_(request_ids)))
+    assert sorted(status for status, in statuses) == [1] * (THREADS - 1) + [2]
+
+
+def test_concurrent_accept_same_request(test_db_connection):
+    """Accepting the same request from many threads adds the character once"""
+    db = test_db_connection
+    character, (request_id,) = create_requests(db, 'Eowyn', 1)
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        accepted = list(executor.map(accept, [request_id] * THREADS))
+    assert accepted.count(True) == 1
+    refs = db.execute(select(func.count()).where(game_character.c.character_id == character.character_id)).scalar()
+    assert refs == 1
+
+
+def test_accept_request_of_another_game(test_app, test_db_connection):
+    """GM of a game can't accept or decline requests to other games"""
+    db = test_db_connection
+    _, (request_id,) = create_requests(db, 'Boromir', 1)
+    _, (other_request_id,) = create_requests(db, 'Beregond', 1)
+    other_game_id = db.get(GameJoinRequest, other_request_id).game_id
+    headers = {'Authorization': 'Bearer Beregond_gm_test'}
+    for action in ('accept', 'decline'):
+        response = test_app.get(f'/games/{other_game_id}/join_requests/{request_id}/{action}', headers=headers)
+        assert response.status_code == 404
+    db.expire_all()
+    assert db.get(GameJoinRequest, request_id).status_code == 1
+    assert db.execute(select(func.count()).where(game_character.c.game_id == other_game_id)).scalar() == 0
+
+
+def test_accept_not_pending_request(test_app, test_db_connection):
+    """Accepted and declined requests aren't updated anymore"""
+    db = test_db_connection
+    character, (request_id, declined_request_id) = create_requests(db, 'Elrond', 2)
+    game_id = db.get(GameJoinRequest, request_id).game_id
+    declined_game_id = db.get(GameJoinRequest, declined_request_id).game_id
+    headers = {'Authorization': 'Bearer Elrond_gm_test'}
+    url = f'/games/{declined_game_id}/join_requests/{declined_request_id}'
+    assert test_app.get(f'{url}/decline', headers=headers).status_code == 200
+    assert test_app.get(f'{url}/accept', headers=headers).status_code == 404
+    assert test_app.get(f'{url}/decline', headers=headers).status_code == 404
+
+    url = f'/games/{game_id}/join_requests/{request_id}'
+    assert test_app.get(f'{url}/accept', headers=headers).status_code == 200
+    assert test_app.get(f'{url}/accept', headers=headers).status_code == 404
+    assert test_app.get(f'{url}/decline', headers=headers).status_code == 404
+    db.expire_all()
+    assert db.get(GameJoinRequest, request_id).status_code == 2
+    assert db.get(GameJoinRequest, declined_request_id).status_code == 3
+    refs = db.execute(select(game_character.c.game_id).where(game_character.c.character_id == character.character_id))
+    assert refs.scalars().all() == [game_id]
+
+
+def test_bulk_accept(test_db_connection):
+    """Bulk accept adds every available character once, in a single transaction"""
+    db = test_db_connection
+    character, request_ids = create_requests(db, 'Theoden', 2)
+    other_character, (other_request_id,) = create_requests(db, 'Eomer', 1)
+    game_id = db.get(GameJoinRequest, request_ids[0]).game_id
+    # move the other character's request into the same game
+    db.get(GameJoinRequest, other_request_id).game_id = game_id
+    db.commit()
+
+    outcomes = crud.join_requests_bulk_update(db, game_id, [request_ids[0], other_request_id, request_ids[1], 0],
+                                              accept=True)
+    assert outcomes == {
+        request_ids[0]: crud.ACCEPTED,
+        other_request_id: crud.ACCEPTED,
+        request_ids[1]: crud.NOT_FOUND,
+        0: crud.NOT_FOUND
+    }
+    characters = db.execute(select(game_character.c.character_id).where(game_character.c.game_id == game_id))
+    assert sorted(characters.scalars()) == sorted([character.character_id, other_character.character_id])
+
+    outcomes = crud.join_requests_bulk_update(db, game_id, [request_ids[0]], accept=False)
+    assert outcomes == {request_ids[0]: crud.NOT_PENDING}
+
+
+def test_bulk_decline(test_db_connection):
+    db = test_db_connection
+    _, request_ids = create_requests(db, 'Denethor', 1)
+    game_id = db.get(GameJoinRequest, request_ids[0]).game_id
+    assert crud.join_requests_bulk_update(db, game_id, request_ids, accept=False) == {request_ids[0]: crud.DECLINED}
+    db.expire_all()
+    assert db.get(GameJoinRequest, request_ids[0]).status_code == 3
+
+
+def test_bulk_update_endpoint(test_app, test_db_connection):
+    """Test POST /games/{game_id}/join_requests/bulk"""
+    db = test_db_connection
+    _, request_ids = create_requests(db, 'Saruman', 1)
+    game_id = db.get(GameJoinRequest, request_ids[0]).game_id
+    url = f'/games/{game_id}/join_requests/bulk'
+    body = {'action': 'accept', 'request_ids': request_ids}
+    response = test_app.post(url, json=body, headers={'Authorization': 'Bearer Saruman_player_test'})
+    assert response.status_code == 403
+    response = test_app.post(url, json=body, headers={'Authorization': 'Bearer Saruman_gm_test'})
+    assert response.status_code == 200
+    assert response.json() == [{'request_id': request_ids[0], 'outcome': 'accepted'}]
@@ -0,0 +1,49 @@
+"""
+Games lobby tests
+"""
+from app.crud import game as crud
+from app.models.user import User
+from app.models.game import Game, GameJoinRequest
+from app.models.character import Character
+
+
+def test_lobby(test_db_connection, query_counter):
+    db = test_db_connection
+    gm = User(username='lobby_gm_test', nickname='Lobby GM')
+    player = User(username='lobby_player_test', nickname='Lobby player')
+    db.add_all([gm, player])
+    db.flush()
+    game = Game(game_master_id=gm.user_id, game_state=True, disabled=False)
+    closed_game = Game(game_master_id=gm.user_id, game_state=False, disabled=False)
+    characters = [Character(name=name, user_owner_id=player.user_id) for name in ('Gimli', 'Merry', 'Pippin')]
+    db.add_all([game, closed_game, *characters])
+    db.flush()
+    game.characters.append(characters[0])
+    db.add_all([
+        GameJoinRequest(game_id=game.game_id, user_id=player.user_id, character_id=characters[1].character_id),
+        GameJoinRequest(game_id=game.game_id, user_id=player.user_id, character_id=characters[2].character_id),
+        GameJoinRequest(game_id=game.game_id, user_id=player.user_id, character_id=characters[2].character_id,
+                        status_code=3)
+    ])
+    db.commit()
+
+    statements = query_counter.count
+    lobby = {row.game_id: row for row in crud.get_lobby(db, after=game.game_id - 1)}
+    assert query_counter.count == statements + 1
+    assert lobby[game.game_id].characters_count == 1
+    assert lobby[game.game_id].pending_requests_count == 2
+    assert lobby[game.game_id].game_master_nickname == 'Lobby GM'
+    assert lobby[closed_game.game_id].characters_count == 0
+    assert lobby[closed_game.game_id].pending_requests_count == 0
+
+    open_games = [row.game_id for row in crud.get_lobby(db, game_state=True, disabled=False, after=game.game_id - 1)]
+    assert open_games == [game.game_id]
+
+
+def test_read_lobby(test_app):
+    """Test GET /games/lobby"""
+    response = test_app.get('/games/lobby', params={'game_state': False})
+    assert response.status_code == 200
+    games = response.json()
+    assert games and all(game['game_state'] is False for game in games)
+    assert {'characters_count', 'pending_requests_count', 'game_master_nickname'} <= set(games[0])
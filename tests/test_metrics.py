@@ -0,0 +1,56 @@
+"""
+Request metrics tests
+"""
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from starlette.testclient import TestClient
+
+from app.api.middleware import MetricsMiddleware
+from app.core.metrics import RequestStats, request_stats
+from app.database import Session
+
+
+def test_metrics(test_app):
+    """Test GET /metrics after a request querying the database"""
+    test_app.get('/games/0')
+    response = test_app.get('/metrics')
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert 'http_requests_total{method="GET",route="/games/{game_id}",status="404"} 1' in lines
+    statements = [line for line in lines
+                  if line.startswith('http_request_db_statements_sum{method="GET",route="/games/{game_id}"}')]
+    assert float(statements[0].split()[-1]) >= 1
+
+
+def test_server_timing():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=True)
+
+    @app.get('/query')
+    def query():
+        with Session() as db:
+            db.execute(text('SELECT 1'))
+
+    response = TestClient(app).get('/query')
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert 'desc="1 queries"' in response.headers['Server-Timing']
+
+
+def test_failed_statements_timing():
+    """Failed statements leave nothing behind on pooled connections"""
+    with Session() as db:
+        connection = db.connection()
+        info = dict(connection.info)
+        for _ in range(3):
+            with pytest.raises(DBAPIError):
+                connection.execute(text('SELECT * FROM missing_table'))
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        try:
+            connection.execute(text('SELECT 1'))
+        finally:
+            request_stats.reset(token)
+        assert stats.statements == 1 and stats.db_time > 0
+        assert connection.info == info
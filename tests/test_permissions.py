@@ -0,0 +1,68 @@
+"""
+Permission checks tests
+"""
+import pytest
+from sqlalchemy.orm.exc import DetachedInstanceError
+
+from app.crud import permissions
+from app.models.user import User
+from app.models.game import Game, GameJoinRequest
+from app.models.character import Character
+from app.models.refs import game_character
+
+
+def test_permission_checks(test_db_connection):
+    db = test_db_connection
+    gm = User(username='permissions_gm_test', nickname='GM')
+    player = User(username='permissions_player_test', nickname='Player')
+    db.add_all([gm, player])
+    db.flush()
+    game = Game(game_master_id=gm.user_id)
+    character = Character(name='Legolas', user_owner_id=player.user_id)
+    db.add_all([game, character])
+    db.commit()
+
+    assert permissions.is_game_master(db, gm.user_id, game.game_id)
+    assert not permissions.is_game_master(db, player.user_id, game.game_id)
+    assert permissions.is_character_owner(db, player.user_id, character.character_id)
+    assert not permissions.is_character_owner(db, gm.user_id, character.character_id)
+    assert gm.is_gm(game.game_id) and not player.is_gm(game.game_id)
+    assert player.owns_character(character.character_id) and not gm.owns_character(character.character_id)
+
+    # detached users check their loaded collections
+    assert gm.games and player.characters and not player.games and not gm.characters
+    db.expunge(gm)
+    db.expunge(player)
+    assert gm.is_gm(game.game_id) and not player.is_gm(game.game_id)
+    assert player.owns_character(character.character_id) and not gm.owns_character(character.character_id)
+    db.add_all([gm, player])
+    db.expire(player, ['games'])
+    db.expunge(player)
+    with pytest.raises(DetachedInstanceError):
+        player.is_gm(game.game_id)
+    db.add(player)
+
+
+def test_game_participants(test_db_connection):
+    """Only the GM and owners of characters of the game are participants, not authors of join requests"""
+    db = test_db_connection
+    gm = User(username='participants_gm_test')
+    player = User(username='participants_player_test')
+    applicant = User(username='participants_applicant_test')
+    db.add_all([gm, player, applicant])
+    db.flush()
+    game = Game(game_master_id=gm.user_id)
+    character = Character(name='Gimli', user_owner_id=player.user_id)
+    other_character = Character(name='Gloin', user_owner_id=applicant.user_id)
+    db.add_all([game, character, other_character])
+    db.flush()
+    db.execute(game_character.insert().values(game_id=game.game_id, character_id=character.character_id))
+    db.add(GameJoinRequest(game_id=game.game_id, user_id=applicant.user_id,
+                           character_id=other_character.character_id, status_code=3))
+    db.commit()
+
+    assert permissions.is_game_participant(db, gm.user_id, game.game_id)
+    assert permissions.is_game_participant(db, player.user_id, game.game_id)
+    assert not permissions.is_game_participant(db, applicant.user_id, game.game_id)
+    assert permissions.has_join_request(db, applicant.user_id, game.game_id)
+    assert not permissions.has_join_request(db, player.user_id, game.game_id)
@@ -0,0 +1,46 @@
+"""
+Query budget and N+1 detector tests
+"""
+from fastapi import FastAPI
+from sqlalchemy import text
+from starlette.testclient import TestClient
+
+from app.api.middleware import MetricsMiddleware
+from app.core.query_budget import query_budget, budget_violations
+from app.database import Session
+
+
+def test_budget_violation():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get('/within_budget')
+    @query_budget(2)
+    def within_budget():
+        with Session() as db:
+            db.execute(text('SELECT 1'))
+
+    @app.get('/n_plus_one')
+    @query_budget(2)
+    def n_plus_one():
+        with Session() as db:
+            for _ in range(3):
+                db.execute(text('SELECT 1'))
+
+    client = TestClient(app)
+    client.get('/within_budget')
+    assert not budget_violations
+    client.get('/n_plus_one')
+    assert len(budget_violations) == 1
+    violation = budget_violations.pop()
+    assert violation.route == '/n_plus_one'
+    assert violation.statements == 3
+    assert violation.repeated == {'SELECT 1': 3}
+
+
+def test_query_counter(query_counter, test_db_connection):
+    for _ in range(2):
+        test_db_connection.execute(text('SELECT 2'))
+    test_db_connection.execute(text('SELECT 3'))
+    assert query_counter.count == 3
+    assert query_counter.repeated() == {'SELECT 2': 2}
@@ -0,0 +1,75 @@
+"""
+Search backends tests
+"""
+from sqlalchemy import event, insert
+
+from app.crud import item as crud
+from app.crud.search import FALLBACK_ROWS_FACTOR, InvertedIndexSearchBackend, get_search_backend, trigrams
+from app.models.item import Item
+from app.schemas.item import ItemCreateSchema
+
+
+def test_trigrams():
+    assert trigrams('Sword') == {'swo', 'wor', 'ord'}
+    assert trigrams('ax') == set()
+
+
+def test_search_items(test_db_connection):
+    db = test_db_connection
+    assert isinstance(get_search_backend(db), InvertedIndexSearchBackend)
+    crud.create_item(db, ItemCreateSchema(name='Longsword of the North', type=2))
+    crud.create_item(db, ItemCreateSchema(name='Sword', type=2))
+    crud.create_item(db, ItemCreateSchema(name='Shield', description='Wooden, good against swords', type=3))
+    crud.create_item(db, ItemCreateSchema(name='Bread', type=4))
+
+    names = [item.name for item in crud.get_items(db, q='sword')]
+    # exact match ranks first
+    assert names[0] == 'Sword'
+    assert sorted(names) == ['Longsword of the North', 'Shield', 'Sword']
+    assert [item.name for item in crud.get_items(db, q='sword', limit=1)] == ['Sword']
+    # items created after the index is built are found too
+    crud.create_item(db, ItemCreateSchema(name='Short sword', type=2))
+    assert 'Short sword' in [item.name for item in crud.get_items(db, q='swor')]
+    assert crud.get_items(db, q='axe') == []
+    assert [item.name for item in crud.get_items(db, q='Br')] == ['Bread']
+
+
+def test_search_rows_not_seen_by_index(test_db_connection):
+    """Rows written without ORM events of this process are found by the LIKE filter"""
+    db = test_db_connection
+    crud.create_item(db, ItemCreateSchema(name='Halberd', type=2))
+    assert [item.name for item in crud.get_items(db, q='halberd')] == ['Halberd']
+    db.execute(insert(Item).values(name='Warhammer', type=2))
+    db.commit()
+    assert [item.name for item in crud.get_items(db, q='warhammer')] == ['Warhammer']
+    # candidates of the index don't exclude rows it hasn't seen
+    db.execute(insert(Item).values(name='Great halberd', type=2))
+    db.commit()
+    assert sorted(item.name for item in crud.get_items(db, q='halberd')) == ['Great halberd', 'Halberd']
+
+
+def test_search_candidates_beyond_bound(test_db_connection):
+    """Rows of the index beyond the rows ranked by the LIKE filter are merged in"""
+    db = test_db_connection
+    db.execute(insert(Item), [{'name': f'Old crossbow {i}', 'type': 2} for i in range(FALLBACK_ROWS_FACTOR * 2)])
+    db.commit()
+    crud.create_item(db, ItemCreateSchema(name='Crossbow', type=2))
+    assert [item.name for item in crud.get_items(db, q='crossbow', limit=1)] == ['Crossbow']
+
+
+def test_search_fallback_is_limited(test_db_connection):
+    db = test_db_connection
+    db.execute(insert(Item), [{'name': f'Arrow {i}', 'type': 2} for i in range(FALLBACK_ROWS_FACTOR * 3)])
+    db.commit()
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # q is too short for the index, matching rows are ranked within a limited number of rows
+    event.listen(db.get_bind(), 'before_cursor_execute', collect)
+    try:
+        assert len(crud.get_items(db, q='ar', limit=2)) == 2
+    finally:
+        event.remove(db.get_bind(), 'before_cursor_execute', collect)
+    assert any('LIKE' in statement and 'LIMIT' in statement for statement in statements)
@@ -0,0 +1,54 @@
+"""
+Fast serialization tests
+"""
+import json
+from datetime import datetime
+
+import orjson
+
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.encoders import jsonable_encoder
+from starlette.testclient import TestClient
+
+from app.api.v1.routing import SerializedRoute
+from app.config import settings
+from app.core.serialization import get_serializer
+from app.models.game import Game
+from app.schemas.game import GameSchema
+
+
+def make_game(game_id: int) -> Game:
+    now = datetime.utcnow()
+    return Game(game_id=game_id, game_master_id=1, game_state=True, disabled=False, created_at=now, updated_at=now)
+
+
+def test_serializer_matches_response_model():
+    game = make_game(1)
+    expected = json.loads(json.dumps(jsonable_encoder(GameSchema.from_orm(game))))
+    assert orjson.loads(orjson.dumps(get_serializer(GameSchema).dump(game))) == expected
+
+
+def test_serialized_route(monkeypatch):
+    monkeypatch.setattr(settings, 'fast_serialization', True)
+    router = APIRouter(route_class=SerializedRoute)
+
+    @router.get('/games', response_model=list[GameSchema])
+    async def read_all(response: Response):
+        response.headers['X-Next-Cursor'] = 'abc'
+        return [make_game(1), make_game(2)]
+
+    @router.post('/games', response_model=GameSchema, status_code=201)
+    async def create():
+        return make_game(3)
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    response = client.get('/games')
+    assert response.status_code == 200
+    assert response.headers['X-Next-Cursor'] == 'abc'
+    assert [game['game_id'] for game in response.json()] == [1, 2]
+    response = client.post('/games')
+    assert response.status_code == 201
+    assert response.json()['game_id'] == 3